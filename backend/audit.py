@@ -1,15 +1,164 @@
 # audit.py — Immutable audit log service
+#
+# Entries are only ever inserted — never updated or deleted. In DB mode they
+# are queued and written in batches by AuditWriter; if the database is down a
+# batch is appended to a local JSONL spill file and replayed (idempotently, by
+# entry id) once the database is reachable again.
 
+import asyncio
+import json
 import logging
+import os
+import uuid
 from datetime import datetime
 from typing import Optional
 
-from database import get_db, is_db_available
+import metrics
+from config import settings
+from database import is_db_available, is_db_configured, session_scope
+from memory_store import RingBuffer
 
 logger = logging.getLogger(__name__)
 
-# In-memory audit log for stateless mode
-_memory_log: list[dict] = []
+# In-memory audit log for stateless mode (ring buffer — oldest entries drop off)
+_memory_log = RingBuffer(settings.MEMORY_AUDIT_MAX_ENTRIES)
+
+
+class AuditWriter:
+    """Background writer that batches audit entries into multi-row inserts.
+
+    A flush happens when `batch_size` entries are waiting or every
+    `flush_interval` seconds, whichever comes first. stop() drains the buffer.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.AUDIT_BATCH_SIZE,
+        flush_interval: float = settings.AUDIT_FLUSH_INTERVAL,
+        spill_path: str = settings.AUDIT_SPILL_PATH,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self._buffer: list[dict] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher after writing (or spilling) everything queued."""
+        if not self.running:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    def enqueue(self, entry: dict) -> None:
+        self._buffer.append(entry)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything buffered now, batch by batch."""
+        if self._lock is None:
+            return  # never started: log_action writes directly
+        async with self._lock:
+            while self._buffer:
+                batch = self._buffer[: self.batch_size]
+                del self._buffer[: self.batch_size]
+                await self._write(batch)
+            if is_db_available() and self._has_spill():
+                await self._replay_spill()  # the outage ended while nothing was logged
+
+    # ── Persistence ──
+
+    async def _write(self, batch: list[dict]) -> None:
+        if not batch:
+            return
+        try:
+            with metrics.stage("db_commit", op="audit"):
+                await _insert_rows(batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} audit entries to DB, spilling: {e}")
+            await asyncio.to_thread(self._spill, batch)
+            return
+        if self._has_spill():
+            await self._replay_spill()
+
+    def _has_spill(self) -> bool:
+        return os.path.exists(self.spill_path) or os.path.exists(f"{self.spill_path}.replaying")
+
+    def _spill(self, batch: list[dict]) -> None:
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for entry in batch:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _replay_spill(self) -> None:
+        """Insert spilled entries that are not in the DB yet, then drop the file."""
+        replaying = f"{self.spill_path}.replaying"
+        if not os.path.exists(replaying):
+            os.replace(self.spill_path, replaying)
+        try:
+            with open(replaying, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            for i in range(0, len(entries), self.batch_size):
+                await _insert_rows(entries[i : i + self.batch_size], skip_existing=True)
+        except Exception as e:
+            logger.error(f"Audit spill replay failed, will retry: {e}")
+            return
+        os.remove(replaying)
+        logger.info(f"Replayed {len(entries)} spilled audit entries")
+
+
+async def _insert_rows(entries: list[dict], skip_existing: bool = False) -> None:
+    """One multi-row INSERT for a batch of entries (insert-only, never update)."""
+    from sqlalchemy import insert, select
+    from models import AuditLogDB
+
+    async with session_scope() as db:
+        if db is None:
+            raise RuntimeError("database unavailable")
+        if skip_existing:
+            ids = [e["id"] for e in entries]
+            result = await db.execute(select(AuditLogDB.id).where(AuditLogDB.id.in_(ids)))
+            existing = set(result.scalars().all())
+            entries = [e for e in entries if e["id"] not in existing]
+            if not entries:
+                return
+        rows = [
+            {**e, "timestamp": datetime.fromisoformat(e["timestamp"])} for e in entries
+        ]
+        await db.execute(insert(AuditLogDB), rows)
+        await db.commit()
+
+
+audit_writer = AuditWriter()
 
 
 async def log_action(
@@ -20,9 +169,14 @@ async def log_action(
     details: Optional[str] = None,
     ip_address: Optional[str] = None,
 ) -> dict:
-    """Log an audit event. Persists to DB if available, else in-memory."""
+    """Log an audit event: queued for the DB if one is configured, else in memory.
+
+    During a DB outage the writer spills to AUDIT_SPILL_PATH and replays later;
+    only stateless mode uses the (bounded) in-memory log.
+    """
 
     entry = {
+        "id": str(uuid.uuid4()),
         "user_id": user_id,
         "action": action,
         "resource_type": resource_type,
@@ -32,24 +186,11 @@ async def log_action(
         "timestamp": datetime.utcnow().isoformat(),
     }
 
-    if is_db_available():
-        try:
-            from models import AuditLogDB
-
-            db_gen = get_db()
-            db = next(db_gen)
-            if db is not None:
-                audit_entry = AuditLogDB(**{k: v for k, v in entry.items() if k != "timestamp"})
-                db.add(audit_entry)
-                db.commit()
-                entry["id"] = audit_entry.id
-                try:
-                    next(db_gen)
-                except StopIteration:
-                    pass
-        except Exception as e:
-            logger.error(f"Failed to write audit log to DB: {e}")
-            _memory_log.append(entry)
+    if is_db_configured():
+        if audit_writer.running:
+            audit_writer.enqueue(entry)
+        else:
+            await audit_writer._write([entry])
     else:
         _memory_log.append(entry)
 
@@ -57,39 +198,39 @@ async def log_action(
     return entry
 
 
-def get_audit_log(limit: int = 100) -> list[dict]:
-    """Retrieve recent audit log entries."""
+async def get_audit_log(limit: int = 100, user_id: Optional[str] = None) -> list[dict]:
+    """Retrieve recent audit log entries, optionally for one user."""
     if is_db_available():
+        await audit_writer.flush()
         try:
+            from sqlalchemy import select
             from models import AuditLogDB
 
-            db_gen = get_db()
-            db = next(db_gen)
-            if db is not None:
-                entries = (
-                    db.query(AuditLogDB)
-                    .order_by(AuditLogDB.timestamp.desc())
-                    .limit(limit)
-                    .all()
-                )
-                try:
-                    next(db_gen)
-                except StopIteration:
-                    pass
-                return [
-                    {
-                        "id": e.id,
-                        "user_id": e.user_id,
-                        "action": e.action,
-                        "resource_type": e.resource_type,
-                        "resource_id": e.resource_id,
-                        "details": e.details,
-                        "ip_address": e.ip_address,
-                        "timestamp": e.timestamp.isoformat() if e.timestamp else None,
-                    }
-                    for e in entries
-                ]
+            async with session_scope() as db:
+                if db is not None:
+                    query = select(AuditLogDB)
+                    if user_id is not None:
+                        query = query.where(AuditLogDB.user_id == user_id)
+                    result = await db.execute(
+                        query.order_by(AuditLogDB.timestamp.desc()).limit(limit)
+                    )
+                    entries = result.scalars().all()
+                    return [
+                        {
+                            "id": e.id,
+                            "user_id": e.user_id,
+                            "action": e.action,
+                            "resource_type": e.resource_type,
+                            "resource_id": e.resource_id,
+                            "details": e.details,
+                            "ip_address": e.ip_address,
+                            "timestamp": e.timestamp.isoformat() if e.timestamp else None,
+                        }
+                        for e in entries
+                    ]
         except Exception as e:
             logger.error(f"Failed to read audit log from DB: {e}")
 
-    return _memory_log[-limit:]
+    if user_id is not None:
+        return [e for e in _memory_log.dump() if e["user_id"] == user_id][-limit:]
+    return _memory_log.recent(limit)
@@ -1,6 +1,9 @@
 # auth.py — JWT authentication + bcrypt password hashing
 
+import hashlib
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -8,6 +11,7 @@ import bcrypt
 from jose import JWTError, jwt
 
 from config import settings
+from crypto_pool import crypto_pool
 
 
 def hash_password(password: str) -> str:
@@ -21,6 +25,15 @@ def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
 
 
+# bcrypt costs ~250 ms of CPU: handlers use these so it runs on the crypto pool.
+async def hash_password_async(password: str) -> str:
+    return await crypto_pool.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await crypto_pool.run(verify_password, password, hashed)
+
+
 def create_access_token(
     data: dict, expires_delta: Optional[timedelta] = None
 ) -> str:
@@ -33,15 +46,63 @@ def create_access_token(
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
 
+# ── Verified-token cache ──
+# Keyed by the token's SHA-256, so raw credentials are not kept around. A hit
+# is re-checked against `exp` and the revoked jti list, so caching never
+# extends a token's life or resurrects a revoked one.
+#
+# Both live in this process: a token revoked here is still accepted by other
+# workers until it expires. The image runs one uvicorn worker; running more
+# (--workers, several replicas) needs revocation in a shared store first.
+_verified: OrderedDict[bytes, dict] = OrderedDict()
+_revoked: dict[str, float] = {}  # jti -> exp (kept until the token would expire anyway)
+
+
+def _cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _is_live(payload: dict) -> bool:
+    return payload["exp"] > time.time() and payload.get("jti") not in _revoked
+
+
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and validate a JWT access token."""
+    """Decode and validate a JWT access token (LRU-cached by token)."""
+    key = _cache_key(token)
+    payload = _verified.get(key)
+    if payload is not None:
+        if _is_live(payload):
+            _verified.move_to_end(key)
+            return dict(payload)
+        del _verified[key]
+        return None
+
     try:
         payload = jwt.decode(
             token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
         )
-        return payload
     except JWTError:
         return None
+    if payload.get("jti") in _revoked:
+        return None
+    if "exp" in payload and settings.TOKEN_CACHE_SIZE > 0:  # exp bounds the entry's life
+        _verified[key] = payload
+        if len(_verified) > settings.TOKEN_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return dict(payload)
+
+
+def revoke_token(token: str) -> bool:
+    """Revoke a token by its jti (logout). False if it was not a valid token."""
+    payload = decode_access_token(token)
+    if payload is None or not payload.get("jti") or "exp" not in payload:
+        return False
+    now = time.time()
+    for jti in [j for j, exp in _revoked.items() if exp <= now]:
+        del _revoked[jti]  # expired tokens are rejected by exp alone
+    _revoked[payload["jti"]] = payload["exp"]
+    _verified.pop(_cache_key(token), None)
+    return True
 
 
 def get_user_from_token(token: str) -> Optional[dict]:
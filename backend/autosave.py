@@ -0,0 +1,420 @@
+# autosave.py — Debounced, delta-based note autosave
+#
+# /api/save-note re-encrypts and rewrites the whole note on every call. The
+# editor's autosave instead PATCHes small splice ops
+# ([position, delete_count, insert_text]) made against a draft version. Ops are
+# applied to an in-memory draft per encounter and merged as they arrive (a run
+# of keystrokes becomes one op). The draft is written back once the note has
+# been quiet for AUTOSAVE_DEBOUNCE_SECONDS, at least every
+# AUTOSAVE_MAX_DELAY_SECONDS while typing goes on, when the editor closes the
+# encounter, and at shutdown. A write is one encryption of the note plus one
+# encrypted edit-history row holding only the merged ops since the last write,
+# never another copy of the note.
+#
+# Full writes (save-note, job write-back) go through save() too: under the same
+# per-encounter lock they take the next version, so an editor still holding an
+# older one gets a 409 instead of splicing into text it never saw.
+#
+# Drafts live in this process: with several workers, route an encounter's
+# edits to one worker (or the version check turns the others into 409s).
+
+import asyncio
+import json
+import logging
+import time
+import weakref
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+import metrics
+from audit import log_action
+from config import settings
+from database import DatabaseUnavailableError, is_db_configured, session_scope
+
+if TYPE_CHECKING:
+    from memory_store import IndexedStore
+
+logger = logging.getLogger(__name__)
+
+
+class DraftNotFoundError(Exception):
+    """No saved encounter with this id (→ 404)."""
+
+
+class DraftConflictError(Exception):
+    """Ops made against an older draft version (→ 409 with the current draft)."""
+
+    def __init__(self, version: int, note: str):
+        super().__init__(f"Draft is at version {version}; resync and resend the edits")
+        self.version = version
+        self.note = note
+
+
+# ── Ops ──
+
+def apply_ops(text: str, ops) -> str:
+    """`text` with the splice ops applied in order; ValueError if one is out of range."""
+    for pos, delete, insert in ops:
+        if pos < 0 or delete < 0 or pos + delete > len(text):
+            raise ValueError(f"Edit [{pos}, {delete}] is outside the note ({len(text)} chars)")
+        text = text[:pos] + insert + text[pos + delete:]
+    return text
+
+
+def merge_ops(ops: list[list], new) -> None:
+    """Append `new` to `ops`, folding each op into the previous one when they touch."""
+    for pos, delete, insert in new:
+        if ops:
+            p, d, s = ops[-1]
+            if pos == p + len(s):  # typing on (or forward-deleting) after the last op
+                ops[-1] = [p, d + delete, s + insert]
+                continue
+            if pos + delete == p + len(s) and delete <= len(s):  # backspace into the last insert
+                ops[-1] = [p, d, s[: len(s) - delete] + insert]
+                continue
+            if not s and pos + delete == p:  # backspace before the last deletion
+                ops[-1] = [pos, d + delete, insert]
+                continue
+        ops.append([pos, delete, insert])
+
+
+# ── Drafts ──
+
+class Draft:
+    """One encounter's note as the editor sees it, plus the ops not yet written."""
+
+    def __init__(self, encounter_id: str, note: str, version: int, lock: asyncio.Lock):
+        self.encounter_id = encounter_id
+        self.note = note
+        self.version = version
+        self.saved_version = version
+        self.pending: list[list] = []  # merged ops since the last write
+        self.dirty_since: Optional[float] = None
+        self.last_edit = time.monotonic()
+        self.timer: Optional[asyncio.TimerHandle] = None  # next flush, or idle expiry
+        self.lock = lock  # the encounter's lock (AutosaveManager._lock)
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.saved_version
+
+
+class AutosaveManager:
+    """Per-encounter drafts, flushed on a debounce timer."""
+
+    def __init__(self):
+        self._drafts: dict[str, Draft] = {}
+        # One lock per encounter, alive while a draft or a waiter holds it.
+        self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+        self._store: Optional["IndexedStore"] = None
+        self._flushes: set[asyncio.Task] = set()
+
+    def start(self, store: "IndexedStore") -> None:
+        """`store` holds encounters in stateless mode (no database configured)."""
+        self._store = store
+
+    async def edit(self, encounter_id: str, base_version: int, ops) -> int:
+        """Apply ops made against `base_version`; returns the new version."""
+        while True:
+            draft = await self._draft(encounter_id)
+            async with draft.lock:
+                if self._drafts.get(encounter_id) is not draft:
+                    continue  # expired while we waited: load it again
+                if base_version != draft.version:
+                    raise DraftConflictError(draft.version, draft.note)
+                if not ops:
+                    return draft.version
+                draft.note = apply_ops(draft.note, ops)
+                merge_ops(draft.pending, ops)
+                draft.version += 1
+                draft.last_edit = time.monotonic()
+                if draft.dirty_since is None:
+                    draft.dirty_since = draft.last_edit
+                self._schedule(draft)
+                return draft.version
+
+    async def close(self, encounter_id: str) -> Optional[int]:
+        """The editor closed the encounter: write its draft now; returns its version."""
+        draft = self._drafts.get(encounter_id)
+        if draft is None:
+            return None
+        await self._flush(draft)
+        if not draft.dirty:
+            self._drop(draft)
+        return draft.version
+
+    async def save(
+        self,
+        encounter_id: str,
+        note: str,
+        source: str = "save",
+        details: Optional[str] = None,
+        create: bool = True,
+    ) -> Optional[int]:
+        """Write the whole note (superseding any draft); returns its new version.
+
+        The version is one past the draft's, or the stored one's if no draft is
+        in memory. None if the encounter does not exist and `create` is False.
+        """
+        async with self._lock(encounter_id):
+            draft = self._drafts.get(encounter_id)
+            version = await self._write_note(
+                encounter_id, note, draft.version if draft else None, source, details, create
+            )
+            if draft is not None:
+                if version is None:
+                    self._drop(draft)
+                else:
+                    draft.note, draft.version, draft.saved_version = note, version, version
+                    draft.pending, draft.dirty_since = [], None
+                    self._expire_later(draft)
+            return version
+
+    async def flush_all(self) -> None:
+        """App shutdown: write every dirty draft and wait for writes in flight."""
+        await asyncio.gather(
+            *(self._flush(d) for d in list(self._drafts.values())), *self._flushes,
+            return_exceptions=True,
+        )
+        for draft in self._drafts.values():
+            if draft.timer is not None:
+                draft.timer.cancel()
+        self._drafts.clear()
+
+    # ── Internals ──
+
+    def _lock(self, encounter_id: str) -> asyncio.Lock:
+        lock = self._locks.get(encounter_id)
+        if lock is None:
+            lock = self._locks[encounter_id] = asyncio.Lock()
+        return lock
+
+    async def _draft(self, encounter_id: str) -> Draft:
+        draft = self._drafts.get(encounter_id)
+        if draft is None:
+            lock = self._lock(encounter_id)
+            async with lock:  # no full save can land between the load and the draft
+                draft = self._drafts.get(encounter_id)
+                if draft is None:
+                    note, version = await self._load(encounter_id)
+                    draft = self._drafts[encounter_id] = Draft(encounter_id, note, version, lock)
+                    self._evict(keep=draft)
+        return draft
+
+    def _evict(self, keep: Draft) -> None:
+        """Over AUTOSAVE_MAX_DRAFTS: forget the least recently edited written drafts."""
+        excess = len(self._drafts) - settings.AUTOSAVE_MAX_DRAFTS
+        if excess <= 0:
+            return
+        clean = sorted(
+            (d for d in self._drafts.values() if d is not keep and not d.dirty and not d.lock.locked()),
+            key=lambda d: d.last_edit,
+        )
+        for draft in clean[:excess]:
+            self._drop(draft)
+
+    def _drop(self, draft: Draft) -> None:
+        if draft.timer is not None:
+            draft.timer.cancel()
+            draft.timer = None
+        if self._drafts.get(draft.encounter_id) is draft:
+            del self._drafts[draft.encounter_id]
+
+    def _schedule(self, draft: Draft) -> None:
+        """(Re)start the debounce timer, never past dirty_since + the max delay."""
+        if draft.timer is not None:
+            draft.timer.cancel()
+        delay = min(
+            settings.AUTOSAVE_DEBOUNCE_SECONDS,
+            max(0.0, draft.dirty_since + settings.AUTOSAVE_MAX_DELAY_SECONDS - time.monotonic()),
+        )
+        draft.timer = asyncio.get_running_loop().call_later(delay, self._spawn_flush, draft)
+
+    def _spawn_flush(self, draft: Draft) -> None:
+        draft.timer = None
+        task = asyncio.create_task(self._flush(draft))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    def _expire_later(self, draft: Draft) -> None:
+        if draft.timer is not None:
+            draft.timer.cancel()
+        draft.timer = asyncio.get_running_loop().call_later(
+            settings.AUTOSAVE_IDLE_SECONDS, self._expire, draft
+        )
+
+    def _expire(self, draft: Draft) -> None:
+        draft.timer = None
+        if not draft.dirty and not draft.lock.locked():
+            self._drop(draft)
+
+    async def _flush(self, draft: Draft) -> None:
+        async with draft.lock:
+            if not draft.dirty:
+                return
+            if draft.timer is not None:
+                draft.timer.cancel()
+                draft.timer = None
+            version, ops = draft.version, draft.pending
+            try:
+                with metrics.operation("autosave"):
+                    found = await self._write_ops(draft.encounter_id, draft.note, version, ops)
+            except Exception as e:
+                logger.warning(f"⚠️  Autosave of encounter {draft.encounter_id} failed ({e!r}); will retry")
+                draft.timer = asyncio.get_running_loop().call_later(
+                    settings.AUTOSAVE_DEBOUNCE_SECONDS, self._spawn_flush, draft
+                )
+                return
+            draft.saved_version, draft.pending, draft.dirty_since = version, [], None
+            if found:
+                self._expire_later(draft)
+            else:
+                self._drop(draft)  # the encounter was deleted meanwhile
+                return
+        await log_action(
+            user_id="system",
+            action="note_autosaved",
+            resource_type="encounter",
+            resource_id=draft.encounter_id,
+            details=f"version={version} ops={len(ops)}",
+        )
+
+    # ── Storage ──
+    # The database when one is configured (DatabaseUnavailableError while it is
+    # down), else the stateless in-memory store.
+
+    @staticmethod
+    async def _stored_version(db, encounter_id: str) -> int:
+        from sqlalchemy import func, select
+        from models import EncounterEditDB
+
+        return (await db.execute(
+            select(func.max(EncounterEditDB.version))
+            .where(EncounterEditDB.encounter_id == encounter_id)
+        )).scalar() or 0
+
+    async def _load(self, encounter_id: str) -> tuple[str, int]:
+        async with session_scope() as db:
+            if db is not None:
+                from encryption import decrypt_text_async
+                from models import EncounterDB
+
+                with metrics.stage("db_read"):
+                    encounter = await db.get(EncounterDB, encounter_id)
+                    if encounter is None:
+                        raise DraftNotFoundError(encounter_id)
+                    version = await self._stored_version(db, encounter_id)
+                note = await decrypt_text_async(encounter.note_encrypted) if encounter.note_encrypted else ""
+                return note, version
+        if is_db_configured():
+            raise DatabaseUnavailableError()
+
+        record = self._store.get(encounter_id) if self._store is not None else None
+        if record is None:
+            raise DraftNotFoundError(encounter_id)
+        return record.get("note") or "", record.get("note_version", 0)
+
+    async def _write_ops(self, encounter_id: str, note: str, version: int, ops: list[list]) -> bool:
+        """Autosave flush: the note plus one history row of ops; False if the encounter is gone."""
+        async with session_scope() as db:
+            if db is not None:
+                from encryption import encrypt_text_async
+                from models import EncounterDB, EncounterEditDB
+
+                encounter = await db.get(EncounterDB, encounter_id)
+                if encounter is None:
+                    return False
+                encounter.note_encrypted = await encrypt_text_async(note)
+                encounter.preview_encrypted = await encrypt_text_async(note[: settings.PREVIEW_CHARS])
+                encounter.updated_at = datetime.utcnow()
+                db.add(EncounterEditDB(
+                    encounter_id=encounter_id,
+                    version=version,
+                    source="autosave",
+                    delta_encrypted=await encrypt_text_async(json.dumps(ops)),
+                ))
+                with metrics.stage("db_commit"):
+                    await db.commit()
+                return True
+        if is_db_configured():
+            raise DatabaseUnavailableError()
+
+        existing = self._store.get(encounter_id) if self._store is not None else None
+        if existing is None:
+            return False
+        now = datetime.utcnow().isoformat()
+        self._store.put(encounter_id, {
+            **existing,
+            "note": note,
+            "note_version": version,
+            "edits": append_edit(existing, {"version": version, "source": "autosave", "ops": ops, "created_at": now}),
+            "updated_at": now,
+        })
+        return True
+
+    async def _write_note(
+        self,
+        encounter_id: str,
+        note: str,
+        current: Optional[int],
+        source: str,
+        details: Optional[str],
+        create: bool,
+    ) -> Optional[int]:
+        """Full write at version `current` + 1 (the stored version if None)."""
+        async with session_scope() as db:
+            if db is not None:
+                from encryption import encrypt_text_async
+                from models import EncounterDB, EncounterEditDB
+
+                encounter = await db.get(EncounterDB, encounter_id)
+                if encounter is None:
+                    if not create:
+                        return None
+                    encounter = EncounterDB(id=encounter_id, user_id="system")
+                    db.add(encounter)
+                if current is None:
+                    current = await self._stored_version(db, encounter_id)
+                version = current + 1
+                encounter.note_encrypted = await encrypt_text_async(note)
+                encounter.preview_encrypted = await encrypt_text_async(note[: settings.PREVIEW_CHARS])
+                encounter.updated_at = datetime.utcnow()
+                db.add(EncounterEditDB(
+                    encounter_id=encounter_id,
+                    version=version,
+                    source=source,
+                    delta_encrypted=await encrypt_text_async(details) if details else None,
+                ))
+                with metrics.stage("db_commit"):
+                    await db.commit()
+                return version
+        if is_db_configured():
+            raise DatabaseUnavailableError()
+
+        existing = self._store.get(encounter_id)
+        if existing is None and not create:
+            return None
+        existing = existing or {}
+        version = (existing.get("note_version", 0) if current is None else current) + 1
+        now = datetime.utcnow().isoformat()
+        self._store.put(encounter_id, {
+            **existing,
+            "id": encounter_id,
+            "user_id": existing.get("user_id", "system"),
+            "note": note,
+            "note_version": version,
+            "edits": append_edit(existing, {"version": version, "source": source, "edits": details, "created_at": now}),
+            "created_at": existing.get("created_at", now),
+            "updated_at": now,
+        })
+        return version
+
+
+def append_edit(record: dict, edit: dict) -> list[dict]:
+    """A memory-store encounter's edit history with `edit` added (capped)."""
+    edits = record.get("edits") or []
+    return edits[max(0, len(edits) + 1 - settings.AUTOSAVE_MEMORY_HISTORY):] + [edit]
+
+
+# Singleton
+autosave_manager = AutosaveManager()
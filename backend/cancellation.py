@@ -0,0 +1,50 @@
+# cancellation.py — Cancel in-flight work when the client goes away
+
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+import metrics
+
+T = TypeVar("T")
+
+# ASGI message type that signals the peer is gone, per scope type.
+_DISCONNECT = {"http": "http.disconnect", "websocket": "websocket.disconnect"}
+
+
+class ClientDisconnected(Exception):
+    """The client left before the work finished; the work has been cancelled."""
+
+
+async def run_until_disconnect(
+    receive: Callable[[], Awaitable[dict]],
+    work: Awaitable[T],
+    scope_type: str = "http",
+) -> T:
+    """Await `work` while watching `receive` for a disconnect.
+
+    On disconnect the work is cancelled — which closes any upstream httpx
+    request or stream it is awaiting — and ClientDisconnected is raised.
+    `receive` must be past the request body (HTTP) or start message (WS);
+    any further client messages are ignored.
+    """
+    disconnect = _DISCONNECT[scope_type]
+
+    async def watch() -> None:
+        while (await receive())["type"] != disconnect:
+            pass
+
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(watch())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+
+    if task.cancelled() or not task.done():
+        await asyncio.gather(task, return_exceptions=True)
+        metrics.cancelled("client_disconnect")
+        raise ClientDisconnected()
+    return task.result()
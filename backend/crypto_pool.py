@@ -0,0 +1,73 @@
+# crypto_pool.py — Bounded thread pool for password hashing (bcrypt)
+#
+# bcrypt releases the GIL, so a thread pool runs hashes in parallel with the
+# event loop. A login burst then queues here instead of stalling every other
+# request behind ~250 ms hashes. AES-GCM is not sent here: it takes micro- to
+# milliseconds and must not wait behind a queue of logins (see encryption.py).
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from config import settings
+
+T = TypeVar("T")
+
+
+class CryptoBusyError(Exception):
+    """Too many crypto jobs queued; the caller should retry shortly."""
+
+
+class CryptoPool:
+    """At most `workers` jobs run at once and at most `queue_size` more wait.
+
+    Anything beyond that is rejected with CryptoBusyError (→ 503) so a storm
+    cannot build an unbounded backlog.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.CRYPTO_WORKERS,
+        queue_size: int = settings.CRYPTO_QUEUE_SIZE,
+    ):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.in_flight = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Run fn(*args) on the pool. A job already running finishes even if cancelled."""
+        if self.in_flight >= self.capacity:
+            raise CryptoBusyError(f"Crypto queue full ({self.in_flight}/{self.capacity})")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="crypto")
+
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        future = self._executor.submit(fn, *args)
+        # Release the slot when the job really ends, not when the awaiting task does.
+        future.add_done_callback(lambda _: self._release_from(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release_from(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # loop already closed (shutdown)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    @property
+    def queued(self) -> int:
+        """Jobs waiting for a free thread."""
+        return max(0, self.in_flight - self.workers)
+
+    def shutdown(self) -> None:
+        """Stop the threads, dropping queued jobs."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+crypto_pool = CryptoPool()
@@ -1,57 +1,217 @@
-# database.py — SQLAlchemy engine + session management
+# database.py — Async SQLAlchemy engine + session management
 
+import asyncio
 import logging
-from typing import Generator, Optional
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncGenerator, Optional
+
 from config import settings
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
 logger = logging.getLogger(__name__)
 
-# Database availability flag
+
+class DatabaseUnavailableError(Exception):
+    """A database is configured but down, so a write was refused (→ 503)."""
+
+    def __init__(self, message: str = "Database unavailable; nothing was saved"):
+        super().__init__(message)
+
+
+# Database availability flag (kept current by the background monitor)
 db_available = False
 SessionLocal = None
 engine = None
+_monitor_task: Optional[asyncio.Task] = None
 
 try:
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
     from models import Base
 
-    if Base is not None and settings.DATABASE_URL:
-        engine = create_engine(
-            settings.DATABASE_URL,
-            pool_pre_ping=True,
-            pool_size=5,
-            max_overflow=10,
-        )
+    HAS_SQLALCHEMY = Base is not None
+except ImportError:
+    HAS_SQLALCHEMY = False
+
+
+def async_database_url(url: str) -> str:
+    """Map a plain DATABASE_URL onto its async driver (asyncpg / aiosqlite)."""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://") and "+aiosqlite" not in url:
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def _engine_kwargs(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}  # SQLite (local/test stand-in) uses SQLAlchemy's default pool
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
 
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def is_db_configured() -> bool:
+    """True if a database is expected (SQLAlchemy installed and DATABASE_URL set)."""
+    return HAS_SQLALCHEMY and bool(settings.DATABASE_URL)
+
+
+async def _dispose_engine() -> None:
+    global engine, SessionLocal
+    if engine is not None:
+        try:
+            await engine.dispose()
+        except Exception as e:
+            logger.debug(f"Engine dispose failed: {e!r}")
+    engine = SessionLocal = None
+
+
+async def _connect() -> bool:
+    """One connection attempt: build the engine, probe it, apply migrations.
+
+    Only the probe is bounded by DB_CONNECT_TIMEOUT. Migrations run untimed,
+    since an index build on a large table can take minutes, and workers
+    starting together wait on the advisory lock in migrations.upgrade().
+    """
+    global db_available, SessionLocal, engine
+
+    # Deferred so that importing the app (and stateless mode) skips the async stack.
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from migrations import upgrade
+
+    async def probe():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await _dispose_engine()  # stale engine from before an outage
+    try:
+        url = async_database_url(settings.DATABASE_URL)
+        engine = create_async_engine(url, **_engine_kwargs(url))
+        SessionLocal = async_sessionmaker(
+            engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+        await asyncio.wait_for(probe(), timeout=settings.DB_CONNECT_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"⚠️  Database unavailable — running in stateless mode: {e!r}")
+        db_available = False
+        await _dispose_engine()
+        return False
 
-        # Try to connect — if PostgreSQL is not running, we skip
+    if settings.DB_AUTO_MIGRATE:
         try:
-            with engine.connect() as conn:
-                conn.execute(conn.connection.cursor().execute("SELECT 1") if False else __import__("sqlalchemy").text("SELECT 1"))
-            Base.metadata.create_all(bind=engine)
-            db_available = True
-            logger.info("✅ Database connected and tables created")
+            async with engine.begin() as conn:
+                applied = await conn.run_sync(upgrade)
+            if applied:
+                logger.info(f"Applied schema migrations: {', '.join(applied)}")
         except Exception as e:
-            logger.warning(f"⚠️  Database unavailable — running in stateless mode: {e}")
+            # Not an outage: the schema is behind, so keep the database off and retry.
+            logger.error(f"⚠️  Schema migration failed — database left unavailable: {e!r}")
             db_available = False
+            await _dispose_engine()
+            return False
+    db_available = True
+    return True
 
-except ImportError:
-    logger.warning("⚠️  SQLAlchemy not installed — running in stateless mode")
 
+async def _ping() -> bool:
+    from sqlalchemy import text
+
+    try:
+        async with engine.connect() as conn:
+            await asyncio.wait_for(
+                conn.execute(text("SELECT 1")), timeout=settings.DB_CONNECT_TIMEOUT
+            )
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️  Database connection lost — falling back to stateless mode: {e!r}")
+        return False
+
+
+async def _monitor() -> None:
+    """Re-check the database every DB_HEALTH_INTERVAL seconds.
+
+    While it is down, reconnects back off exponentially (capped at the same
+    interval), so an outage during boot no longer latches stateless mode.
+    """
+    global db_available
+    delay = 1.0
+    while True:
+        await asyncio.sleep(settings.DB_HEALTH_INTERVAL if db_available else delay)
+        if db_available:
+            db_available = await _ping()
+            delay = 1.0
+        elif await _connect():
+            logger.info("✅ Database reconnected")
+        else:
+            delay = min(delay * 2, settings.DB_HEALTH_INTERVAL)
+
+
+async def init_db() -> bool:
+    """First connection attempt (bounded by DB_CONNECT_TIMEOUT), then monitor.
+
+    Called from the FastAPI lifespan. If the database is unreachable the app
+    starts in stateless mode and switches over once the monitor reconnects.
+    """
+    global _monitor_task
+
+    if not is_db_configured():
+        logger.warning("⚠️  SQLAlchemy not installed — running in stateless mode")
+        return False
+    try:
+        import sqlalchemy.ext.asyncio  # noqa: F401 — needs greenlet
+    except ImportError as e:
+        logger.warning(f"⚠️  Async SQLAlchemy unavailable — running in stateless mode: {e}")
+        return False
+
+    if await _connect():
+        logger.info("✅ Database connected and schema up to date")
+    _monitor_task = asyncio.create_task(_monitor())
+    return db_available
 
-def get_db() -> Generator:
-    """Get database session. Yields None if DB is unavailable."""
+
+async def close_db() -> None:
+    """Stop the monitor and dispose of the engine and its pooled connections."""
+    global db_available, _monitor_task
+    if _monitor_task is not None:
+        _monitor_task.cancel()
+        try:
+            await _monitor_task
+        except asyncio.CancelledError:
+            pass
+        _monitor_task = None
+    db_available = False
+    await _dispose_engine()
+
+
+async def get_db() -> AsyncGenerator[Optional["AsyncSession"], None]:
+    """FastAPI dependency: one session per request, closed when the request ends.
+
+    Yields None if the DB is unavailable so handlers can fall back to memory.
+    """
     if not db_available or SessionLocal is None:
         yield None
         return
 
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    async with SessionLocal() as session:
+        yield session
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncGenerator[Optional["AsyncSession"], None]:
+    """Short-lived session for code outside a request (audit, WebSockets)."""
+    if not db_available or SessionLocal is None:
+        yield None
+        return
+
+    async with SessionLocal() as session:
+        yield session
 
 
 def is_db_available() -> bool:
@@ -1,35 +1,77 @@
 # encryption.py — AES-256 encryption for PHI at rest
+#
+# Keys are derived and AESGCM objects built once per key, not per call.
+# Rotation: set ENCRYPTION_KEY to the new key and list the old one(s) in
+# ENCRYPTION_KEYS_PREVIOUS. New data uses the current key; old data still
+# decrypts (GCM's tag tells the keys apart) and reencrypt_text() migrates it.
 
+import asyncio
 import os
 import base64
 import hashlib
+from functools import lru_cache
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 from config import settings
 
 
-def _get_key() -> bytes:
-    """Derive a 32-byte key from the configured encryption key."""
-    raw_key = settings.ENCRYPTION_KEY or "dev-key-not-for-production"
-    return hashlib.sha256(raw_key.encode()).digest()
+@lru_cache(maxsize=16)
+def _cipher(raw_key: str) -> AESGCM:
+    """AES-256-GCM for one configured key (SHA-256 → 32-byte key)."""
+    return AESGCM(hashlib.sha256(raw_key.encode()).digest())
+
+
+def _keyring() -> list[AESGCM]:
+    """Current cipher first, then the ones from before a rotation."""
+    current = settings.ENCRYPTION_KEY or "dev-key-not-for-production"
+    return [_cipher(current)] + [_cipher(k) for k in settings.ENCRYPTION_KEYS_PREVIOUS]
 
 
 def encrypt_text(plaintext: str) -> str:
     """Encrypt text using AES-256-GCM. Returns base64-encoded ciphertext."""
-    key = _get_key()
-    aesgcm = AESGCM(key)
     nonce = os.urandom(12)  # 96-bit nonce for GCM
-    ciphertext = aesgcm.encrypt(nonce, plaintext.encode("utf-8"), None)
+    ciphertext = _keyring()[0].encrypt(nonce, plaintext.encode("utf-8"), None)
     # Prepend nonce to ciphertext and base64-encode
     return base64.b64encode(nonce + ciphertext).decode("utf-8")
 
 
-def decrypt_text(encrypted: str) -> str:
-    """Decrypt AES-256-GCM encrypted text from base64."""
-    key = _get_key()
-    aesgcm = AESGCM(key)
+def _decrypt(encrypted: str) -> tuple[str, bool]:
+    """(plaintext, True if it was encrypted with the current key)."""
     raw = base64.b64decode(encrypted)
     nonce = raw[:12]
     ciphertext = raw[12:]
-    plaintext = aesgcm.decrypt(nonce, ciphertext, None)
-    return plaintext.decode("utf-8")
+    error = None
+    for i, aesgcm in enumerate(_keyring()):
+        try:
+            return aesgcm.decrypt(nonce, ciphertext, None).decode("utf-8"), i == 0
+        except InvalidTag as e:
+            error = e
+    raise error
+
+
+def decrypt_text(encrypted: str) -> str:
+    """Decrypt AES-256-GCM encrypted text from base64 (current or previous keys)."""
+    return _decrypt(encrypted)[0]
+
+
+def reencrypt_text(encrypted: str) -> str:
+    """The same text under the current key; unchanged if it already uses it."""
+    plaintext, current = _decrypt(encrypted)
+    return encrypted if current else encrypt_text(plaintext)
+
+
+# ── Async variants: large payloads go to a worker thread ──
+# Below ENCRYPTION_OFFLOAD_BYTES, AES-GCM takes microseconds — less than the
+# thread hand-off — so small notes stay on the event loop.
+
+async def encrypt_text_async(plaintext: str) -> str:
+    if len(plaintext) < settings.ENCRYPTION_OFFLOAD_BYTES:
+        return encrypt_text(plaintext)
+    return await asyncio.to_thread(encrypt_text, plaintext)
+
+
+async def decrypt_text_async(encrypted: str) -> str:
+    if len(encrypted) < settings.ENCRYPTION_OFFLOAD_BYTES:
+        return decrypt_text(encrypted)
+    return await asyncio.to_thread(decrypt_text, encrypted)
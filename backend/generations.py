@@ -0,0 +1,176 @@
+# generations.py — Resumable note generations: replay buffer + live fan-out
+#
+# A streamed note runs as a task owned by the registry, not by the WebSocket
+# that asked for it. Viewers attach by generation id and character offset,
+# get the backlog and then live text, so a dropped connection (or a second
+# device) never triggers another paid Groq generation. A generation nobody
+# has watched for GENERATION_ORPHAN_SECONDS is cancelled, closing the upstream
+# stream. Finished text is kept for GENERATION_TTL_SECONDS only — it is PHI
+# and lives in process memory.
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncGenerator, AsyncIterator, Optional
+
+import metrics
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationFailedError(Exception):
+    """The upstream note stream failed; every viewer gets the same error."""
+
+
+class Generation:
+    """One in-flight (or recently finished) streamed note shared by its viewers."""
+
+    def __init__(self, generation_id: str, orphan_grace: float):
+        self.id = generation_id
+        self.orphan_grace = orphan_grace
+        self.text = ""
+        self.done = False
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+        self.viewers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._orphan_timer: Optional[asyncio.TimerHandle] = None
+
+    def _notify(self) -> None:
+        # Wake everyone waiting on the current event; later waiters get a new one.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, text: str) -> None:
+        self.text += text
+        self._notify()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        self.done = True
+        self.error = error
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def watch_orphan(self) -> None:
+        """Cancel the generation if still nobody is watching after the grace period."""
+        if self._orphan_timer is None and not self.done and self.viewers == 0:
+            self._orphan_timer = asyncio.get_running_loop().call_later(
+                self.orphan_grace, self._cancel_orphan
+            )
+
+    def _cancel_orphan(self) -> None:
+        self._orphan_timer = None
+        if self.viewers == 0 and self.task is not None and not self.task.done():
+            logger.info(f"Cancelling note generation {self.id}: no viewer reconnected")
+            metrics.cancelled("orphaned")
+            self.task.cancel()
+
+    def clamp(self, offset) -> int:
+        """A client-supplied offset, bounded to what has been generated so far."""
+        try:
+            offset = int(offset or 0)
+        except (TypeError, ValueError):
+            offset = 0
+        return max(0, min(offset, len(self.text)))
+
+    async def follow(self, offset: int = 0) -> AsyncGenerator[str, None]:
+        """Text from `offset` (code points) on: the backlog, then live deltas."""
+        self.viewers += 1
+        if self._orphan_timer is not None:
+            self._orphan_timer.cancel()
+            self._orphan_timer = None
+        try:
+            while True:
+                if offset < len(self.text):
+                    chunk = self.text[offset:]
+                    offset += len(chunk)
+                    yield chunk
+                elif self.done:
+                    if self.error is not None:
+                        raise GenerationFailedError(self.error)
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self.viewers -= 1
+            self.watch_orphan()
+
+
+class GenerationRegistry:
+    """Live and recently finished generations, by id.
+
+    Finished generations expire after `ttl` seconds; beyond `max_entries` the
+    oldest finished ones are dropped first. Running ones are never dropped,
+    but are cancelled once nobody has watched them for `orphan_grace` seconds.
+    """
+
+    def __init__(
+        self,
+        ttl: float = settings.GENERATION_TTL_SECONDS,
+        max_entries: int = settings.GENERATION_MAX,
+        orphan_grace: float = settings.GENERATION_ORPHAN_SECONDS,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.orphan_grace = orphan_grace
+        self._generations: OrderedDict[str, Generation] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._generations)
+
+    def get(self, generation_id: str) -> Optional[Generation]:
+        self._prune()
+        return self._generations.get(generation_id)
+
+    def start(self, tokens: AsyncIterator[str]) -> Generation:
+        """Run `tokens` to completion in the background as a new generation."""
+        self._prune()
+        generation = Generation(uuid.uuid4().hex, self.orphan_grace)
+        generation.task = asyncio.create_task(self._run(generation, tokens))
+        generation.watch_orphan()  # until the first viewer attaches
+        self._generations[generation.id] = generation
+        return generation
+
+    async def _run(self, generation: Generation, tokens: AsyncIterator[str]) -> None:
+        try:
+            async for token in tokens:
+                generation.append(token)
+        except asyncio.CancelledError:
+            generation.finish("Generation cancelled")
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️  Note generation {generation.id} failed: {e!r}")
+            generation.finish(str(e))
+        else:
+            generation.finish()
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        finished = [
+            g for g in self._generations.values() if g.done and g.finished_at is not None
+        ]
+        for g in finished:
+            if now - g.finished_at > self.ttl:
+                del self._generations[g.id]
+        overflow = len(self._generations) - self.max_entries
+        for g in finished:  # insertion order = oldest first
+            if overflow <= 0:
+                break
+            if g.id in self._generations:
+                del self._generations[g.id]
+                overflow -= 1
+
+    async def close(self) -> None:
+        """Cancel running generations (app shutdown)."""
+        tasks = [g.task for g in self._generations.values() if g.task and not g.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._generations.clear()
+
+
+note_generations = GenerationRegistry()
@@ -1,19 +1,29 @@
 # groq_client.py — MedGemma / Gemma2 inference via Groq Cloud
 
-import os
-import json
-import httpx
-from typing import AsyncGenerator
+import functools
+import time
+from typing import AsyncGenerator, Optional
 from config import settings
+from groq_scheduler import BACKGROUND, INTERACTIVE
+from llm_router import llm_router
+import metrics
+from note_cache import note_cache
+from note_pipeline import build_reduce_messages, dedupe_facts, extract_facts, split_transcript
+from prompt_tokens import (
+    PromptTooLargeError,
+    compact_segments,
+    compact_transcript,
+    completion_budget,
+    count_tokens,
+    message_tokens,
+)
+from segments import speaker_transcript
 
-GROQ_API_KEY = settings.GROQ_API_KEY
-GROQ_BASE_URL = settings.GROQ_BASE_URL
 MODEL_NAME = settings.GROQ_MODEL
 
-HEADERS = {
-    "Authorization": f"Bearer {GROQ_API_KEY}",
-    "Content-Type": "application/json",
-}
+# Scheduler priority per endpoint: summaries and batch jobs yield to notes a
+# clinician is waiting on.
+PRIORITIES = {"note": INTERACTIVE, "stream": INTERACTIVE, "summary": BACKGROUND, "batch": BACKGROUND}
 
 # ── System prompt for medical scribe ──
 SYSTEM_PROMPT = """You are an expert medical scribe AI. Your task is to convert
@@ -78,124 +88,303 @@ Complications, Disposition/Post-Procedure Plan""",
 }
 
 
-async def generate_note(
-    transcript: str, template: str = "soap", specialty: str = "general"
-) -> str:
-    """Generate a structured clinical note from a transcript."""
+# ── Timestamped, speaker-tagged transcripts (see segments.py) ──
+TIMESTAMP_RULES = """Transcript lines are "DR: ..." (clinician) or "PT: ..." (patient), some
+prefixed with a [mm:ss] timestamp. Speaker tags are automatic and may be wrong;
+rely on what is said. After every [VERIFY] item and every assessment item, cite
+the nearest timestamp at or before its source line, e.g. "[VERIFY] (@03:12)".
+"""
 
-    template_instruction = TEMPLATE_INSTRUCTIONS.get(
-        template, TEMPLATE_INSTRUCTIONS["soap"]
-    )
+NOTE_INSTRUCTIONS = """Generate the clinical note from the encounter in the user message.
+Follow the template structure exactly. Include pertinent negatives.
+Mark uncertain items with [VERIFY]."""
+
+
+# ── Prompt layout: stable prefix, variable suffix ──
+# Everything that is the same for a given template and specialty is one system
+# message, built once and byte-identical across requests; the transcript (or
+# the map-reduce facts) is the only user message. Providers with prefix
+# caching (vLLM, SGLang, Groq on supported models) then prefill only the
+# transcript. Nothing per-request (dates, ids) may go into the prefix.
+
+@functools.lru_cache(maxsize=256)
+def _note_prefix(template: str, specialty: str, timestamped: bool) -> str:
+    parts = [
+        SYSTEM_PROMPT,
+        f"TEMPLATE:\n{TEMPLATE_INSTRUCTIONS[template]}",
+        f"SPECIALTY: {specialty}",
+        NOTE_INSTRUCTIONS,
+    ]
+    if timestamped:
+        parts.append(TIMESTAMP_RULES)
+    return "\n\n".join(part.strip() for part in parts) + "\n"
 
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {
-            "role": "user",
-            "content": f"""
-Template: {template_instruction}
 
-Specialty context: {specialty}
+def note_prefix(template: str, specialty: str, timestamped: bool = False) -> str:
+    """The cacheable system message for notes with this template and specialty."""
+    if template not in TEMPLATE_INSTRUCTIONS:
+        template = "soap"
+    return _note_prefix(template, specialty, timestamped)
 
-TRANSCRIPT:
-{transcript}
 
-Generate the clinical note now. Follow the template structure exactly.
-Include pertinent negatives. Mark uncertain items with [VERIFY].
-""",
-        },
+def _note_messages(template: str, specialty: str, transcript: str, timestamped: bool) -> list[dict]:
+    return [
+        {"role": "system", "content": note_prefix(template, specialty, timestamped)},
+        {"role": "user", "content": f"TRANSCRIPT:\n{transcript}"},
     ]
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            f"{GROQ_BASE_URL}/chat/completions",
-            headers=HEADERS,
-            json={
-                "model": MODEL_NAME,
-                "messages": messages,
-                "temperature": 0.3,
-                "max_tokens": 4096,
-                "top_p": 0.9,
-            },
+
+def _prompt_transcript(transcript: str, segments: Optional[list[dict]]) -> tuple[str, bool]:
+    """(transcript text for the prompt, whether it is timestamped), compacted.
+
+    Raises PromptTooLargeError when even map-reduce should not take it on.
+    """
+    compact = settings.PROMPT_COMPACTION
+    if segments:
+        text = speaker_transcript(compact_segments(segments) if compact else segments)
+    else:
+        text = compact_transcript(transcript) if compact else transcript
+    tokens = count_tokens(text)
+    if tokens > settings.NOTE_MAX_TRANSCRIPT_TOKENS:
+        raise PromptTooLargeError(tokens, settings.NOTE_MAX_TRANSCRIPT_TOKENS)
+    return text, bool(segments)
+
+
+def _note_max_tokens(messages: list[dict], transcript: str) -> Optional[int]:
+    """max_tokens for a single-pass note, or None to go map-reduce.
+
+    Map-reduce when the transcript is over NOTE_CHUNK_THRESHOLD_CHARS or the
+    prompt leaves too little of the model context for the note.
+    """
+    if len(transcript) > settings.NOTE_CHUNK_THRESHOLD_CHARS:
+        return None
+    return completion_budget(messages, 4096)
+
+
+def _reduce_request(facts: list[str], prefix: str) -> tuple[list[dict], int]:
+    """Reduce-step messages and their max_tokens, budgeted like _note_max_tokens.
+
+    Facts repeated across parts are dropped if the prompt does not fit as is;
+    raises PromptTooLargeError if it still leaves too little of the context.
+    """
+    messages = build_reduce_messages(facts, prefix)
+    max_tokens = completion_budget(messages, 4096)
+    if max_tokens is None:
+        messages = build_reduce_messages(dedupe_facts(facts), prefix)
+        max_tokens = completion_budget(messages, 4096)
+    if max_tokens is None:
+        raise PromptTooLargeError(
+            int(message_tokens(messages) * settings.TOKEN_ESTIMATE_MARGIN),
+            settings.LLM_CONTEXT_TOKENS - min(4096, settings.NOTE_MIN_COMPLETION_TOKENS),
+            "The extracted-facts prompt",
         )
-        response.raise_for_status()
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
+    return messages, max_tokens
+
+
+async def generate_note(
+    transcript: str,
+    template: str = "soap",
+    specialty: str = "general",
+    use_cache: bool = True,
+    segments: Optional[list[dict]] = None,
+    endpoint: str = "note",
+) -> str:
+    """Generate a structured clinical note from a transcript.
+
+    Labelled `segments` (segments.prepare_segments) replace the flat
+    transcript in the prompt, and the note then cites source timestamps.
+    `endpoint="batch"` runs at background priority (bulk jobs).
+    """
+
+    transcript, timestamped = _prompt_transcript(transcript, segments)
+    messages = _note_messages(template, specialty, transcript, timestamped)
+
+    max_tokens = _note_max_tokens(messages, transcript)
+    payload = {
+        "model": MODEL_NAME,
+        "messages": messages,
+        "temperature": 0.3,
+        "max_tokens": max_tokens or 4096,
+        "top_p": 0.9,
+    }
+    cache_key = note_cache.make_key(template=template, specialty=specialty, **payload)
+    if use_cache:
+        cached = note_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if max_tokens is None:
+        note = await _generate_note_map_reduce(
+            transcript, note_prefix(template, specialty, timestamped), specialty, endpoint
+        )
+    else:
+        note = await _chat_completion(messages, max_tokens, 0.3, endpoint, top_p=0.9)
+    note_cache.set(cache_key, note)
+    return note
+
+
+def _cached_tokens(usage: dict) -> int:
+    """Prompt tokens served from the provider's prefix cache (OpenAI-style usage)."""
+    return (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+
+async def _chat_completion(
+    messages: list[dict],
+    max_tokens: int,
+    temperature: float,
+    endpoint: str = "note",
+    **params,
+) -> str:
+    """Single non-streaming chat completion, routed (and hedged) across providers."""
+    payload = {
+        "model": MODEL_NAME,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        **params,
+    }
+    started = time.perf_counter()
+    with metrics.stage("groq_call"):
+        content, usage = await llm_router.complete(
+            payload, endpoint, PRIORITIES.get(endpoint, INTERACTIVE)
+        )
+    metrics.observe_tokens(usage.get("completion_tokens", 0), time.perf_counter() - started)
+    # Provider-reported usage when there is one, else the local estimate.
+    metrics.record_tokens(
+        usage.get("prompt_tokens") or message_tokens(messages),
+        usage.get("completion_tokens") or count_tokens(content),
+        _cached_tokens(usage),
+    )
+    return content
+
+
+async def _generate_note_map_reduce(
+    transcript: str,
+    prefix: str,
+    specialty: str,
+    endpoint: str = "note",
+) -> str:
+    """Long transcripts: extract facts per chunk in parallel, then one reduce pass."""
+    chunks = split_transcript(transcript)
+    complete = functools.partial(_chat_completion, endpoint=endpoint)
+    facts = await extract_facts(chunks, specialty, complete)
+    messages, max_tokens = _reduce_request(facts, prefix)
+    return await _chat_completion(messages, max_tokens, 0.3, endpoint, top_p=0.9)
 
 
 async def stream_note(
-    transcript: str, template: str = "soap", specialty: str = "general"
+    transcript: str,
+    template: str = "soap",
+    specialty: str = "general",
+    use_cache: bool = True,
+    segments: Optional[list[dict]] = None,
 ) -> AsyncGenerator[str, None]:
-    """Stream note generation token-by-token."""
+    """Stream note generation token-by-token.
+
+    A cache hit is replayed as a single chunk; a completed stream is cached.
+    `segments` are used as in generate_note.
+    """
+
+    transcript, timestamped = _prompt_transcript(transcript, segments)
+    messages = _note_messages(template, specialty, transcript, timestamped)
+
+    max_tokens = _note_max_tokens(messages, transcript)
+    payload = {
+        "model": MODEL_NAME,
+        "messages": messages,
+        "temperature": 0.3,
+        "max_tokens": max_tokens or 4096,
+    }
+    cache_key = note_cache.make_key(template=template, specialty=specialty, **payload)
+    if use_cache:
+        cached = note_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    if max_tokens is None:
+        # Map in parallel first, then stream only the reduce pass.
+        facts = await extract_facts(split_transcript(transcript), specialty, _chat_completion)
+        payload["messages"], payload["max_tokens"] = _reduce_request(
+            facts, note_prefix(template, specialty, timestamped)
+        )
 
-    template_instruction = TEMPLATE_INSTRUCTIONS.get(
-        template, TEMPLATE_INSTRUCTIONS["soap"]
+    parts: list[str] = []
+    async for content in _stream_chat(payload):
+        parts.append(content)
+        yield content
+
+    note_cache.set(cache_key, "".join(parts))
+
+
+async def _stream_chat(payload: dict, endpoint: str = "stream") -> AsyncGenerator[str, None]:
+    """Streaming chat completion routed across providers; yields content deltas.
+
+    Rate limits, 5xx, hedging and failover are all handled before the first token.
+    """
+    timer = metrics.StreamTimer()
+    usage: dict = {}
+    async for content in llm_router.stream(
+        payload, endpoint, PRIORITIES.get(endpoint, INTERACTIVE), usage
+    ):
+        timer.token()
+        yield content
+    timer.finish(usage.get("completion_tokens"))
+    metrics.record_tokens(
+        usage.get("prompt_tokens") or message_tokens(payload["messages"]),
+        usage.get("completion_tokens") or timer.tokens,  # deltas ≈ tokens
+        _cached_tokens(usage),
     )
 
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {
-            "role": "user",
-            "content": f"""
-Template: {template_instruction}
-Specialty: {specialty}
 
-TRANSCRIPT:
-{transcript}
+PATIENT_SUMMARY_PROMPT = """You are a medical communicator.
+Rewrite clinical notes in simple language that any patient can understand.
+Use short sentences. Avoid ALL medical jargon. Reading level: 5th grade.
+Format with clear headers: "What We Found", "What We're Doing", "Come Back In"."""
 
-Generate the clinical note now.
-""",
-        },
-    ]
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        async with client.stream(
-            "POST",
-            f"{GROQ_BASE_URL}/chat/completions",
-            headers=HEADERS,
-            json={
-                "model": MODEL_NAME,
-                "messages": messages,
-                "temperature": 0.3,
-                "max_tokens": 4096,
-                "stream": True,
+def _patient_summary_payload(note: str) -> dict:
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": PATIENT_SUMMARY_PROMPT},
+            {
+                "role": "user",
+                "content": f"Rewrite this clinical note for the patient:\n\n{note}",
             },
-        ) as response:
-            async for line in response.aiter_lines():
-                if line.startswith("data: ") and line != "data: [DONE]":
-                    chunk = json.loads(line[6:])
-                    delta = chunk["choices"][0].get("delta", {})
-                    content = delta.get("content", "")
-                    if content:
-                        yield content
+        ],
+        "temperature": 0.5,
+        "max_tokens": 1024,
+    }
 
 
 async def generate_patient_summary(note: str) -> str:
     """Generate a patient-facing summary at 5th-grade reading level."""
 
-    messages = [
-        {
-            "role": "system",
-            "content": """You are a medical communicator.
-Rewrite clinical notes in simple language that any patient can understand.
-Use short sentences. Avoid ALL medical jargon. Reading level: 5th grade.
-Format with clear headers: "What We Found", "What We're Doing", "Come Back In".""",
-        },
-        {
-            "role": "user",
-            "content": f"Rewrite this clinical note for the patient:\n\n{note}",
-        },
-    ]
+    payload = _patient_summary_payload(note)
+    cache_key = note_cache.make_key(kind="patient_summary", **payload)
+    cached = note_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            f"{GROQ_BASE_URL}/chat/completions",
-            headers=HEADERS,
-            json={
-                "model": MODEL_NAME,
-                "messages": messages,
-                "temperature": 0.5,
-                "max_tokens": 1024,
-            },
-        )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+    summary = await _chat_completion(payload["messages"], 1024, 0.5, endpoint="summary")
+    note_cache.set(cache_key, summary)
+    return summary
+
+
+async def stream_patient_summary(note: str) -> AsyncGenerator[str, None]:
+    """Stream the patient-facing summary token-by-token."""
+
+    payload = _patient_summary_payload(note)
+    cache_key = note_cache.make_key(kind="patient_summary", **payload)
+    cached = note_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts: list[str] = []
+    async for content in _stream_chat(payload, endpoint="summary"):
+        parts.append(content)
+        yield content
+
+    note_cache.set(cache_key, "".join(parts))
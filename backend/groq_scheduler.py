@@ -0,0 +1,282 @@
+# groq_scheduler.py — Rate-limit aware admission, priorities and retries for Groq
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import re
+import time
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+import metrics
+from config import settings
+from prompt_tokens import message_tokens
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first.
+INTERACTIVE = 0  # note generation / streaming a clinician is waiting on
+BACKGROUND = 1  # patient summaries, batch regeneration
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+class GroqUnavailableError(Exception):
+    """Groq kept rate-limiting or failing after all retries (mapped to HTTP 503)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset durations such as "7.66s", "2m59.56s" or "120ms"."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _UNIT_SECONDS[unit] for n, unit in parts)
+
+
+def estimate_tokens(payload: dict) -> int:
+    """TPM cost of a chat request: locally counted prompt tokens + max_tokens."""
+    return message_tokens(payload.get("messages", [])) + int(payload.get("max_tokens", 0))
+
+
+class _Budget:
+    """One rate-limit window (requests or tokens), refreshed from response headers."""
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.resets_at = 0.0
+
+    def update(self, limit: Optional[str], remaining: Optional[str], reset: Optional[str]) -> None:
+        if remaining is None:
+            return
+        try:
+            reported = int(float(remaining))
+            if limit is not None:
+                self.limit = int(float(limit))
+        except ValueError:
+            return
+        now = time.monotonic()
+        if self.remaining is not None and now < self.resets_at:
+            # Same window: the header predates calls admitted since, so it can
+            # only lower the local count, never raise it back.
+            self.remaining = min(self.remaining, reported)
+        else:
+            self.remaining = reported
+        seconds = parse_reset(reset)
+        # Without a reset hint assume a one-minute window (RPM / TPM).
+        self.resets_at = now + (seconds if seconds is not None else 60.0)
+
+    def refresh(self) -> None:
+        if self.limit is not None and self.resets_at and time.monotonic() >= self.resets_at:
+            self.remaining = self.limit
+            self.resets_at = 0.0
+
+    def allows(self, cost: int, reserve: float) -> bool:
+        """Room for `cost`, keeping `reserve` (fraction of the limit) untouched."""
+        if self.remaining is None:
+            return True  # no headers seen yet
+        held_back = int((self.limit or 0) * reserve)
+        # A request larger than the whole window is let through once it is full.
+        cost = min(cost, max(1, (self.limit or cost) - held_back))
+        return self.remaining - held_back >= cost
+
+    def take(self, cost: int) -> None:
+        if self.remaining is not None:
+            self.remaining -= cost
+
+    def give_back(self, cost: int) -> None:
+        """Undo take() for a call that was admitted but never sent."""
+        if self.remaining is not None:
+            self.remaining += cost
+            if self.limit is not None:
+                self.remaining = min(self.remaining, self.limit)
+
+
+class GroqScheduler:
+    """Admits Groq calls against the RPM/TPM budgets, highest priority first.
+
+    Budgets come from the x-ratelimit-* headers of every response, with
+    local deductions in between. BACKGROUND work leaves GROQ_BACKGROUND_RESERVE
+    of each window for interactive calls. Retryable failures (429, 5xx,
+    transport errors) are retried with full-jitter backoff, honouring
+    Retry-After; a 429 also pauses admission for everyone until it expires.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = settings.GROQ_MAX_RETRIES,
+        backoff_base: float = settings.GROQ_BACKOFF_BASE,
+        backoff_max: float = settings.GROQ_BACKOFF_MAX,
+        background_reserve: float = settings.GROQ_BACKGROUND_RESERVE,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.background_reserve = background_reserve
+        self.requests = _Budget()
+        self.tokens = _Budget()
+        self.paused_until = 0.0
+        # Until a response shows whether Groq sends budgets, send one probe at a time
+        # so a cold-start burst cannot blow through the window.
+        self.limits_known: Optional[bool] = None
+        self._probing = False
+        self._waiters: list = []  # heap of (priority, seq, cost, future)
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    # ── Admission ──
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _admissible(self, priority: int, cost: int) -> bool:
+        if time.monotonic() < self.paused_until:
+            return False
+        if self.limits_known is None and self._probing:
+            return False
+        reserve = self.background_reserve if priority >= BACKGROUND else 0.0
+        return self.requests.allows(1, reserve) and self.tokens.allows(cost, reserve)
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        self.requests.refresh()
+        self.tokens.refresh()
+        while self._waiters:
+            priority, _, cost, future = self._waiters[0]
+            if future.done():  # cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if not self._admissible(priority, cost):
+                break
+            heapq.heappop(self._waiters)
+            if self.limits_known is None:
+                self._probing = True
+            self.requests.take(1)
+            self.tokens.take(cost)
+            future.set_result(None)
+        if self._waiters:
+            self._wake_later()
+
+    def _wake_later(self) -> None:
+        if self._timer is not None:
+            return
+        now = time.monotonic()
+        candidates = [t for t in (self.paused_until, self.requests.resets_at, self.tokens.resets_at) if t > now]
+        delay = min(candidates) - now if candidates else 0.5
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.01), self._dispatch)
+
+    async def acquire(self, priority: int, cost: int) -> None:
+        """Wait for a slot. Lower-priority waiters never jump ahead of higher ones."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), cost, future))
+        self._dispatch()
+        started = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted in the same tick the caller was cancelled (a client
+                # disconnect): nothing was sent, so hand back the slot and the
+                # probe, or a cold start would wait on a probe that never ends.
+                self.requests.give_back(1)
+                self.tokens.give_back(cost)
+                self._probing = False
+                self._dispatch()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            metrics.observe("groq_queue", time.perf_counter() - started)
+
+    # ── Responses ──
+
+    def observe_response(self, response: httpx.Response) -> None:
+        h = response.headers
+        if self.limits_known is None:
+            self.limits_known = "x-ratelimit-remaining-requests" in h
+        self.requests.update(
+            h.get("x-ratelimit-limit-requests"),
+            h.get("x-ratelimit-remaining-requests"),
+            h.get("x-ratelimit-reset-requests"),
+        )
+        self.tokens.update(
+            h.get("x-ratelimit-limit-tokens"),
+            h.get("x-ratelimit-remaining-tokens"),
+            h.get("x-ratelimit-reset-tokens"),
+        )
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    # ── Entry point ──
+
+    async def send(
+        self,
+        make_request: Callable[[], Awaitable[httpx.Response]],
+        priority: int = INTERACTIVE,
+        cost: int = 0,
+    ) -> httpx.Response:
+        """Run `make_request` under the budget, retrying retryable failures.
+
+        For streaming calls `make_request` should return an unread response
+        (client.send(..., stream=True)); retries then only happen before the
+        first byte, and the caller owns closing the returned response.
+        """
+        retry_after = None
+        for attempt in range(self.max_retries + 1):
+            error = None
+            await self.acquire(priority, cost)
+            try:
+                response = await make_request()
+            except httpx.TransportError as e:
+                reason, retry_after, error = "transport", None, e
+            else:
+                self.observe_response(response)
+                if response.status_code in RETRYABLE_STATUS:
+                    retry_after = parse_reset(response.headers.get("retry-after"))
+                    reason = "429" if response.status_code == 429 else "5xx"
+                    error = httpx.HTTPStatusError(
+                        f"Groq returned {response.status_code}",
+                        request=response.request,
+                        response=response,
+                    )
+                    if response.status_code == 429:
+                        pause = time.monotonic() + (retry_after or 1.0)
+                        self.paused_until = max(self.paused_until, pause)
+                    await response.aclose()
+            finally:
+                self._probing = False
+                self._dispatch()
+            if error is None:
+                return response
+
+            if attempt == self.max_retries:
+                break
+            metrics.GROQ_RETRIES.labels(reason).inc()
+            delay = self._backoff(attempt, retry_after)
+            logger.warning(f"⚠️  Groq {reason} error, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        raise GroqUnavailableError(f"Groq unavailable after {self.max_retries} retries: {error}", retry_after)
+
+
+groq_scheduler = GroqScheduler()
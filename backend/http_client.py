@@ -0,0 +1,90 @@
+# http_client.py — Shared, pooled HTTP client for Groq Cloud calls
+
+import logging
+from typing import Optional
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint read timeouts (seconds). Connect/pool timeouts are shared.
+TIMEOUTS = {
+    "note": settings.GROQ_TIMEOUT_NOTE,
+    "stream": settings.GROQ_TIMEOUT_STREAM,
+    "summary": settings.GROQ_TIMEOUT_SUMMARY,
+    "batch": settings.GROQ_TIMEOUT_NOTE,
+    "transcribe": settings.GROQ_TIMEOUT_TRANSCRIBE,
+}
+
+
+def _http2_supported() -> bool:
+    """HTTP/2 needs the optional `h2` package (httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+class GroqHTTPClient:
+    """App-lifetime connection pool for Groq.
+
+    Started and closed from the FastAPI lifespan so every note, summary and
+    transcription reuses warm TCP/TLS connections instead of handshaking per call.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _build(self) -> httpx.AsyncClient:
+        http2 = settings.GROQ_HTTP2
+        if http2 and not _http2_supported():
+            logger.warning("⚠️  GROQ_HTTP2 enabled but `h2` is not installed — using HTTP/1.1")
+            http2 = False
+
+        logger.info(
+            f"Groq HTTP client started (http2={http2}, "
+            f"max_connections={settings.GROQ_MAX_CONNECTIONS})"
+        )
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GROQ_MAX_KEEPALIVE,
+                keepalive_expiry=settings.GROQ_KEEPALIVE_EXPIRY,
+            ),
+            timeout=timeout_for("note"),
+        )
+
+    async def start(self) -> httpx.AsyncClient:
+        """Open the shared client (idempotent)."""
+        return self.client
+
+    async def close(self) -> None:
+        """Close the shared client and release pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Groq HTTP client closed")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Return the shared client, opening it lazily outside the lifespan (scripts)."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build()
+        return self._client
+
+
+def timeout_for(endpoint: str) -> httpx.Timeout:
+    """Build the request timeout for a Groq endpoint ("note", "stream", ...)."""
+    return httpx.Timeout(
+        TIMEOUTS.get(endpoint, settings.GROQ_TIMEOUT_NOTE),
+        connect=settings.GROQ_CONNECT_TIMEOUT,
+        pool=settings.GROQ_POOL_TIMEOUT,
+    )
+
+
+groq_http = GroqHTTPClient()
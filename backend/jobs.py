@@ -0,0 +1,509 @@
+# jobs.py — Bulk encounter export and note regeneration jobs
+#
+# A job walks the matching encounters in keyset order (created_at, id), one
+# batch at a time, decrypting each batch off the event loop. "export" writes
+# them out; "regenerate" re-runs note generation at background scheduler
+# priority, JOBS_CONCURRENCY notes at a time, so interactive traffic keeps its
+# share of the Groq budget. Output is NDJSON or a FHIR R4 Bundle of
+# DocumentReferences. After every batch the job state (cursor, counters, output
+# size) is written atomically to JOBS_DIR; a job interrupted by a crash or
+# restart resumes from there, after truncating any half-written batch.
+#
+# Output files contain PHI in plain text (they are exports): JOBS_DIR must be
+# on an encrypted volume. Files are created owner-only.
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+import metrics
+from audit import log_action
+from autosave import autosave_manager
+from config import settings
+from database import DatabaseUnavailableError, session_scope
+from groq_client import generate_note
+from groq_scheduler import GroqUnavailableError
+from pagination import naive_utc
+
+if TYPE_CHECKING:
+    from memory_store import IndexedStore
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("export", "regenerate")
+FORMATS = ("ndjson", "fhir")
+ACTIVE = ("queued", "running")  # statuses resumed at startup
+_MAX_ERRORS = 20  # per-encounter errors kept in the job state
+
+_FHIR_DOC_STATUS = {"draft": "preliminary", "final": "final", "amended": "amended"}
+_FHIR_HEADER = b'{"resourceType":"Bundle","type":"collection","entry":[\n'
+_FHIR_FOOTER = b"\n]}\n"
+
+
+class SourceUnavailable(Exception):
+    """The encounter store cannot be read right now; the job waits and retries."""
+
+
+# ── Encounter sources ──
+# batch() returns decrypted encounter dicts after `after` (created_at ISO, id),
+# oldest first; created_at is always an ISO string.
+
+def _matches(record: dict, filters: dict) -> bool:
+    created_at = record["created_at"]
+    return (
+        (not filters.get("user_id") or record.get("user_id") == filters["user_id"])
+        and (not filters.get("status") or record.get("status", "draft") == filters["status"])
+        and (not filters.get("template") or record.get("template", "soap") == filters["template"])
+        and (not filters.get("created_from") or created_at >= filters["created_from"])
+        and (not filters.get("created_to") or created_at < filters["created_to"])
+    )
+
+
+class MemorySource:
+    """Stateless mode: the in-memory encounter store."""
+
+    def __init__(self, store: "IndexedStore"):
+        self.store = store
+
+    def _records(self, filters: dict) -> list[dict]:
+        records = [r for _, r in self.store.dump() if _matches(r, filters)]
+        return sorted(records, key=lambda r: (r["created_at"], r["id"]))
+
+    async def count(self, filters: dict) -> int:
+        return len(self._records(filters))
+
+    async def batch(self, filters: dict, after: Optional[list], limit: int) -> list[dict]:
+        records = self._records(filters)
+        if after:
+            records = [r for r in records if (r["created_at"], r["id"]) > tuple(after)]
+        return [
+            {
+                "id": r["id"],
+                "user_id": r.get("user_id"),
+                "patient_id": r.get("patient_id"),
+                "template": r.get("template", "soap"),
+                "specialty": r.get("specialty", "general"),
+                "status": r.get("status", "draft"),
+                "created_at": r["created_at"],
+                "updated_at": r.get("updated_at", r["created_at"]),
+                "transcript": r.get("transcript"),
+                "note": r.get("note"),
+                "patient_summary": r.get("patient_summary"),
+            }
+            for r in records[:limit]
+        ]
+
+    async def save_note(self, encounter_id: str, note: str, details: str) -> None:
+        # Through the autosave manager (same store) so the write takes a new note version.
+        await autosave_manager.save(encounter_id, note, source="regenerate", details=details, create=False)
+
+
+def _decrypt_rows(rows: list) -> list[dict]:
+    """Decrypt one batch of EncounterDB rows (runs in a worker thread)."""
+    from encryption import decrypt_text
+
+    return [
+        {
+            "id": e.id,
+            "user_id": e.user_id,
+            "patient_id": e.patient_id,
+            "template": e.template,
+            "specialty": e.specialty,
+            "status": e.status,
+            "created_at": e.created_at.isoformat(),
+            "updated_at": (e.updated_at or e.created_at).isoformat(),
+            "transcript": decrypt_text(e.transcript_encrypted) if e.transcript_encrypted else None,
+            "note": decrypt_text(e.note_encrypted) if e.note_encrypted else None,
+            "patient_summary": e.patient_summary,
+        }
+        for e in rows
+    ]
+
+
+class DatabaseSource:
+    """The encounters table, read with keyset pagination in ascending order."""
+
+    def _where(self, stmt, filters: dict):
+        from models import EncounterDB
+
+        if filters.get("user_id"):
+            stmt = stmt.where(EncounterDB.user_id == filters["user_id"])
+        if filters.get("status"):
+            stmt = stmt.where(EncounterDB.status == filters["status"])
+        if filters.get("template"):
+            stmt = stmt.where(EncounterDB.template == filters["template"])
+        if filters.get("created_from"):
+            stmt = stmt.where(EncounterDB.created_at >= datetime.fromisoformat(filters["created_from"]))
+        if filters.get("created_to"):
+            stmt = stmt.where(EncounterDB.created_at < datetime.fromisoformat(filters["created_to"]))
+        return stmt
+
+    async def count(self, filters: dict) -> int:
+        from sqlalchemy import func, select
+        from models import EncounterDB
+
+        async with session_scope() as db:
+            if db is None:
+                raise SourceUnavailable("Database unavailable")
+            stmt = self._where(select(func.count()).select_from(EncounterDB), filters)
+            return (await db.execute(stmt)).scalar_one()
+
+    async def batch(self, filters: dict, after: Optional[list], limit: int) -> list[dict]:
+        from sqlalchemy import and_, or_, select
+        from models import EncounterDB
+
+        async with session_scope() as db:
+            if db is None:
+                raise SourceUnavailable("Database unavailable")
+            stmt = self._where(select(EncounterDB), filters)
+            if after:
+                at, last_id = datetime.fromisoformat(after[0]), after[1]
+                stmt = stmt.where(
+                    EncounterDB.created_at >= at,  # redundant, but lets ix_encounters_created seek
+                    or_(
+                        EncounterDB.created_at > at,
+                        and_(EncounterDB.created_at == at, EncounterDB.id > last_id),
+                    )
+                )
+            stmt = stmt.order_by(EncounterDB.created_at, EncounterDB.id).limit(limit)
+            rows = list((await db.execute(stmt)).scalars().all())
+        return await asyncio.to_thread(_decrypt_rows, rows)
+
+    async def save_note(self, encounter_id: str, note: str, details: str) -> None:
+        # Through the autosave manager so the write takes a new note version and
+        # an editor still on the old one gets a 409 instead of a silent overwrite.
+        try:
+            await autosave_manager.save(encounter_id, note, source="regenerate", details=details, create=False)
+        except DatabaseUnavailableError as e:
+            raise SourceUnavailable(str(e))
+
+
+# ── Output ──
+
+def _fhir_entry(record: dict, note: str) -> dict:
+    """One encounter note as a FHIR R4 DocumentReference bundle entry."""
+    resource = {
+        "resourceType": "DocumentReference",
+        "id": record["id"],
+        "status": "current",
+        "docStatus": _FHIR_DOC_STATUS.get(record.get("status"), "preliminary"),
+        "type": {"text": f"Clinical note ({record.get('template', 'soap')})"},
+        "date": record["updated_at"] + "Z",
+        "content": [
+            {
+                "attachment": {
+                    "contentType": "text/markdown; charset=utf-8",
+                    "data": base64.b64encode(note.encode("utf-8")).decode("ascii"),
+                }
+            }
+        ],
+        "context": {"related": [{"reference": f"Encounter/{record['id']}"}]},
+    }
+    if record.get("patient_id"):
+        resource["subject"] = {"reference": f"Patient/{record['patient_id']}"}
+    if record.get("user_id"):
+        resource["author"] = [{"reference": f"Practitioner/{record['user_id']}"}]
+    return {"fullUrl": f"urn:uuid:{record['id']}", "resource": resource}
+
+
+def _write_chunk(path: str, offset: int, data: bytes, fsync: bool = True) -> int:
+    """Write `data` at `offset` (dropping anything after it); returns the new size."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        os.ftruncate(fd, offset)
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
+        if fsync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    return offset + len(data)
+
+
+# ── Jobs ──
+
+def _naive_iso(value):
+    """Datetimes as naive-UTC ISO strings, the form created_at is stored in."""
+    if not isinstance(value, datetime):
+        return value
+    return naive_utc(value).isoformat()
+
+
+class Job:
+    """State of one job; everything in `state` is persisted after each batch."""
+
+    def __init__(self, state: dict, directory: str):
+        self.state = state
+        self.task: Optional[asyncio.Task] = None
+        self.cancel_requested = False
+        self.state_path = os.path.join(directory, f"{state['id']}.json")
+        extension = "ndjson" if state["format"] == "ndjson" else "fhir.json"
+        self.output_path = os.path.join(directory, f"{state['id']}.{extension}")
+
+    @property
+    def id(self) -> str:
+        return self.state["id"]
+
+    def save(self) -> None:
+        """Atomically replace the state file."""
+        self.state["updated_at"] = datetime.utcnow().isoformat()
+        tmp_path = f"{self.state_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    def public(self) -> dict:
+        return {k: v for k, v in self.state.items() if k != "cursor"}
+
+
+class JobManager:
+    """Runs bulk jobs: at most JOBS_MAX_RUNNING at once, the rest queued."""
+
+    def __init__(
+        self,
+        directory: str = settings.JOBS_DIR,
+        batch_size: int = settings.JOBS_BATCH_SIZE,
+        concurrency: int = settings.JOBS_CONCURRENCY,
+        max_running: int = settings.JOBS_MAX_RUNNING,
+    ):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_running = max_running
+        self.source = None
+        self._jobs: dict[str, Job] = {}
+        self._running: Optional[asyncio.Semaphore] = None
+        self._generations: Optional[asyncio.Semaphore] = None  # shared by all jobs
+
+    def start(self, source) -> int:
+        """Attach the encounter source and resume jobs left active by the last run."""
+        self.source = source
+        self._running = asyncio.Semaphore(self.max_running)
+        self._generations = asyncio.Semaphore(self.concurrency)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        resumed = 0
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json") or name.endswith(".fhir.json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    job = Job(json.load(f), self.directory)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"⚠️  Skipping unreadable job state {name}: {e!r}")
+                continue
+            self._jobs[job.id] = job
+            if job.state["status"] in ACTIVE:
+                job.state["status"] = "queued"
+                job.task = asyncio.create_task(self._run(job))
+                resumed += 1
+        if resumed:
+            logger.info(f"Resuming {resumed} bulk job(s) from their checkpoints")
+        return resumed
+
+    def submit(self, spec: dict) -> Job:
+        """Create and queue a job; `spec` is a validated JobRequest dict."""
+        if self.source is None:
+            raise RuntimeError("Job manager not started")
+        state = {
+            "id": uuid.uuid4().hex,
+            "kind": spec["kind"],
+            "format": spec["format"],
+            "filters": {k: _naive_iso(v) for k, v in spec.get("filters", {}).items() if v},
+            "target_template": spec.get("target_template"),
+            "write_back": bool(spec.get("write_back")),
+            "status": "queued",
+            "total": None,
+            "processed": 0,
+            "failed": 0,
+            "skipped": 0,
+            "errors": [],
+            "cursor": None,
+            "output_bytes": 0,
+            "created_at": datetime.utcnow().isoformat(),
+            "error": None,
+        }
+        job = Job(state, self.directory)
+        job.save()
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def all(self) -> list[Job]:
+        return sorted(self._jobs.values(), key=lambda j: j.state["created_at"], reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Stop a queued or running job; its output so far is kept."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.state["status"] in ACTIVE and job.task is not None:
+            job.cancel_requested = True
+            job.task.cancel()
+        return job
+
+    async def close(self) -> None:
+        """App shutdown: stop jobs but leave them active, so the next start resumes them."""
+        tasks = [j.task for j in self._jobs.values() if j.task is not None and not j.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ── Running ──
+
+    async def _run(self, job: Job) -> None:
+        try:
+            async with self._running:
+                with metrics.operation("job"):
+                    await self._execute(job)
+        except asyncio.CancelledError:
+            if job.cancel_requested:
+                job.state["status"] = "cancelled"
+                job.save()
+                await log_action(user_id="system", action="job_cancelled", details=f"job={job.id}")
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️  Bulk job {job.id} failed: {e!r}")
+            job.state["status"] = "failed"
+            job.state["error"] = str(e)
+            job.save()
+
+    async def _execute(self, job: Job) -> None:
+        state = job.state
+        state["status"] = "running"
+        if state["total"] is None:
+            state["total"] = await self._with_source(self.source.count, state["filters"])
+        job.save()
+        if state["output_bytes"] == 0 and state["format"] == "fhir":
+            state["output_bytes"] = await asyncio.to_thread(
+                _write_chunk, job.output_path, 0, _FHIR_HEADER
+            )
+            job.save()
+
+        while True:
+            records = await self._with_source(
+                self.source.batch, state["filters"], state["cursor"], self.batch_size
+            )
+            if not records:
+                break
+            if state["kind"] == "regenerate":
+                results = await asyncio.gather(*(self._regenerate(job, r) for r in records))
+            else:
+                results = [self._export(job, r) for r in records]
+
+            lines = [line for line in results if line is not None]
+            # Everything up to this offset is complete; a crash mid-write is cut off on resume.
+            data = self._serialize(job, lines)
+            state["output_bytes"] = await asyncio.to_thread(
+                _write_chunk, job.output_path, state["output_bytes"], data
+            )
+            state["cursor"] = [records[-1]["created_at"], records[-1]["id"]]
+            job.save()
+
+        if state["format"] == "fhir":
+            state["output_bytes"] = await asyncio.to_thread(
+                _write_chunk, job.output_path, state["output_bytes"], _FHIR_FOOTER
+            )
+        state["status"] = "completed"
+        job.save()
+        await log_action(
+            user_id="system",
+            action="job_completed",
+            details=(
+                f"job={job.id}, kind={state['kind']}, processed={state['processed']}, "
+                f"failed={state['failed']}, skipped={state['skipped']}"
+            ),
+        )
+
+    async def _with_source(self, fn, *args):
+        """Call the source, waiting out database outages instead of failing the job."""
+        while True:
+            try:
+                return await fn(*args)
+            except SourceUnavailable:
+                await asyncio.sleep(settings.DB_HEALTH_INTERVAL)
+
+    def _serialize(self, job: Job, lines: list[dict]) -> bytes:
+        if job.state["format"] == "ndjson":
+            return b"".join(json.dumps(line).encode("utf-8") + b"\n" for line in lines)
+        entries = [
+            json.dumps(_fhir_entry(line["record"], line["note"])).encode("utf-8")
+            for line in lines
+            if line.get("note")
+        ]
+        if not entries:
+            return b""
+        # Entries are comma-separated; the first one follows the header directly.
+        first = job.state["output_bytes"] == len(_FHIR_HEADER)
+        return (b"" if first else b",\n") + b",\n".join(entries)
+
+    def _error(self, job: Job, record: dict, message: str) -> dict:
+        job.state["failed"] += 1
+        if len(job.state["errors"]) < _MAX_ERRORS:
+            job.state["errors"].append({"encounter_id": record["id"], "error": message})
+        return {"encounter_id": record["id"], "error": message}
+
+    def _export(self, job: Job, record: dict) -> Optional[dict]:
+        if not record.get("note"):
+            job.state["skipped"] += 1
+            return None
+        job.state["processed"] += 1
+        if job.state["format"] == "fhir":
+            return {"record": record, "note": record["note"]}
+        return {
+            "encounter_id": record["id"],
+            **{k: v for k, v in record.items() if k != "id"},
+        }
+
+    async def _regenerate(self, job: Job, record: dict) -> Optional[dict]:
+        if not record.get("transcript"):
+            job.state["skipped"] += 1  # only the note was saved; nothing to regenerate from
+            return None
+        template = job.state["target_template"] or record["template"]
+        note = None
+        for attempt in range(settings.JOBS_ITEM_RETRIES + 1):
+            try:
+                async with self._generations:
+                    with metrics.stage("generation"):
+                        note = await generate_note(
+                            record["transcript"],
+                            template,
+                            record["specialty"],
+                            use_cache=False,
+                            endpoint="batch",
+                        )
+                break
+            except GroqUnavailableError as e:
+                # The scheduler already retried; back off for the rate-limit window.
+                if attempt == settings.JOBS_ITEM_RETRIES:
+                    return self._error(job, record, str(e))
+                await asyncio.sleep(e.retry_after or settings.GROQ_BACKOFF_MAX)
+            except Exception as e:
+                return self._error(job, record, str(e))
+
+        if job.state["write_back"] and record.get("status", "draft") == "draft":
+            await self._with_source(self.source.save_note, record["id"], note, f"job={job.id}, template={template}")
+        await log_action(
+            user_id="system",
+            action="note_regenerated",
+            resource_type="encounter",
+            resource_id=record["id"],
+            details=f"job={job.id}, template={template}",
+        )
+        job.state["processed"] += 1
+        if job.state["format"] == "fhir":
+            return {"record": {**record, "template": template}, "note": note}
+        return {"encounter_id": record["id"], "template": template, "note": note}
+
+
+job_manager = JobManager()
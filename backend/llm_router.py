@@ -0,0 +1,356 @@
+# llm_router.py — OpenAI-compatible LLM providers: latency routing, hedging, failover
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import AsyncGenerator, Optional
+
+import httpx
+
+import metrics
+from config import settings
+from groq_scheduler import (
+    INTERACTIVE,
+    GroqScheduler,
+    GroqUnavailableError,
+    estimate_tokens,
+    groq_scheduler,
+)
+from http_client import groq_http, timeout_for
+
+logger = logging.getLogger(__name__)
+
+_EWMA_ALPHA = 0.2
+# Share of calls sent to the runner-up so its latency estimate stays fresh.
+_EXPLORE_RATE = 0.05
+# Failures that say nothing about the request itself: try the next provider.
+PROVIDER_ERRORS = (GroqUnavailableError, httpx.HTTPError, KeyError, IndexError, ValueError)
+# Statuses that mean the provider (not the prompt) is the problem.
+_PROVIDER_STATUS = {401, 403, 404, 408, 429}
+
+
+def _is_request_error(error: Exception) -> bool:
+    """A 4xx caused by the request itself (bad params, prompt too long): no failover."""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    status = error.response.status_code
+    return 400 <= status < 500 and status not in _PROVIDER_STATUS
+
+
+class Provider:
+    """One OpenAI-compatible chat endpoint with its own rate-limit scheduler."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        model: str,
+        api_key: str = "",
+        scheduler: Optional[GroqScheduler] = None,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+        self.scheduler = scheduler or GroqScheduler()
+        # EWMA seconds: full response for "complete", first token for "stream".
+        self.latency: dict[str, Optional[float]] = {"complete": None, "stream": None}
+        self.down_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def record_latency(self, kind: str, seconds: float) -> None:
+        previous = self.latency[kind]
+        self.latency[kind] = (
+            seconds if previous is None else previous + _EWMA_ALPHA * (seconds - previous)
+        )
+
+    def record_failure(self, error: Exception) -> None:
+        self.down_until = time.monotonic() + settings.LLM_FAILURE_COOLDOWN
+        metrics.LLM_ROUTING.labels(self.name, "error").inc()
+        logger.warning(f"⚠️  LLM provider {self.name} failed, deprioritised: {error!r}")
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "healthy": self.healthy,
+            "latency": {k: round(v, 3) if v is not None else None for k, v in self.latency.items()},
+        }
+
+    def _post(self, body: dict, endpoint: str, stream: bool = False):
+        client = groq_http.client
+        request = client.build_request(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            headers=self.headers,
+            json=body,
+            timeout=timeout_for(endpoint),
+        )
+        return lambda: client.send(request, stream=stream)
+
+    async def complete(self, payload: dict, endpoint: str, priority: int) -> tuple[str, dict]:
+        """Non-streaming completion; returns (content, usage)."""
+        body = {**payload, "model": self.model}
+        response = await self.scheduler.send(
+            self._post(body, endpoint), priority=priority, cost=estimate_tokens(body)
+        )
+        response.raise_for_status()
+        data = response.json()
+        content = data["choices"][0]["message"]["content"]
+        return content, data.get("usage") or {}
+
+    async def stream(
+        self, payload: dict, endpoint: str, priority: int, usage: dict
+    ) -> AsyncGenerator[str, None]:
+        """Streaming completion; yields content deltas and fills `usage` at the end."""
+        body = {**payload, "model": self.model, "stream": True}
+        response = await self.scheduler.send(
+            self._post(body, endpoint, stream=True), priority=priority, cost=estimate_tokens(body)
+        )
+        try:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                chunk = json.loads(line[6:])
+                # Groq reports usage under x_groq on the final chunk, OpenAI at top level
+                chunk_usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+                if chunk_usage:
+                    usage.update(chunk_usage)
+                if not chunk.get("choices"):
+                    continue
+                content = chunk["choices"][0].get("delta", {}).get("content", "")
+                if content:
+                    yield content
+        finally:
+            await response.aclose()
+
+
+async def _first(stream: AsyncGenerator[str, None]) -> Optional[str]:
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+class LLMRouter:
+    """Routes chat calls across providers by observed latency.
+
+    Interactive calls are hedged: if the preferred provider has not produced
+    its first token (stream) or response (non-streaming) by the deadline, the
+    same request goes to the next provider, the first to answer wins and the
+    other is cancelled. A provider that errors is skipped for
+    LLM_FAILURE_COOLDOWN seconds and the call fails over to the next one.
+    Background calls are never hedged, only failed over.
+    """
+
+    def __init__(
+        self,
+        providers: list[Provider],
+        hedge_ttft: float = settings.LLM_HEDGE_TTFT,
+        hedge_completion: float = settings.LLM_HEDGE_COMPLETION,
+    ):
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+        self.providers = providers
+        self.hedge_ttft = hedge_ttft
+        self.hedge_completion = hedge_completion
+
+    def ranked(self, kind: str) -> list[Provider]:
+        """Healthy providers first, then by latency; unmeasured keep config order.
+
+        Occasionally the top two swap, so a provider that fell behind after a
+        slow spell gets measured again instead of being shunned for good.
+        """
+        order = {id(p): i for i, p in enumerate(self.providers)}
+
+        def key(p: Provider):
+            latency = p.latency[kind]
+            return (not p.healthy, latency if latency is not None else float("inf"), order[id(p)])
+
+        ranked = sorted(self.providers, key=key)
+        if len(ranked) > 1 and ranked[1].healthy and random.random() < _EXPLORE_RATE:
+            ranked[0], ranked[1] = ranked[1], ranked[0]
+        return ranked
+
+    def status(self) -> list[dict]:
+        return [p.status() for p in self.providers]
+
+    @staticmethod
+    def _unavailable(error: Optional[Exception]) -> GroqUnavailableError:
+        retry_after = getattr(error, "retry_after", None)
+        return GroqUnavailableError(f"All LLM providers failed: {error}", retry_after)
+
+    @staticmethod
+    def _cancelled(provider: Provider, kind: str, elapsed: float, deadline: float) -> None:
+        # A hedge loser cost the caller at least the deadline: count that much,
+        # so a provider that keeps missing it drifts down the ranking.
+        seconds = min(elapsed, deadline) if deadline > 0 else elapsed
+        if seconds > (provider.latency[kind] or 0.0):
+            provider.record_latency(kind, seconds)
+        metrics.LLM_ROUTING.labels(provider.name, "cancelled").inc()
+
+    async def complete(
+        self, payload: dict, endpoint: str = "note", priority: int = INTERACTIVE
+    ) -> tuple[str, dict]:
+        """Non-streaming completion with hedging and failover; (content, usage)."""
+        candidates = self.ranked("complete")
+        hedge_after = self.hedge_completion if priority == INTERACTIVE else 0.0
+        pending: dict[asyncio.Task, tuple[Provider, float]] = {}
+        error: Optional[Exception] = None
+
+        def launch(outcome: str) -> None:
+            provider = candidates.pop(0)
+            metrics.LLM_ROUTING.labels(provider.name, outcome).inc()
+            task = asyncio.create_task(provider.complete(payload, endpoint, priority))
+            pending[task] = (provider, time.monotonic())
+
+        launch("primary")
+        try:
+            while pending:
+                timeout = hedge_after if hedge_after > 0 and candidates else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    launch("hedge")  # response deadline missed
+                    continue
+                for task in done:
+                    provider, started = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except PROVIDER_ERRORS as e:
+                        if _is_request_error(e):
+                            raise
+                        error = e
+                        provider.record_failure(e)
+                        if candidates and not pending:
+                            launch("failover")
+                        continue
+                    provider.record_latency("complete", time.monotonic() - started)
+                    return result
+            raise self._unavailable(error)
+        finally:
+            for task, (provider, started) in pending.items():
+                task.cancel()
+                self._cancelled(provider, "complete", time.monotonic() - started, hedge_after)
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def stream(
+        self,
+        payload: dict,
+        endpoint: str = "stream",
+        priority: int = INTERACTIVE,
+        usage: Optional[dict] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Streaming completion; hedging and failover happen before the first token.
+
+        Once a provider has produced a token it owns the stream: a later error
+        propagates, since the tokens already sent cannot be taken back.
+        """
+        candidates = self.ranked("stream")
+        hedge_after = self.hedge_ttft if priority == INTERACTIVE else 0.0
+        # first-token task -> (provider, stream, usage, started)
+        pending: dict[asyncio.Task, tuple] = {}
+        error: Optional[Exception] = None
+        winner = None
+        first: Optional[str] = None
+
+        def launch(outcome: str) -> None:
+            provider = candidates.pop(0)
+            metrics.LLM_ROUTING.labels(provider.name, outcome).inc()
+            attempt_usage: dict = {}
+            gen = provider.stream(payload, endpoint, priority, attempt_usage)
+            pending[asyncio.create_task(_first(gen))] = (
+                provider, gen, attempt_usage, time.monotonic()
+            )
+
+        launch("primary")
+        try:
+            while pending and winner is None:
+                timeout = hedge_after if hedge_after > 0 and candidates else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    launch("hedge")  # first-token deadline missed
+                    continue
+                for task in done:
+                    attempt = pending.pop(task)
+                    provider, gen, _, started = attempt
+                    try:
+                        token = task.result()
+                    except PROVIDER_ERRORS as e:
+                        await gen.aclose()
+                        if _is_request_error(e):
+                            raise
+                        error = e
+                        provider.record_failure(e)
+                        if candidates and not pending:
+                            launch("failover")
+                        continue
+                    if winner is None:
+                        provider.record_latency("stream", time.monotonic() - started)
+                        winner, first = attempt, token
+                    else:  # finished in the same tick: drop it
+                        await gen.aclose()
+        finally:
+            for task, (provider, gen, _, started) in pending.items():
+                task.cancel()
+                self._cancelled(provider, "stream", time.monotonic() - started, hedge_after)
+            await asyncio.gather(*pending, return_exceptions=True)
+            for _, gen, _, _ in pending.values():
+                await gen.aclose()
+
+        if winner is None:
+            raise self._unavailable(error)
+        provider, gen, attempt_usage, _ = winner
+        try:
+            if first is not None:
+                yield first
+                async for content in gen:
+                    yield content
+        except PROVIDER_ERRORS as e:
+            provider.record_failure(e)
+            raise
+        finally:
+            await gen.aclose()
+            if usage is not None:
+                usage.update(attempt_usage)
+
+
+def _provider(name: str) -> Optional[Provider]:
+    """Provider `name` from settings; None (left off) if its base URL is not set."""
+    if name == "groq":
+        return Provider(
+            "groq",
+            settings.GROQ_BASE_URL,
+            settings.GROQ_MODEL,
+            settings.GROQ_API_KEY,
+            scheduler=groq_scheduler,
+        )
+    prefix = name.upper()
+    base_url = os.getenv(f"{prefix}_LLM_BASE_URL")
+    if not base_url:
+        # No default: vLLM's usual :8000 is the port this API listens on.
+        logger.warning(f"⚠️  LLM provider {name!r} skipped: {prefix}_LLM_BASE_URL is not set")
+        return None
+    return Provider(
+        name,
+        base_url,
+        os.getenv(f"{prefix}_LLM_MODEL", settings.GROQ_MODEL),
+        os.getenv(f"{prefix}_LLM_API_KEY", ""),
+    )
+
+
+llm_router = LLMRouter(
+    [p for p in (_provider(name) for name in settings.LLM_PROVIDERS) if p is not None]
+)
@@ -1,12 +1,27 @@
 # main.py — MedScribe API Server
 
+import json
 import os
+import time
 import uuid
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import TYPE_CHECKING, AsyncGenerator, Optional
 
-from fastapi import FastAPI, WebSocket, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, WebSocket, UploadFile, File, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi.websockets import WebSocketState
+
+try:
+    from sqlalchemy import select
+except ImportError:  # stateless mode without SQLAlchemy
+    select = None
+
+if TYPE_CHECKING:  # the async stack is imported lazily by database.init_db()
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import settings
 from models import (
@@ -17,17 +32,52 @@ from models import (
     LoginResponse,
     RegisterRequest,
     SaveNoteRequest,
+    NoteDeltaRequest,
     EncounterResponse,
+    EncounterPage,
+    PatientSummaryRequest,
+    JobRequest,
+)
+from groq_client import (
+    generate_note,
+    stream_note,
+    generate_patient_summary,
+    stream_patient_summary,
 )
-from groq_client import generate_note, stream_note, generate_patient_summary
 from auth import (
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
     create_access_token,
     get_user_from_token,
+    revoke_token,
+)
+from autosave import DraftConflictError, DraftNotFoundError, autosave_manager
+from audit import audit_writer, log_action, get_audit_log, _memory_log
+from database import (
+    DatabaseUnavailableError,
+    close_db,
+    get_db,
+    init_db,
+    is_db_available,
+    is_db_configured,
+    session_scope,
 )
-from audit import log_action, get_audit_log
-from database import get_db, is_db_available
+from cancellation import ClientDisconnected, run_until_disconnect
+from crypto_pool import CryptoBusyError, crypto_pool
+from generations import note_generations
+from groq_scheduler import GroqUnavailableError
+from http_client import groq_http
+from jobs import FORMATS, KINDS, DatabaseSource, MemorySource, job_manager
+from llm_router import llm_router
+import metrics
+from memory_store import IndexedStore, load_snapshot, save_snapshot
+from pagination import decode_cursor, encode_cursor, naive_utc
+from note_sections import SectionTracker
+from prompt_tokens import PromptTooLargeError
+from segments import prepare_segments
+from transcribe_stream import StreamingTranscriber
+from whisper_pool import PoolFullError, whisper_pool
+from ws_stream import NoteFrameWriter, coalesce, coalesce_options, send_note_stream
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -39,11 +89,63 @@ if settings.STT_PROVIDER == "local":
 else:
     from transcribe_groq import transcribe_audio
 
+
+# ── Lifespan ──
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown."""
+    await init_db()
+    snapshot = settings.MEMORY_SNAPSHOT_PATH and not is_db_available()
+    if snapshot:
+        load_snapshot(
+            settings.MEMORY_SNAPSHOT_PATH,
+            users=_users_store,
+            encounters=_encounters_store,
+            audit=_memory_log,
+        )
+    audit_writer.start()
+    await groq_http.start()
+    job_manager.start(DatabaseSource() if is_db_configured() else MemorySource(_encounters_store))
+    autosave_manager.start(_encounters_store)
+    # Models load in the background; /health/ready reports when they are warm.
+    warmup = (
+        asyncio.create_task(whisper_pool.warm_up())
+        if settings.STT_PROVIDER == "local"
+        else None
+    )
+    try:
+        yield
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+        await autosave_manager.flush_all()
+        await job_manager.close()  # left "running": resumed from the checkpoint next start
+        whisper_pool.shutdown()
+        crypto_pool.shutdown()
+        await note_generations.close()
+        await groq_http.close()
+        await audit_writer.stop()
+        await close_db()
+        if snapshot:
+            save_snapshot(
+                settings.MEMORY_SNAPSHOT_PATH,
+                users=_users_store,
+                encounters=_encounters_store,
+                audit=_memory_log,
+            )
+
+
 # ── FastAPI App ──
 app = FastAPI(
     title="MedScribe API",
     version="1.0.0",
     description="Ambient AI Clinical Documentation Engine — Powered by Groq + MedGemma",
+    lifespan=lifespan,
+)
+
+app.add_middleware(metrics.RequestTimerMiddleware)
+metrics.install_pool_gauges(
+    whisper_pool if settings.STT_PROVIDER == "local" else None, crypto_pool
 )
 
 # CORS
@@ -56,66 +158,253 @@ app.add_middleware(
 )
 
 # ── In-memory stores (used when DB is unavailable) ──
-_users_store: dict = {}  # email -> user dict
-_encounters_store: dict = {}  # id -> encounter dict
+_users_store = IndexedStore(  # email -> user dict
+    max_items=settings.MEMORY_MAX_USERS,
+    policy=settings.MEMORY_EVICTION_POLICY,
+)
+_encounters_store = IndexedStore(  # id -> encounter dict, indexed by user_id
+    max_items=settings.MEMORY_MAX_ENCOUNTERS,
+    max_bytes=settings.MEMORY_MAX_ENCOUNTER_MB * 1024 * 1024,
+    index_field="user_id",
+    policy=settings.MEMORY_EVICTION_POLICY,
+)
 
 
 # ── Health Check ──
+def _readiness() -> dict:
+    """Dependency checks behind /health/ready. Stateless mode is only "ok" by design."""
+    if not is_db_configured():
+        database = "stateless"
+    else:
+        database = "connected" if is_db_available() else "unavailable"
+    checks = {"database": database}
+    if settings.STT_PROVIDER == "local":
+        checks["stt"] = whisper_pool.state
+    ready = database != "unavailable" and checks.get("stt", "ready") == "ready"
+    return {"ready": ready, "checks": checks}
+
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving the event loop."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: 503 until the DB (if configured) and STT models are up."""
+    result = _readiness()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {
         "status": "healthy",
+        "ready": _readiness()["ready"],
         "timestamp": datetime.utcnow().isoformat(),
         "database": "connected" if is_db_available() else "stateless",
         "model": settings.GROQ_MODEL,
+        "llm_providers": llm_router.status(),
         "stt_provider": settings.STT_PROVIDER,
+        "stt_queue": (
+            {"in_flight": whisper_pool.in_flight, "capacity": whisper_pool.capacity}
+            if settings.STT_PROVIDER == "local"
+            else None
+        ),
     }
 
 
+@app.exception_handler(GroqUnavailableError)
+async def groq_unavailable_handler(request: Request, exc: GroqUnavailableError):
+    """Upstream rate limits / outages → 503 with a Retry-After hint, not a 500."""
+    headers = {"Retry-After": str(max(1, round(exc.retry_after or 1)))}
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers=headers)
+
+
+@app.exception_handler(PromptTooLargeError)
+async def prompt_too_large_handler(request: Request, exc: PromptTooLargeError):
+    """Transcript over NOTE_MAX_TRANSCRIPT_TOKENS → 413 before anything is sent upstream."""
+    return JSONResponse({"detail": str(exc)}, status_code=413)
+
+
+@app.exception_handler(DraftConflictError)
+async def draft_conflict_handler(request: Request, exc: DraftConflictError):
+    """Autosave ops against a stale version → 409 with the draft to resync from."""
+    return JSONResponse({"detail": str(exc), "version": exc.version, "note": exc.note}, status_code=409)
+
+
+@app.exception_handler(DatabaseUnavailableError)
+async def database_unavailable_handler(request: Request, exc: DatabaseUnavailableError):
+    """A write during a database outage → 503; the memory stores are for stateless mode only."""
+    headers = {"Retry-After": str(round(settings.DB_HEALTH_INTERVAL))}
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers=headers)
+
+
+@app.exception_handler(CryptoBusyError)
+async def crypto_busy_handler(request: Request, exc: CryptoBusyError):
+    """Login/register storm beyond the crypto queue → 503, retry shortly."""
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    """The client is gone and its work was cancelled; 499 only shows up in logs."""
+    return Response(status_code=499)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint (label values never contain PHI)."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 # ── Transcription ──
 @app.post("/api/transcribe", response_model=TranscriptResponse)
-async def transcribe(audio: UploadFile = File(...)):
-    """Upload audio file → get transcript."""
-    temp_path = f"/tmp/{uuid.uuid4()}.wav"
-    try:
-        with open(temp_path, "wb") as f:
-            content = await audio.read()
-            f.write(content)
+@metrics.track("transcribe")
+async def transcribe(request: Request, audio: UploadFile = File(...)):
+    """Upload audio file → get transcript + speaker-labelled timestamped segments.
 
-        result = await transcribe_audio(temp_path)
+    The upload is handed to the STT provider as the UploadFile spool and read
+    in chunks from there — no full in-memory copy and no extra temp file.
+    """
+    metrics.observe("upload", time.perf_counter() - request.state.started_at)
+    try:
+        with metrics.stage("stt"):
+            result = await transcribe_audio(
+                audio.file,
+                filename=audio.filename or "recording.webm",
+                content_type=audio.content_type or "application/octet-stream",
+            )
+    except PoolFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
+    with metrics.stage("audit_write"):
         await log_action(
             user_id="system",
             action="transcribe",
             details=f"duration={result.get('duration', 0)}s",
         )
 
-        return TranscriptResponse(
-            transcript=result["transcript"],
-            duration=result.get("duration", 0),
-            language=result.get("language", "en"),
+    return TranscriptResponse(
+        transcript=result["transcript"],
+        duration=result.get("duration", 0),
+        language=result.get("language", "en"),
+        segments=prepare_segments(result.get("segments")),
+    )
+
+
+@app.websocket("/ws/transcribe-stream")
+@metrics.track("transcribe_stream")
+async def ws_transcribe_stream(ws: WebSocket):
+    """Incremental transcription of live audio chunks.
+
+    Protocol: optional JSON config first ({"format": "webm"|"pcm16",
+    "sample_rate": 16000, "chunk_seconds": 1.0}), then binary audio chunks,
+    then {"event": "stop"}. The server pushes {"type": "partial"} and
+    {"type": "final"} events and finishes with {"type": "done", "transcript",
+    "segments"} (speaker-labelled, as from /api/transcribe). A failed window
+    sends {"type": "error"} at once and closes the socket (code 1011).
+    """
+    await ws.accept()
+    transcriber = StreamingTranscriber(transcribe_audio)
+    new_audio = asyncio.Event()
+    stopped = False
+
+    async def pump():
+        try:
+            while not stopped:
+                await new_audio.wait()
+                new_audio.clear()
+                if stopped or transcriber.pending_seconds < settings.STREAM_MIN_WINDOW_SECONDS:
+                    continue
+                for event in await transcriber.step():
+                    await ws.send_json(event)
+        except Exception as e:
+            # Report it now, not at stop; the close ends the receive loop below.
+            await ws.send_json({"type": "error", "error": str(e)})
+            await ws.close(code=1011)
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect" or pump_task.done():
+                return
+            if message.get("bytes"):
+                transcriber.add_chunk(message["bytes"])
+                new_audio.set()
+                continue
+
+            data = json.loads(message.get("text") or "{}")
+            if data.get("event") == "stop":
+                break
+            if transcriber.buffered_seconds == 0:
+                transcriber = StreamingTranscriber(
+                    transcribe_audio,
+                    fmt=data.get("format", "webm"),
+                    sample_rate=int(data.get("sample_rate", 16000)),
+                    chunk_seconds=float(data.get("chunk_seconds", 1.0)),
+                )
+
+        # Let any in-flight window finish, then flush everything as final.
+        stopped = True
+        new_audio.set()
+        await pump_task
+        if ws.application_state != WebSocketState.CONNECTED:
+            return  # the pump failed and already sent the error
+        for event in await transcriber.step(final=True):
+            await ws.send_json(event)
+        await ws.send_json(
+            {
+                "type": "done",
+                "transcript": transcriber.transcript,
+                "segments": prepare_segments(transcriber.committed),
+                "duration": transcriber.buffered_seconds,
+            }
+        )
+
+        await log_action(
+            user_id="system",
+            action="transcribe_stream",
+            details=f"duration={transcriber.buffered_seconds}s",
         )
+    except Exception as e:
+        if ws.application_state == WebSocketState.CONNECTED:
+            await ws.send_json({"type": "error", "error": str(e)})
     finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        pump_task.cancel()
+        if ws.client_state == ws.application_state == WebSocketState.CONNECTED:
+            await ws.close()
 
 
 # ── Note Generation ──
 @app.post("/api/generate-note", response_model=NoteResponse)
-async def create_note(req: NoteRequest):
-    """Send transcript + template → get structured clinical note."""
-    note = await generate_note(
-        transcript=req.transcript,
-        template=req.template,
-        specialty=req.specialty,
-    )
+@metrics.track("create_note")
+async def create_note(req: NoteRequest, request: Request):
+    """Send transcript (or timestamped segments) + template → get structured clinical note.
 
-    await log_action(
-        user_id="system",
-        action="note_generated",
-        details=f"template={req.template}, specialty={req.specialty}",
-    )
+    If the client disconnects first, the Groq call is cancelled (499).
+    """
+    with metrics.stage("generation"):
+        note = await run_until_disconnect(
+            request.receive,
+            generate_note(
+                transcript=req.transcript,
+                template=req.template,
+                specialty=req.specialty,
+                use_cache=not req.regenerate,
+                segments=prepare_segments(req.segments),
+            ),
+        )
+
+    with metrics.stage("audit_write"):
+        await log_action(
+            user_id="system",
+            action="note_generated",
+            details=f"template={req.template}, specialty={req.specialty}",
+        )
 
     return NoteResponse(
         note=note,
@@ -126,241 +415,621 @@ async def create_note(req: NoteRequest):
 
 
 # ── WebSocket Streaming ──
+async def _streamed_note(
+    transcript: str, template: str, specialty: str, use_cache: bool, segments: list[dict]
+) -> AsyncGenerator[str, None]:
+    """The note stream behind a generation; audited once, whoever is watching."""
+    async for token in stream_note(transcript, template, specialty, use_cache, segments):
+        yield token
+    with metrics.stage("audit_write"):
+        await log_action(
+            user_id="system",
+            action="note_streamed",
+            details=f"template={template}",
+        )
+
+
 @app.websocket("/ws/stream-note")
+@metrics.track("ws_stream_note")
 async def ws_stream_note(ws: WebSocket):
-    """Stream note generation token-by-token via WebSocket."""
+    """Stream note generation via WebSocket; streams survive reconnects.
+
+    The first frame carries a generation id. Generation runs server-side
+    independently of the socket (until nobody has watched it for
+    GENERATION_ORPHAN_SECONDS), so a client that drops can reconnect with
+    {"generation_id", "offset"} (the last offset it received) and gets the
+    missed text and then live tokens; any number of viewers may attach.
+    Deltas are coalesced (WS_COALESCE_MS / WS_COALESCE_BYTES, or the client's
+    "coalesce_ms"), a {"section": ...} frame follows each completed section,
+    and "framing": "binary" switches to compact frames (see ws_stream).
+    """
     await ws.accept()
+    writer = NoteFrameWriter(ws)
     try:
         data = await ws.receive_json()
-        transcript = data.get("transcript", "")
-        template = data.get("template", "soap")
-        specialty = data.get("specialty", "general")
+        writer = NoteFrameWriter(ws, data.get("framing", "json"))
+        window, max_bytes = coalesce_options(data)
 
-        async for token in stream_note(transcript, template, specialty):
-            await ws.send_json({"token": token, "done": False})
+        if data.get("generation_id"):
+            generation = note_generations.get(str(data["generation_id"]))
+            if generation is None:
+                raise LookupError("Unknown or expired generation_id; start a new stream")
+        else:
+            generation = note_generations.start(
+                _streamed_note(
+                    data.get("transcript", ""),
+                    data.get("template", "soap"),
+                    data.get("specialty", "general"),
+                    not data.get("regenerate", False),
+                    prepare_segments(data.get("segments")),
+                )
+            )
+        offset = generation.clamp(data.get("offset"))
+        await writer.generation(generation.id, offset)
 
-        await ws.send_json({"token": "", "done": True})
+        tracker = SectionTracker()
+        tracker.feed(generation.text[:offset])  # sections the viewer already has
+        with metrics.stage("generation"):
+            await run_until_disconnect(
+                ws.receive,
+                send_note_stream(
+                    writer, generation.follow(offset), window, max_bytes, tracker, offset
+                ),
+                "websocket",
+            )
 
-        await log_action(
-            user_id="system",
-            action="note_streamed",
-            details=f"template={template}",
-        )
+        await writer.done()
+    except ClientDisconnected:
+        pass  # the generation keeps going for GENERATION_ORPHAN_SECONDS in case they resume
     except Exception as e:
-        await ws.send_json({"error": str(e), "done": True})
+        await writer.error(str(e))
     finally:
-        await ws.close()
+        if ws.client_state == WebSocketState.CONNECTED:
+            await ws.close()
 
 
 # ── Patient Summary ──
+async def _load_encounter_note(
+    db: Optional["AsyncSession"], encounter_id: Optional[str]
+) -> Optional[str]:
+    """Return the saved (decrypted) note for an encounter, if there is one."""
+    if not encounter_id:
+        return None
+
+    if db is not None:
+        from models import EncounterDB
+        from encryption import decrypt_text_async
+
+        encounter = await db.get(EncounterDB, encounter_id)
+        if encounter and encounter.note_encrypted:
+            return await decrypt_text_async(encounter.note_encrypted)
+        return None
+
+    return _encounters_store.get(encounter_id, {}).get("note")
+
+
 @app.post("/api/patient-summary")
-async def patient_summary(req: NoteRequest):
-    """Generate patient-facing summary at 5th-grade reading level."""
-    note = await generate_note(req.transcript, req.template, req.specialty)
-    summary = await generate_patient_summary(note)
+@metrics.track("patient_summary")
+async def patient_summary(
+    req: PatientSummaryRequest,
+    request: Request,
+    db: Optional["AsyncSession"] = Depends(get_db),
+):
+    """Generate patient-facing summary at 5th-grade reading level.
 
-    await log_action(
-        user_id="system",
-        action="patient_summary_generated",
-    )
+    Reuses `note` or the saved note of `encounter_id` when given; otherwise
+    generates (or fetches from cache) the note for the transcript first.
+    """
+    note = req.note
+    if not note and req.encounter_id:
+        with metrics.stage("db_read"):
+            note = await _load_encounter_note(db, req.encounter_id)
+    if not note and not req.transcript:
+        raise HTTPException(status_code=400, detail="transcript, note or encounter_id required")
+    async def generate() -> tuple[str, str]:
+        clinical_note = note or await generate_note(
+            req.transcript,
+            req.template,
+            req.specialty,
+            use_cache=not req.regenerate,
+            segments=prepare_segments(req.segments),
+        )
+        return clinical_note, await generate_patient_summary(clinical_note)
+
+    with metrics.stage("generation"):
+        note, summary = await run_until_disconnect(request.receive, generate())
+
+    with metrics.stage("audit_write"):
+        await log_action(
+            user_id="system",
+            action="patient_summary_generated",
+            resource_type="encounter" if req.encounter_id else None,
+            resource_id=req.encounter_id,
+        )
 
     return {"clinical_note": note, "patient_summary": summary}
 
 
+@app.websocket("/ws/note-and-summary")
+@metrics.track("note_and_summary")
+async def ws_note_and_summary(ws: WebSocket):
+    """Stream the clinical note and the patient summary over one socket.
+
+    The summary starts as soon as ASSESSMENT and PLAN have streamed and runs
+    alongside the rest of the note. Frames are {"stream": "note"|"summary",
+    "token", "done"}; the last frame is {"stream": "all", "done": true}.
+    Tokens are coalesced as in /ws/stream-note (JSON framing only).
+    """
+    await ws.accept()
+    send_lock = asyncio.Lock()
+    summary_task: Optional[asyncio.Task] = None
+    window, max_bytes = settings.WS_COALESCE_MS / 1000, settings.WS_COALESCE_BYTES
+
+    async def send(stream: str, token: str = "", done: bool = False):
+        async with send_lock:
+            await ws.send_json({"stream": stream, "token": token, "done": done})
+
+    async def run_summary(note: str):
+        async for token in coalesce(stream_patient_summary(note), window, max_bytes):
+            await send("summary", token)
+        await send("summary", done=True)
+
+    async def stream_all(data: dict):
+        nonlocal summary_task
+        encounter_id = data.get("encounter_id")
+        note = data.get("note")
+        if not note and encounter_id:
+            async with session_scope() as db:
+                note = await _load_encounter_note(db, encounter_id)
+
+        if note:
+            await send("note", note)
+            await send("note", done=True)
+            summary_task = asyncio.create_task(run_summary(note))
+        else:
+            tracker = SectionTracker()
+            parts: list[str] = []
+            note_stream = stream_note(
+                data.get("transcript", ""),
+                data.get("template", "soap"),
+                data.get("specialty", "general"),
+                not data.get("regenerate", False),
+                prepare_segments(data.get("segments")),
+            )
+            async for token in coalesce(note_stream, window, max_bytes):
+                parts.append(token)
+                await send("note", token)
+                tracker.feed(token)
+                if summary_task is None and tracker.has_completed("ASSESSMENT", "PLAN"):
+                    summary_task = asyncio.create_task(run_summary("".join(parts)))
+            await send("note", done=True)
+            if summary_task is None:
+                summary_task = asyncio.create_task(run_summary("".join(parts)))
+
+        await summary_task
+        await send("all", done=True)
+
+        await log_action(
+            user_id="system",
+            action="note_and_summary_streamed",
+            resource_type="encounter" if encounter_id else None,
+            resource_id=encounter_id,
+        )
+
+    try:
+        data = await ws.receive_json()
+        window, max_bytes = coalesce_options(data)
+        # Both streams stop (and their Groq calls close) as soon as the client leaves.
+        await run_until_disconnect(ws.receive, stream_all(data), "websocket")
+    except ClientDisconnected:
+        pass
+    except Exception as e:
+        async with send_lock:
+            await ws.send_json({"error": str(e), "done": True})
+    finally:
+        if summary_task is not None and not summary_task.done():
+            summary_task.cancel()
+        if ws.client_state == WebSocketState.CONNECTED:
+            await ws.close()
+
+
+def _require_writable(db: Optional["AsyncSession"]) -> None:
+    """Outage with a database configured: refuse the write (→ 503).
+
+    The memory stores are for stateless mode; a write kept there during an
+    outage would report success and never reach the database.
+    """
+    if db is None and is_db_configured():
+        raise DatabaseUnavailableError()
+
+
 # ── Authentication ──
+async def _check_password(password: str, hashed: str) -> bool:
+    with metrics.stage("crypto"):
+        return await verify_password_async(password, hashed)
+
+
 @app.post("/api/auth/register")
-async def register(req: RegisterRequest):
+@metrics.track("register")
+async def register(req: RegisterRequest, db: Optional["AsyncSession"] = Depends(get_db)):
     """Register a new user."""
-    if is_db_available():
+    _require_writable(db)
+    # Existence check first: a duplicate must not spend a crypto-pool slot on bcrypt.
+    if db is not None:
         from models import UserDB
 
-        db_gen = get_db()
-        db = next(db_gen)
-        if db:
-            existing = db.query(UserDB).filter(UserDB.email == req.email).first()
-            if existing:
-                raise HTTPException(status_code=400, detail="Email already registered")
-
-            user = UserDB(
-                email=req.email,
-                hashed_password=hash_password(req.password),
-                full_name=req.full_name,
-                role=req.role,
-                specialty=req.specialty,
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-
-            token = create_access_token(
-                {"sub": user.id, "email": user.email, "role": user.role}
-            )
-            try:
-                next(db_gen)
-            except StopIteration:
-                pass
-
-            return LoginResponse(
-                access_token=token, role=user.role, full_name=user.full_name
-            )
-    else:
-        # In-memory fallback
-        if req.email in _users_store:
+        result = await db.execute(select(UserDB).where(UserDB.email == req.email))
+        if result.scalar_one_or_none():
             raise HTTPException(status_code=400, detail="Email already registered")
 
-        user_id = str(uuid.uuid4())
-        _users_store[req.email] = {
-            "id": user_id,
-            "email": req.email,
-            "hashed_password": hash_password(req.password),
-            "full_name": req.full_name,
-            "role": req.role,
-            "specialty": req.specialty,
-        }
+        with metrics.stage("crypto"):
+            hashed_password = await hash_password_async(req.password)
+        user = UserDB(
+            email=req.email,
+            hashed_password=hashed_password,
+            full_name=req.full_name,
+            role=req.role,
+            specialty=req.specialty,
+        )
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
 
         token = create_access_token(
-            {"sub": user_id, "email": req.email, "role": req.role}
+            {"sub": user.id, "email": user.email, "role": user.role}
         )
         return LoginResponse(
-            access_token=token, role=req.role, full_name=req.full_name
+            access_token=token, role=user.role, full_name=user.full_name
         )
 
+    # In-memory fallback
+    if req.email in _users_store:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    with metrics.stage("crypto"):
+        hashed_password = await hash_password_async(req.password)
+    if req.email in _users_store:  # registered while we were hashing
+        raise HTTPException(status_code=400, detail="Email already registered")
 
-@app.post("/api/auth/login", response_model=LoginResponse)
-async def login(req: LoginRequest):
-    """Authenticate a user and return a JWT."""
-    if is_db_available():
-        from models import UserDB
+    user_id = str(uuid.uuid4())
+    _users_store.put(req.email, {
+        "id": user_id,
+        "email": req.email,
+        "hashed_password": hashed_password,
+        "full_name": req.full_name,
+        "role": req.role,
+        "specialty": req.specialty,
+    })
 
-        db_gen = get_db()
-        db = next(db_gen)
-        if db:
-            user = db.query(UserDB).filter(UserDB.email == req.email).first()
-            if not user or not verify_password(req.password, user.hashed_password):
-                raise HTTPException(status_code=401, detail="Invalid credentials")
+    token = create_access_token(
+        {"sub": user_id, "email": req.email, "role": req.role}
+    )
+    return LoginResponse(
+        access_token=token, role=req.role, full_name=req.full_name
+    )
 
-            token = create_access_token(
-                {"sub": user.id, "email": user.email, "role": user.role}
-            )
-            try:
-                next(db_gen)
-            except StopIteration:
-                pass
 
-            await log_action(user_id=user.id, action="login")
+@app.post("/api/auth/login", response_model=LoginResponse)
+@metrics.track("login")
+async def login(req: LoginRequest, db: Optional["AsyncSession"] = Depends(get_db)):
+    """Authenticate a user and return a JWT."""
+    if db is not None:
+        from models import UserDB
 
-            return LoginResponse(
-                access_token=token, role=user.role, full_name=user.full_name
-            )
-    else:
-        user = _users_store.get(req.email)
-        if not user or not verify_password(req.password, user["hashed_password"]):
+        result = await db.execute(select(UserDB).where(UserDB.email == req.email))
+        user = result.scalar_one_or_none()
+        if not user or not await _check_password(req.password, user.hashed_password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
         token = create_access_token(
-            {"sub": user["id"], "email": user["email"], "role": user["role"]}
+            {"sub": user.id, "email": user.email, "role": user.role}
         )
-        await log_action(user_id=user["id"], action="login")
+        await log_action(user_id=user.id, action="login")
 
         return LoginResponse(
-            access_token=token, role=user["role"], full_name=user["full_name"]
+            access_token=token, role=user.role, full_name=user.full_name
         )
 
-    raise HTTPException(status_code=500, detail="Authentication service unavailable")
+    user = _users_store.get(req.email)
+    if not user or not await _check_password(req.password, user["hashed_password"]):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    token = create_access_token(
+        {"sub": user["id"], "email": user["email"], "role": user["role"]}
+    )
+    await log_action(user_id=user["id"], action="login")
+
+    return LoginResponse(
+        access_token=token, role=user["role"], full_name=user["full_name"]
+    )
+
+
+@app.post("/api/auth/logout")
+async def logout(request: Request):
+    """Revoke the bearer token (by its jti) until it would have expired."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not revoke_token(token):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return {"logged_out": True}
 
 
 # ── Encounters ──
 @app.post("/api/save-note")
+@metrics.track("save_note")
 async def save_note(req: SaveNoteRequest):
-    """Save or update a clinical note."""
+    """Save or update a clinical note (the whole text; autosave sends deltas instead)."""
     encounter_id = req.encounter_id
+    # Supersedes any autosave draft and takes the next version under its lock.
+    version = await autosave_manager.save(encounter_id, req.note, details=req.edits)
 
-    if is_db_available():
-        from models import EncounterDB
-        from encryption import encrypt_text
-
-        db_gen = get_db()
-        db = next(db_gen)
-        if db:
-            encounter = db.query(EncounterDB).filter(EncounterDB.id == encounter_id).first()
-            if encounter:
-                encounter.note_encrypted = encrypt_text(req.note)
-                encounter.updated_at = datetime.utcnow()
-            else:
-                encounter = EncounterDB(
-                    id=encounter_id,
-                    user_id="system",
-                    note_encrypted=encrypt_text(req.note),
-                )
-                db.add(encounter)
-            db.commit()
-            try:
-                next(db_gen)
-            except StopIteration:
-                pass
+    with metrics.stage("audit_write"):
+        await log_action(
+            user_id="system",
+            action="note_saved",
+            resource_type="encounter",
+            resource_id=encounter_id,
+        )
+
+    return {"saved": True, "encounter_id": encounter_id, "version": version}
+
+
+@app.patch("/api/encounters/{encounter_id}/note")
+@metrics.track("autosave")
+async def autosave_note(encounter_id: str, req: NoteDeltaRequest):
+    """Apply editor ops to the note's draft; written back after a quiet period.
+
+    A 409 carries the current `version` and `note`: resync and resend.
+    """
+    try:
+        version = await autosave_manager.edit(encounter_id, req.base_version, req.ops)
+    except DraftNotFoundError:
+        raise HTTPException(status_code=404, detail="Encounter not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"encounter_id": encounter_id, "version": version}
+
+
+@app.post("/api/encounters/{encounter_id}/note/close")
+@metrics.track("autosave")
+async def close_note(encounter_id: str):
+    """The editor closed the encounter: write its pending autosave edits now."""
+    version = await autosave_manager.close(encounter_id)
+    return {"saved": True, "encounter_id": encounter_id, "version": version}
+
+
+def _decrypt_edits(rows: list) -> list[dict]:
+    """Decrypt one page of edit history (runs in a worker thread)."""
+    from encryption import decrypt_text
+
+    edits = []
+    for row in rows:
+        edit = {"version": row.version, "source": row.source, "created_at": row.created_at.isoformat()}
+        delta = decrypt_text(row.delta_encrypted) if row.delta_encrypted else None
+        if row.source == "autosave":
+            edit["ops"] = json.loads(delta) if delta else []
+        else:
+            edit["edits"] = delta
+        edits.append(edit)
+    return edits
+
+
+@app.get("/api/encounters/{encounter_id}/edits")
+async def note_edits(
+    encounter_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    db: Optional["AsyncSession"] = Depends(get_db),
+):
+    """Edit history of a note, newest first: autosave ops and full saves."""
+    if db is not None:
+        from models import EncounterEditDB
+
+        stmt = (
+            select(EncounterEditDB)
+            .where(EncounterEditDB.encounter_id == encounter_id)
+            .order_by(EncounterEditDB.created_at.desc())
+            .limit(limit)
+        )
+        rows = list((await db.execute(stmt)).scalars().all())
+        edits = await asyncio.to_thread(_decrypt_edits, rows)
     else:
-        _encounters_store[encounter_id] = {
-            "id": encounter_id,
-            "note": req.note,
-            "updated_at": datetime.utcnow().isoformat(),
-        }
+        edits = list(reversed((_encounters_store.get(encounter_id) or {}).get("edits") or []))[:limit]
 
     await log_action(
         user_id="system",
-        action="note_saved",
+        action="note_history_accessed",
         resource_type="encounter",
         resource_id=encounter_id,
     )
+    return {"encounter_id": encounter_id, "edits": edits}
+
+
+def _decrypt_previews(rows: list) -> list[Optional[str]]:
+    """Decrypt previews for one page (runs in a worker thread)."""
+    from encryption import decrypt_text
+
+    previews = []
+    for e in rows:
+        if e.preview_encrypted:
+            previews.append(decrypt_text(e.preview_encrypted))
+        elif e.note_encrypted:
+            previews.append(decrypt_text(e.note_encrypted)[: settings.PREVIEW_CHARS])
+        else:
+            previews.append(None)
+    return previews
+
 
-    return {"saved": True, "encounter_id": encounter_id}
+@app.get("/api/encounters", response_model=EncounterPage)
+async def list_encounters(
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    template: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
+    include_preview: bool = False,
+    db: Optional["AsyncSession"] = Depends(get_db),
+):
+    """List encounters newest-first with keyset pagination.
 
+    Pass `next_cursor` from the previous page as `cursor`. Previews are only
+    decrypted for the rows on the requested page.
+    """
+    limit = min(limit, settings.ENCOUNTERS_PAGE_MAX)
+    after = decode_cursor(cursor)
+    # Stored timestamps are naive UTC; "...Z" / "+02:00" params would not compare.
+    created_from, created_to = naive_utc(created_from), naive_utc(created_to)
 
-@app.get("/api/encounters")
-async def list_encounters():
-    """List recent encounters."""
-    if is_db_available():
+    if db is not None:
+        from sqlalchemy import and_, or_
+        from sqlalchemy.orm import defer
         from models import EncounterDB
 
-        db_gen = get_db()
-        db = next(db_gen)
-        if db:
-            encounters = (
-                db.query(EncounterDB)
-                .order_by(EncounterDB.created_at.desc())
-                .limit(20)
-                .all()
+        stmt = select(EncounterDB).options(
+            defer(EncounterDB.transcript_encrypted),
+            defer(EncounterDB.patient_summary),
+        )
+        if not include_preview:
+            stmt = stmt.options(
+                defer(EncounterDB.note_encrypted), defer(EncounterDB.preview_encrypted)
+            )
+        if user_id:
+            stmt = stmt.where(EncounterDB.user_id == user_id)
+        if status:
+            stmt = stmt.where(EncounterDB.status == status)
+        if template:
+            stmt = stmt.where(EncounterDB.template == template)
+        if created_from:
+            stmt = stmt.where(EncounterDB.created_at >= created_from)
+        if created_to:
+            stmt = stmt.where(EncounterDB.created_at < created_to)
+        if after:
+            at, last_id = after
+            stmt = stmt.where(
+                EncounterDB.created_at <= at,  # redundant, but lets the index seek past the OR
+                or_(
+                    EncounterDB.created_at < at,
+                    and_(EncounterDB.created_at == at, EncounterDB.id < last_id),
+                )
             )
-            try:
-                next(db_gen)
-            except StopIteration:
-                pass
-            return [
+        stmt = stmt.order_by(EncounterDB.created_at.desc(), EncounterDB.id.desc()).limit(limit + 1)
+
+        rows = list((await db.execute(stmt)).scalars().all())
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        previews = (
+            await asyncio.to_thread(_decrypt_previews, rows)
+            if include_preview
+            else [None] * len(rows)
+        )
+        return EncounterPage(
+            items=[
                 EncounterResponse(
                     id=e.id,
                     template=e.template,
                     specialty=e.specialty,
                     status=e.status,
                     created_at=e.created_at.isoformat(),
-                    preview=None,
+                    preview=preview,
                 )
-                for e in encounters
-            ]
+                for e, preview in zip(rows, previews)
+            ],
+            next_cursor=encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+        )
+
+    def matches(data: dict) -> bool:
+        created_at = datetime.fromisoformat(data["created_at"])
+        return (
+            (not status or data.get("status", "draft") == status)
+            and (not template or data.get("template", "soap") == template)
+            and (not created_from or created_at >= created_from)
+            and (not created_to or created_at < created_to)
+            and (not after or (created_at, data["id"]) < after)
+        )
+
+    page = _encounters_store.recent(limit + 1, index_value=user_id, where=matches)
+    has_more = len(page) > limit
+    page = page[:limit]
+    return EncounterPage(
+        items=[
+            EncounterResponse(
+                id=data["id"],
+                template=data.get("template", "soap"),
+                specialty=data.get("specialty", "general"),
+                status=data.get("status", "draft"),
+                created_at=data["created_at"],
+                preview=data["note"][: settings.PREVIEW_CHARS] if include_preview and data.get("note") else None,
+            )
+            for data in page
+        ],
+        next_cursor=(
+            encode_cursor(datetime.fromisoformat(page[-1]["created_at"]), page[-1]["id"])
+            if has_more
+            else None
+        ),
+    )
+
+
+# ── Bulk Jobs ──
+@app.post("/api/jobs", status_code=202)
+async def create_job(req: JobRequest):
+    """Start a bulk export or note regeneration job; poll GET /api/jobs/{id}."""
+    if req.kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(KINDS)}")
+    if req.format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    job = job_manager.submit(req.model_dump())
+    await log_action(
+        user_id=req.filters.user_id or "system",
+        action="job_created",
+        details=f"job={job.id}, kind={req.kind}, format={req.format}",
+    )
+    return job.public()
+
+
+@app.get("/api/jobs")
+async def list_jobs():
+    """All known jobs, newest first."""
+    return [job.public() for job in job_manager.all()]
+
+
+def _job_or_404(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status and progress counters."""
+    return _job_or_404(job_id).public()
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Stop a job; the output written so far is kept."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.public()
+
 
-    return [
-        {
-            "id": eid,
-            "note_preview": (data.get("note", "")[:100] if data.get("note") else None),
-            "updated_at": data.get("updated_at"),
-        }
-        for eid, data in _encounters_store.items()
-    ]
+@app.get("/api/jobs/{job_id}/output")
+async def job_output(job_id: str):
+    """Download the output of a completed job."""
+    job = _job_or_404(job_id)
+    if job.state["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job.state['status']}")
+    await log_action(user_id="system", action="job_output_downloaded", details=f"job={job.id}")
+    media_type = "application/x-ndjson" if job.state["format"] == "ndjson" else "application/fhir+json"
+    return FileResponse(job.output_path, media_type=media_type, filename=os.path.basename(job.output_path))
 
 
 # ── Audit Log ──
 @app.get("/api/audit-log")
-async def audit_log():
+async def audit_log(user_id: Optional[str] = None):
     """Retrieve audit log (admin only in production)."""
-    return get_audit_log(limit=100)
+    return await get_audit_log(limit=100, user_id=user_id)
 
 
 # ── Run ──
@@ -0,0 +1,190 @@
+# memory_store.py — Bounded, indexed in-memory stores for stateless mode
+
+import json
+import logging
+import os
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Callable, Hashable, Iterable, Optional
+
+from encryption import decrypt_text, encrypt_text
+
+logger = logging.getLogger(__name__)
+
+
+class IndexedStore:
+    """Capped key → record store with by-time and by-field secondary indexes.
+
+    - The time index follows first insertion; replacing a record keeps its place.
+    - Capacity is bounded by `max_items` and (optionally) `max_bytes`, using a
+      JSON-size estimate per record.
+    - `policy="lru"` evicts the least recently read/written record;
+      `policy="fifo"` evicts the oldest inserted one.
+    - `recent()` walks the time index from the newest end, so listing k
+      records costs O(k) (plus whatever `where` skips), not O(n).
+    """
+
+    def __init__(
+        self,
+        max_items: int,
+        max_bytes: Optional[int] = None,
+        index_field: Optional[str] = None,
+        policy: str = "lru",
+    ):
+        if policy not in ("lru", "fifo"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.index_field = index_field
+        self.policy = policy
+        self.size_bytes = 0
+
+        self._items: dict[Hashable, dict] = {}
+        self._sizes: dict[Hashable, int] = {}
+        self._by_time: OrderedDict[Hashable, None] = OrderedDict()  # insertion order
+        self._lru: OrderedDict[Hashable, None] = OrderedDict()  # access order
+        self._by_field: dict[Hashable, OrderedDict[Hashable, None]] = {}
+
+    # ── Mapping API ──
+
+    def get(self, key: Hashable, default=None) -> Optional[dict]:
+        record = self._items.get(key)
+        if record is None:
+            return default
+        self._lru.move_to_end(key)
+        return record
+
+    def put(self, key: Hashable, record: dict) -> None:
+        """Insert or replace. Replacing keeps the record's place in the time index."""
+        size = len(json.dumps(record, default=str))
+        previous = self._items.get(key)
+        if previous is not None:
+            self.size_bytes -= self._sizes[key]
+            self._lru.move_to_end(key)
+            if self.index_field is not None and previous.get(self.index_field) != record.get(self.index_field):
+                self._unindex(key, previous)
+                self._index(key, record)
+        else:
+            self._by_time[key] = None
+            self._lru[key] = None
+            self._index(key, record)
+        self._items[key] = record
+        self._sizes[key] = size
+        self.size_bytes += size
+        self._evict()
+
+    def _index(self, key: Hashable, record: dict) -> None:
+        if self.index_field is not None:
+            self._by_field.setdefault(record.get(self.index_field), OrderedDict())[key] = None
+
+    def _unindex(self, key: Hashable, record: dict) -> None:
+        if self.index_field is None:
+            return
+        value = record.get(self.index_field)
+        bucket = self._by_field.get(value)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._by_field[value]
+
+    def delete(self, key: Hashable) -> None:
+        record = self._items.pop(key, None)
+        if record is None:
+            return
+        self.size_bytes -= self._sizes.pop(key)
+        del self._by_time[key]
+        del self._lru[key]
+        self._unindex(key, record)
+
+    def _evict(self) -> None:
+        order = self._lru if self.policy == "lru" else self._by_time
+        while len(self._items) > self.max_items or (
+            self.max_bytes is not None and self.size_bytes > self.max_bytes and len(self._items) > 1
+        ):
+            self.delete(next(iter(order)))
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # ── Queries ──
+
+    def recent(
+        self,
+        limit: int,
+        index_value: Hashable = None,
+        where: Optional[Callable[[dict], bool]] = None,
+    ) -> list[dict]:
+        """Newest-first records, optionally restricted to one index bucket."""
+        if index_value is not None:
+            keys: Iterable = reversed(self._by_field.get(index_value, OrderedDict()))
+        else:
+            keys = reversed(self._by_time)
+        records = (self._items[k] for k in keys)
+        if where is not None:
+            records = (r for r in records if where(r))
+        return list(islice(records, limit))
+
+    # ── Snapshot ──
+
+    def dump(self) -> list:
+        return [[k, self._items[k]] for k in self._by_time]
+
+    def load(self, items: list) -> None:
+        for key, record in items:
+            self.put(key, record)
+
+
+class RingBuffer:
+    """Fixed-size, append-only log; the oldest entries fall off the end."""
+
+    def __init__(self, max_entries: int):
+        self._entries: deque = deque(maxlen=max_entries)
+
+    def append(self, entry: dict) -> None:
+        self._entries.append(entry)
+
+    def recent(self, limit: int) -> list[dict]:
+        """Last `limit` entries in chronological order — O(limit)."""
+        newest = list(islice(reversed(self._entries), limit))
+        newest.reverse()
+        return newest
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def dump(self) -> list:
+        return list(self._entries)
+
+    def load(self, items: list) -> None:
+        self._entries.extend(items)
+
+
+# ── Snapshot to disk (encrypted — stores hold PHI) ──
+
+def save_snapshot(path: str, **stores) -> None:
+    """Write all stores to one AES-GCM encrypted file (atomic replace)."""
+    payload = json.dumps({name: store.dump() for name, store in stores.items()}, default=str)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(encrypt_text(payload))
+    os.replace(tmp_path, path)
+    logger.info(f"Saved in-memory snapshot to {path}")
+
+
+def load_snapshot(path: str, **stores) -> bool:
+    """Restore stores from a snapshot written by save_snapshot()."""
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.loads(decrypt_text(f.read()))
+    except Exception as e:
+        logger.warning(f"⚠️  Could not restore in-memory snapshot {path}: {e}")
+        return False
+    for name, store in stores.items():
+        store.load(data.get(name, []))
+    logger.info(f"Restored in-memory snapshot from {path}")
+    return True
@@ -0,0 +1,283 @@
+# metrics.py — Prometheus metrics: per-stage latency + pool saturation
+#
+# Label values come only from the fixed OPERATIONS / STAGES sets below, never
+# from request data, so no PHI (names, transcripts, ids) can reach a label.
+# Works without prometheus_client installed: everything becomes a no-op.
+
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+    HAS_PROMETHEUS = True
+except ImportError:
+    HAS_PROMETHEUS = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+OPERATIONS = {
+    "transcribe",
+    "transcribe_stream",
+    "create_note",
+    "ws_stream_note",
+    "patient_summary",
+    "note_and_summary",
+    "save_note",
+    "autosave",  # note delta PATCHes and their debounced writes
+    "register",
+    "login",
+    "job",  # one bulk export / regeneration job, start to finish
+    "audit",
+    "other",
+}
+STAGES = {
+    "upload",  # request body received and spooled (multipart parsing included)
+    "stt",
+    "groq_queue",  # waiting for rate-limit budget in the scheduler
+    "groq_call",  # one non-streaming completion (map-reduce makes several)
+    "ttft",  # Groq time to first token
+    "generation",  # whole note / summary, cache lookups and map step included
+    "crypto",  # bcrypt on the crypto pool, queue wait included
+    "db_read",
+    "db_commit",
+    "audit_write",
+    "total",  # handler time, excluding the upload
+}
+
+CANCEL_REASONS = {
+    "client_disconnect",  # HTTP client / WebSocket went away mid-request
+    "orphaned",  # stream generation lost its last viewer and nobody resumed it
+}
+
+_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+_TPS_BUCKETS = (10, 25, 50, 100, 200, 400, 800, 1600)
+_PROMPT_TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 6000, 8000, 16000, 32000)
+
+
+class _Noop:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def set_function(self, fn):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+if HAS_PROMETHEUS:
+    STAGE_SECONDS = Histogram(
+        "medscribe_stage_seconds",
+        "Latency of each stage of a request",
+        ["operation", "stage"],
+        buckets=_LATENCY_BUCKETS,
+    )
+    TOKENS_PER_SECOND = Histogram(
+        "medscribe_generation_tokens_per_second",
+        "Groq output tokens per second (after the first token when streaming)",
+        ["operation"],
+        buckets=_TPS_BUCKETS,
+    )
+    GROQ_RETRIES = Counter(
+        "medscribe_groq_retries_total", "Groq calls retried, by reason", ["reason"]  # 429 | 5xx | transport
+    )
+    LLM_ROUTING = Counter(
+        "medscribe_llm_routing_total",
+        "LLM provider attempts",  # primary | hedge | failover, then error | cancelled
+        ["provider", "outcome"],
+    )
+    LLM_TOKENS = Counter(
+        "medscribe_llm_tokens_total",
+        "LLM tokens (provider-reported, else estimated locally) by kind",  # prompt | cached_prompt | completion
+        ["operation", "kind"],
+    )
+    PROMPT_TOKENS = Histogram(
+        "medscribe_prompt_tokens",
+        "Prompt tokens per LLM call",
+        ["operation"],
+        buckets=_PROMPT_TOKEN_BUCKETS,
+    )
+    CANCELLATIONS = Counter(
+        "medscribe_cancellations_total",
+        "Requests / generations cancelled because nobody was waiting for them",
+        ["operation", "reason"],
+    )
+    DB_POOL = Gauge("medscribe_db_pool_connections", "DB engine pool connections", ["state"])
+    HTTP_POOL = Gauge("medscribe_http_pool_connections", "Groq HTTP client pool connections", ["state"])
+    STT_POOL = Gauge("medscribe_stt_pool_jobs", "Local Whisper pool jobs", ["state"])
+    CRYPTO_POOL = Gauge("medscribe_crypto_pool_jobs", "bcrypt thread pool jobs", ["state"])
+else:
+    STAGE_SECONDS = TOKENS_PER_SECOND = GROQ_RETRIES = LLM_ROUTING = CANCELLATIONS = _Noop()
+    LLM_TOKENS = PROMPT_TOKENS = _Noop()
+    DB_POOL = HTTP_POOL = STT_POOL = CRYPTO_POOL = _Noop()
+
+
+# ── Stage timing ──
+
+_operation: ContextVar[str] = ContextVar("medscribe_operation", default="other")
+
+
+def _check(value: str, allowed: set) -> str:
+    if value not in allowed:
+        raise ValueError(f"Unknown metrics label {value!r}")  # guards against PHI in labels
+    return value
+
+
+@contextmanager
+def operation(name: str):
+    """Attribute stages recorded in this block (including inside groq_client) to `name`."""
+    token = _operation.set(_check(name, OPERATIONS))
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+
+def track(name: str):
+    """Decorator for endpoints: sets the operation and records its "total" stage."""
+    _check(name, OPERATIONS)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with operation(name), stage("total"):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def observe(stage: str, seconds: float, op: Optional[str] = None) -> None:
+    STAGE_SECONDS.labels(op or _operation.get(), _check(stage, STAGES)).observe(seconds)
+
+
+@contextmanager
+def stage(name: str, op: Optional[str] = None):
+    """Time a block as one stage of the current operation."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, op)
+
+
+def observe_tokens(tokens: int, seconds: float, op: Optional[str] = None) -> None:
+    if tokens > 1 and seconds > 0:
+        TOKENS_PER_SECOND.labels(op or _operation.get()).observe(tokens / seconds)
+
+
+def record_tokens(prompt: int, completion: int, cached: int = 0, op: Optional[str] = None) -> None:
+    """Prompt / completion tokens of one LLM call; `cached` prompt tokens hit the provider's prefix cache."""
+    op = op or _operation.get()
+    LLM_TOKENS.labels(op, "prompt").inc(prompt)
+    LLM_TOKENS.labels(op, "cached_prompt").inc(cached)
+    LLM_TOKENS.labels(op, "completion").inc(completion)
+    PROMPT_TOKENS.labels(op).observe(prompt)
+
+
+def cancelled(reason: str, op: Optional[str] = None) -> None:
+    CANCELLATIONS.labels(op or _operation.get(), _check(reason, CANCEL_REASONS)).inc()
+
+
+class StreamTimer:
+    """TTFT, generation time and tokens/s for one streamed Groq completion."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.tokens = 0
+
+    def token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            observe("ttft", self.first_token_at - self.started)
+        self.tokens += 1
+
+    def finish(self, usage_tokens: Optional[int] = None) -> None:
+        if self.first_token_at is None:
+            return
+        observe_tokens(usage_tokens or self.tokens, time.perf_counter() - self.first_token_at)
+
+
+# ── Request start time (for upload duration) ──
+
+class RequestTimerMiddleware:
+    """Pure ASGI middleware: stamps request.state.started_at before the body is read."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["started_at"] = time.perf_counter()
+        await self.app(scope, receive, send)
+
+
+# ── Pool saturation gauges (read at scrape time) ──
+
+def _safe(fn: Callable[[], float]) -> Callable[[], float]:
+    def read() -> float:
+        try:
+            return float(fn())
+        except Exception:
+            return 0.0
+
+    return read
+
+
+def _db_pool():
+    import database
+
+    return database.engine.sync_engine.pool if database.engine is not None else None
+
+
+def _http_pool():
+    from http_client import groq_http
+
+    client = groq_http._client
+    if client is None or client.is_closed:
+        return None
+    return client._transport._pool  # httpcore.AsyncConnectionPool
+
+
+def install_pool_gauges(stt_pool=None, crypto_pool=None) -> None:
+    """Register gauge callbacks for the DB engine, the Groq HTTP pool, STT and bcrypt."""
+    DB_POOL.labels("checked_out").set_function(_safe(lambda: _db_pool().checkedout()))
+    DB_POOL.labels("idle").set_function(_safe(lambda: _db_pool().checkedin()))
+    DB_POOL.labels("overflow").set_function(_safe(lambda: max(0, _db_pool().overflow())))
+    DB_POOL.labels("size").set_function(_safe(lambda: _db_pool().size()))
+
+    HTTP_POOL.labels("active").set_function(
+        _safe(lambda: sum(not c.is_idle() for c in _http_pool().connections))
+    )
+    HTTP_POOL.labels("idle").set_function(
+        _safe(lambda: sum(c.is_idle() for c in _http_pool().connections))
+    )
+    HTTP_POOL.labels("waiting").set_function(
+        _safe(lambda: sum(r.is_queued() for r in _http_pool()._requests))
+    )
+    HTTP_POOL.labels("max").set_function(_safe(lambda: _http_pool()._max_connections))
+
+    if stt_pool is not None:
+        STT_POOL.labels("in_flight").set_function(_safe(lambda: stt_pool.in_flight))
+        STT_POOL.labels("queued").set_function(_safe(lambda: stt_pool.queued))
+        STT_POOL.labels("capacity").set_function(_safe(lambda: stt_pool.capacity))
+
+    if crypto_pool is not None:
+        CRYPTO_POOL.labels("in_flight").set_function(_safe(lambda: crypto_pool.in_flight))
+        CRYPTO_POOL.labels("queued").set_function(_safe(lambda: crypto_pool.queued))
+        CRYPTO_POOL.labels("capacity").set_function(_safe(lambda: crypto_pool.capacity))
+
+
+def render() -> bytes:
+    """Exposition-format payload for GET /metrics."""
+    if not HAS_PROMETHEUS:
+        return b"# prometheus_client not installed\n"
+    return generate_latest()
@@ -0,0 +1,123 @@
+# migrations.py — Versioned schema migrations
+#
+# Each migration is a plain function that takes a *sync* SQLAlchemy Connection,
+# so it runs from the async app (via conn.run_sync) and from scripts alike.
+# Applied versions are recorded in `schema_migrations`.
+#
+# Rules for new migrations:
+#   - Append to MIGRATIONS with the next version number; never edit old ones.
+#   - Keep them idempotent (check the inspector / use checkfirst): 0001 builds a
+#     fresh database from the current models, so later steps may find their
+#     column or index already there.
+#
+#   python migrations.py            # apply pending migrations to DATABASE_URL
+#   python migrations.py status     # list applied / pending versions
+
+import logging
+import sys
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Connection, Index, inspect, select, text
+
+from models import AuditLogDB, Base, EncounterDB, EncounterEditDB, SchemaMigrationDB
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant — serialises migrations across app workers on Postgres.
+_PG_LOCK_KEY = 7_420_113
+
+
+def _create_index(conn: Connection, index: Index) -> None:
+    index.create(conn, checkfirst=True)
+
+
+def _table_index(table, name: str) -> Index:
+    return next(i for i in table.__table__.indexes if i.name == name)
+
+
+# ── Migrations ──
+
+def _0001_baseline(conn: Connection) -> None:
+    """Tables as create_all() used to make them (no-op on existing databases)."""
+    Base.metadata.create_all(conn)
+
+
+def _0002_encounter_listing(conn: Connection) -> None:
+    """Lazy note previews + keyset pagination index for /api/encounters."""
+    columns = {c["name"] for c in inspect(conn).get_columns("encounters")}
+    if "preview_encrypted" not in columns:
+        conn.execute(text("ALTER TABLE encounters ADD COLUMN preview_encrypted TEXT"))
+    _create_index(conn, _table_index(EncounterDB, "ix_encounters_user_created"))
+
+
+def _0003_audit_indexes(conn: Connection) -> None:
+    """Recent-activity and per-user indexes on the audit log."""
+    _create_index(conn, _table_index(AuditLogDB, "ix_audit_logs_timestamp"))
+    _create_index(conn, _table_index(AuditLogDB, "ix_audit_logs_user_timestamp"))
+
+
+def _0004_encounter_edits(conn: Connection) -> None:
+    """Delta edit history for note autosave."""
+    EncounterEditDB.__table__.create(conn, checkfirst=True)
+    _create_index(conn, _table_index(EncounterEditDB, "ix_encounter_edits_encounter_created"))
+
+
+def _0005_encounter_listing_all_users(conn: Connection) -> None:
+    """Keyset pagination index for /api/encounters without a user_id filter."""
+    _create_index(conn, _table_index(EncounterDB, "ix_encounters_created"))
+
+
+MIGRATIONS: list[tuple[str, Callable[[Connection], None]]] = [
+    ("0001", _0001_baseline),
+    ("0002", _0002_encounter_listing),
+    ("0003", _0003_audit_indexes),
+    ("0004", _0004_encounter_edits),
+    ("0005", _0005_encounter_listing_all_users),
+]
+
+
+# ── Runner ──
+
+def applied_versions(conn: Connection) -> set[str]:
+    SchemaMigrationDB.__table__.create(conn, checkfirst=True)
+    return set(conn.execute(select(SchemaMigrationDB.version)).scalars())
+
+
+def upgrade(conn: Connection) -> list[str]:
+    """Apply pending migrations in order, inside the caller's transaction."""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+
+    done = applied_versions(conn)
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version in done:
+            continue
+        name = migration.__name__.lstrip("_")
+        logger.info(f"Applying migration {name}")
+        migration(conn)
+        conn.execute(
+            SchemaMigrationDB.__table__.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            )
+        )
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+
+    from config import settings
+
+    logging.basicConfig(level=logging.INFO)
+    engine = create_engine(settings.DATABASE_URL)
+    with engine.begin() as connection:
+        if sys.argv[1:] == ["status"]:
+            done = applied_versions(connection)
+            for version, migration in MIGRATIONS:
+                state = "applied" if version in done else "pending"
+                print(f"{version}  {migration.__name__.lstrip('_'):<28} {state}")
+        else:
+            print(f"Applied: {upgrade(connection) or 'nothing to do'}")
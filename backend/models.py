@@ -9,11 +9,13 @@ from pydantic import BaseModel
 try:
     from sqlalchemy import (
         Column,
+        Integer,
         String,
         Text,
         DateTime,
         Boolean,
         ForeignKey,
+        Index,
         create_engine,
     )
     from sqlalchemy.orm import DeclarativeBase, relationship
@@ -48,6 +50,7 @@ try:
         specialty = Column(String, default="general")
         transcript_encrypted = Column(Text, nullable=True)
         note_encrypted = Column(Text, nullable=True)
+        preview_encrypted = Column(Text, nullable=True)  # first PREVIEW_CHARS of the note
         patient_summary = Column(Text, nullable=True)
         status = Column(String, default="draft")  # draft | final | amended
         created_at = Column(DateTime, default=datetime.utcnow)
@@ -55,6 +58,30 @@ try:
 
         user = relationship("UserDB", back_populates="encounters")
 
+        __table_args__ = (
+            # Keyset pagination: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            Index("ix_encounters_user_created", "user_id", "created_at", "id"),
+            # Same without user_id (all users, or only status / template / date filters)
+            Index("ix_encounters_created", "created_at", "id"),
+        )
+
+    class EncounterEditDB(Base):
+        """Note edit history: one row per autosave flush, holding only its ops."""
+
+        __tablename__ = "encounter_edits"
+
+        id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+        encounter_id = Column(String, ForeignKey("encounters.id"), nullable=False)
+        version = Column(Integer, nullable=True)  # draft version after this edit (autosave)
+        source = Column(String, default="autosave")  # autosave | save | regenerate
+        delta_encrypted = Column(Text, nullable=True)  # JSON splice ops / client edit summary
+        created_at = Column(DateTime, default=datetime.utcnow)
+
+        __table_args__ = (
+            # History of one note: WHERE encounter_id = ? ORDER BY created_at
+            Index("ix_encounter_edits_encounter_created", "encounter_id", "created_at"),
+        )
+
     class AuditLogDB(Base):
         __tablename__ = "audit_logs"
 
@@ -67,6 +94,20 @@ try:
         ip_address = Column(String, nullable=True)
         timestamp = Column(DateTime, default=datetime.utcnow)
 
+        __table_args__ = (
+            # Recent activity: ORDER BY timestamp DESC LIMIT n
+            Index("ix_audit_logs_timestamp", "timestamp"),
+            # Per-user activity: WHERE user_id = ? ORDER BY timestamp DESC
+            Index("ix_audit_logs_user_timestamp", "user_id", "timestamp"),
+        )
+
+    class SchemaMigrationDB(Base):
+        __tablename__ = "schema_migrations"
+
+        version = Column(String, primary_key=True)
+        name = Column(String, nullable=False)
+        applied_at = Column(DateTime, default=datetime.utcnow)
+
     HAS_SQLALCHEMY = True
 
 except ImportError:
@@ -76,10 +117,27 @@ except ImportError:
 
 # ── Pydantic Request/Response Schemas ──
 
+class TranscriptSegment(BaseModel):
+    start: float
+    end: float
+    text: str
+    speaker: Optional[str] = None  # CLINICIAN | PATIENT
+
+
 class NoteRequest(BaseModel):
     transcript: str
+    # Timestamped segments from /api/transcribe; when given, the prompt uses
+    # them (speaker-tagged) instead of `transcript` and the note cites times.
+    segments: Optional[list[TranscriptSegment]] = None
     template: str = "soap"  # soap | hp | consult | procedure
     specialty: str = "general"
+    regenerate: bool = False  # bypass the note cache
+
+
+class PatientSummaryRequest(NoteRequest):
+    transcript: str = ""
+    note: Optional[str] = None  # reuse a note the client already has
+    encounter_id: Optional[str] = None  # or reuse the saved note of an encounter
 
 
 class NoteResponse(BaseModel):
@@ -93,6 +151,7 @@ class TranscriptResponse(BaseModel):
     transcript: str
     duration: float
     language: str
+    segments: list[TranscriptSegment] = []
 
 
 class EncounterCreate(BaseModel):
@@ -110,6 +169,27 @@ class EncounterResponse(BaseModel):
     preview: Optional[str] = None
 
 
+class EncounterPage(BaseModel):
+    items: list[EncounterResponse]
+    next_cursor: Optional[str] = None
+
+
+class JobFilters(BaseModel):
+    user_id: Optional[str] = None
+    status: Optional[str] = None  # draft | final | amended
+    template: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+
+class JobRequest(BaseModel):
+    kind: str = "export"  # export | regenerate
+    format: str = "ndjson"  # ndjson | fhir
+    filters: JobFilters = JobFilters()
+    target_template: Optional[str] = None  # regenerate: template to use instead of the saved one
+    write_back: bool = False  # regenerate: replace the saved note (drafts only)
+
+
 class LoginRequest(BaseModel):
     email: str
     password: str
@@ -133,4 +213,9 @@ class RegisterRequest(BaseModel):
 class SaveNoteRequest(BaseModel):
     encounter_id: str
     note: str
-    edits: Optional[str] = None
+    edits: Optional[str] = None  # client's summary of the changes, kept in the edit history
+
+
+class NoteDeltaRequest(BaseModel):
+    base_version: int  # draft version the ops were made against
+    ops: list[tuple[int, int, str]]  # [position, delete_count, insert_text], applied in order
@@ -0,0 +1,139 @@
+# note_cache.py — Content-addressed, encrypted cache for generated notes
+
+import hashlib
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+from encryption import decrypt_text, encrypt_text
+
+logger = logging.getLogger(__name__)
+
+
+# ── Backends ──
+# Backends only ever see opaque keys and ciphertext, so a shared store
+# (Redis, Memcached, ...) can be dropped in without touching PHI handling.
+
+class CacheBackend(ABC):
+    """Interface for cache storage. Values are encrypted strings."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU with per-entry TTL and a total size cap in bytes."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self.delete(key)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.size_bytes += len(value)
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted)
+
+    def delete(self, key: str) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.size_bytes -= len(item[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+BACKENDS = {
+    "memory": lambda: MemoryCacheBackend(
+        max_entries=settings.NOTE_CACHE_MAX_ENTRIES,
+        max_bytes=settings.NOTE_CACHE_MAX_MB * 1024 * 1024,
+    ),
+}
+
+
+# ── Cache ──
+
+class NoteCache:
+    """Encrypts on write, decrypts on read; keys are SHA-256 of the request."""
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """Stable hash of the prompt, template, specialty, model and sampling params."""
+        canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        encrypted = self.backend.get(key)
+        if encrypted is None:
+            self.misses += 1
+            return None
+        try:
+            value = decrypt_text(encrypted)
+        except Exception as e:
+            # Key rotated or corrupt entry — treat as a miss.
+            logger.warning(f"Dropping undecryptable note cache entry: {e}")
+            self.backend.delete(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        if self.enabled and value:
+            self.backend.set(key, encrypt_text(value), self.ttl)
+
+
+def _build_cache() -> NoteCache:
+    factory = BACKENDS.get(settings.NOTE_CACHE_BACKEND)
+    if factory is None and settings.NOTE_CACHE_BACKEND != "none":
+        logger.warning(f"⚠️  Unknown NOTE_CACHE_BACKEND={settings.NOTE_CACHE_BACKEND!r} — cache disabled")
+    return NoteCache(factory() if factory else None, ttl=settings.NOTE_CACHE_TTL_SECONDS)
+
+
+note_cache = _build_cache()
@@ -0,0 +1,141 @@
+# note_pipeline.py — Map-reduce note generation for long transcripts
+
+import asyncio
+import functools
+import re
+from typing import Awaitable, Callable, Optional
+
+from config import settings
+
+# A turn starts at a speaker label ("Doctor:", "PATIENT:", "Speaker 2:") and/or
+# a timestamp ("[00:12:34]", "12:34 -") at the beginning of a line.
+_TURN_START = re.compile(
+    r"^\s*(?:\[?\d{1,2}:\d{2}(?::\d{2})?\]?\s*-?\s*)?(?:[A-Z][A-Za-z0-9 .'-]{0,30}:)",
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_CITATION = re.compile(r"\(@[\d:]+\)")
+_NON_WORD = re.compile(r"[^\w]+")
+
+FACT_EXTRACTION_PROMPT = """You are an expert medical scribe AI extracting facts from ONE
+part of a longer clinician-patient transcript. Do not write a note.
+
+List every clinically relevant fact stated in this part as terse bullet points,
+grouped under these headings (omit empty headings):
+COMPLAINTS, HISTORY, MEDICATIONS, ALLERGIES, ROS POSITIVES, ROS NEGATIVES,
+VITALS, EXAM, RESULTS, ASSESSMENT, PLAN, OTHER.
+
+NEVER infer findings that are not stated. Mark anything ambiguous with [VERIFY].
+If lines start with a [mm:ss] timestamp, end each fact with the timestamp of the
+line it came from, e.g. "- chest pain x3 days (@02:14)".
+"""
+
+@functools.lru_cache(maxsize=256)
+def _fact_prefix(specialty: str) -> str:
+    """Map-step system message: the same bytes for every chunk of a specialty (prefix cache)."""
+    return f"{FACT_EXTRACTION_PROMPT}\nSpecialty context: {specialty}\n"
+
+
+CompleteFn = Callable[[list[dict], int, float], Awaitable[str]]
+
+
+def split_transcript(transcript: str, max_chars: Optional[int] = None) -> list[str]:
+    """Split on speaker/time boundaries into chunks of at most ~max_chars.
+
+    Turns are packed greedily and never split, unless a single turn is longer
+    than `max_chars` — then it falls back to sentence boundaries.
+    """
+    max_chars = max_chars or settings.NOTE_CHUNK_CHARS
+    turns: list[str] = []
+    for line in transcript.splitlines():
+        if not line.strip():
+            continue
+        if turns and not _TURN_START.match(line):
+            turns[-1] += "\n" + line  # continuation of the previous turn
+        else:
+            turns.append(line)
+
+    pieces: list[str] = []
+    for turn in turns:
+        if len(turn) <= max_chars:
+            pieces.append(turn)
+        else:
+            pieces.extend(s for s in _SENTENCE_END.split(turn) if s)
+
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for piece in pieces:
+        if current and size + len(piece) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+async def extract_facts(
+    chunks: list[str],
+    specialty: str,
+    complete: CompleteFn,
+    concurrency: Optional[int] = None,
+) -> list[str]:
+    """Map step: extract facts from every chunk, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency or settings.NOTE_MAP_CONCURRENCY)
+
+    async def extract(index: int, chunk: str) -> str:
+        messages = [
+            {"role": "system", "content": _fact_prefix(specialty)},
+            {
+                "role": "user",
+                "content": f"Transcript part {index + 1} of {len(chunks)}:\n\n{chunk}",
+            },
+        ]
+        async with semaphore:
+            return await complete(messages, settings.NOTE_MAP_MAX_TOKENS, 0.1)
+
+    return await asyncio.gather(*(extract(i, c) for i, c in enumerate(chunks)))
+
+
+def dedupe_facts(facts: list[str]) -> list[str]:
+    """Drop bullets already listed in an earlier part, then headings left empty.
+
+    Chunks of one encounter restate the same medications, history and so on;
+    only exact repeats (ignoring case, punctuation and the citation) go.
+    """
+    seen: set[str] = set()
+    deduped = []
+    for part in facts:
+        lines: list[str] = []
+        for line in part.splitlines():
+            if line.lstrip().startswith(("-", "*", "•")):
+                key = _NON_WORD.sub(" ", _CITATION.sub("", line.lower())).strip()
+                if key in seen:
+                    continue
+                seen.add(key)
+            elif lines and not lines[-1].lstrip().startswith(("-", "*", "•")):
+                lines.pop()  # the previous heading has no bullets left
+            lines.append(line)
+        if lines and not lines[-1].lstrip().startswith(("-", "*", "•")):
+            lines.pop()
+        deduped.append("\n".join(lines) or "(nothing new)")
+    return deduped
+
+
+def build_reduce_messages(facts: list[str], prefix: str) -> list[dict]:
+    """Reduce step prompt: the note prefix (system message), then the ordered facts."""
+    sections = "\n\n".join(
+        f"--- Part {i + 1} of {len(facts)} ---\n{f}" for i, f in enumerate(facts)
+    )
+    return [
+        {"role": "system", "content": prefix},
+        {
+            "role": "user",
+            "content": f"""The encounter was long, so its transcript was pre-processed into chronological
+fact lists, one per part. Later parts may update or correct earlier ones.
+
+EXTRACTED FACTS:
+{sections}""",
+        },
+    ]
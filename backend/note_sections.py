@@ -0,0 +1,69 @@
+# note_sections.py — Detect note section boundaries in a token stream
+
+import re
+from typing import Optional
+
+# "**ASSESSMENT:**", "ASSESSMENT:", "## Plan", "**Plan**", "Assessment & Plan:"
+_HEADING = re.compile(
+    r"^\s*(?:#{1,6}\s*)?\*{0,2}\s*([A-Za-z][A-Za-z &/()-]{1,40}?)\s*:?\s*\*{0,2}\s*:?\s*$"
+)
+
+
+def _heading_name(line: str) -> Optional[str]:
+    """Return the normalised heading for a heading line, else None."""
+    stripped = line.strip()
+    if not stripped:
+        return None
+    is_marked = (
+        stripped.startswith("#")
+        or (stripped.startswith("**") and stripped.rstrip(":").endswith("**"))
+        or stripped.endswith(":")
+    )
+    match = _HEADING.match(stripped)
+    if not is_marked or match is None:
+        return None
+    name = match.group(1).strip().upper()
+    # Bullet items like "- Allergies:" are fields, not sections.
+    if stripped.startswith(("-", "•")):
+        return None
+    return name
+
+
+class SectionTracker:
+    """Feed streamed text; reports each section once it is complete.
+
+    A section completes when the next heading starts or the stream ends.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self.current: Optional[str] = None
+        self.completed: list[str] = []
+
+    def feed(self, text: str) -> list[str]:
+        """Consume a chunk; return the sections completed by it (in order)."""
+        self._pending += text
+        *lines, self._pending = self._pending.split("\n")
+        done = []
+        for line in lines:
+            name = _heading_name(line)
+            if name is None:
+                continue
+            if self.current is not None:
+                done.append(self.current)
+            self.current = name
+        self.completed.extend(done)
+        return done
+
+    def finish(self) -> list[str]:
+        """Flush at end of stream; the last open section completes."""
+        done = self.feed("\n")
+        if self.current is not None:
+            done.append(self.current)
+            self.completed.append(self.current)
+            self.current = None
+        return done
+
+    def has_completed(self, *keywords: str) -> bool:
+        """True once, for every keyword, some completed heading contains it."""
+        return all(any(k in name for name in self.completed) for k in keywords)
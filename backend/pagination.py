@@ -0,0 +1,32 @@
+# pagination.py — Opaque keyset (cursor) pagination helpers
+
+import base64
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """`value` as naive UTC, the form created_at is stored in (naive values pass through)."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    """Encode the sort key of the last row on a page."""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple[datetime, str]]:
+    """Decode a cursor from encode_cursor(); 400 on anything malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.split("|", 1)
+        return naive_utc(datetime.fromisoformat(created_at)), row_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,152 @@
+# prompt_tokens.py — Transcript compaction + local token estimates for LLM prompts
+#
+# Transcripts are compacted before they go into a prompt: disfluencies and
+# stutters are dropped (segments.clean_text), repeated sentences and echoed
+# lines (STT repetition, crosstalk picked up twice) are removed, and a
+# speaker's consecutive lines are merged under one label. Words that carry
+# meaning, including backchannel answers like "mm-hmm", are never dropped.
+#
+# Token counts come from tiktoken when it is installed (an approximation of
+# the model's own tokenizer), otherwise from a word/punctuation heuristic that
+# errs high. Either way no request leaves the process to count tokens.
+
+import logging
+import re
+from typing import Optional
+
+from config import settings
+from segments import clean_text
+
+logger = logging.getLogger(__name__)
+
+_MESSAGE_OVERHEAD = 4  # role + separators per chat message
+_LABEL = re.compile(r"^\s*((?:\[[\d:]+\]\s*)?[A-Z][A-Za-z0-9 .'-]{0,30}:)\s*(.*)$")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_NORMALIZE = re.compile(r"[^\w]+")
+_PIECES = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+
+class PromptTooLargeError(Exception):
+    """A prompt is over its token limit even after compaction (→ 413): the transcript
+    (NOTE_MAX_TRANSCRIPT_TOKENS) or the map-reduce facts (the model context)."""
+
+    def __init__(self, tokens: int, limit: int, what: str = "Transcript"):
+        super().__init__(
+            f"{what} is ~{tokens} tokens after compaction; the limit is {limit}"
+        )
+        self.tokens = tokens
+        self.limit = limit
+
+
+# ── Token estimates ──
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _tiktoken():
+    """The tiktoken encoding, or None (not installed, disabled or failed to load)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if settings.TOKENIZER != "heuristic":
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+            except ImportError:
+                pass
+            except Exception as e:  # the encoding file is fetched on first use
+                logger.warning(f"⚠️  tiktoken unavailable ({e!r}); using the heuristic token count")
+    return _encoding
+
+
+def tokenizer_name() -> str:
+    return f"tiktoken/{settings.TOKENIZER_ENCODING}" if _tiktoken() is not None else "heuristic"
+
+
+def _heuristic_tokens(text: str) -> int:
+    # A word is one token plus one per further 6 letters, numbers go in
+    # 3-digit pieces, punctuation is a token each: a little above BPE counts.
+    return sum(
+        1 + (len(piece) - 1) // 6 if piece[0].isalpha() else 1
+        for piece in _PIECES.findall(text)
+    )
+
+
+def count_tokens(text: str) -> int:
+    """Estimated tokens in `text`."""
+    encoding = _tiktoken()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return _heuristic_tokens(text)
+
+
+def message_tokens(messages: list[dict]) -> int:
+    """Estimated prompt tokens of a chat request."""
+    return sum(
+        count_tokens(m.get("content") or "") + _MESSAGE_OVERHEAD for m in messages
+    )
+
+
+def completion_budget(messages: list[dict], max_tokens: int) -> Optional[int]:
+    """max_tokens that fits the model context next to this prompt, or None.
+
+    The request's max_tokens is lowered to fit, but not below
+    NOTE_MIN_COMPLETION_TOKENS; None means the prompt is too long for one call.
+    """
+    prompt = int(message_tokens(messages) * settings.TOKEN_ESTIMATE_MARGIN)
+    room = settings.LLM_CONTEXT_TOKENS - prompt
+    if room < min(max_tokens, settings.NOTE_MIN_COMPLETION_TOKENS):
+        return None
+    return min(max_tokens, room)
+
+
+# ── Compaction ──
+
+def _key(text: str) -> str:
+    return _NORMALIZE.sub(" ", text.lower()).strip()
+
+
+def _dedupe_sentences(text: str) -> str:
+    """Drop a sentence that repeats the one before it ("Okay. Okay. Okay.")."""
+    kept: list[str] = []
+    for sentence in _SENTENCE.split(text):
+        if not kept or _key(sentence) != _key(kept[-1]):
+            kept.append(sentence)
+    return " ".join(kept)
+
+
+def compact_transcript(transcript: str) -> str:
+    """Cleaned transcript: one line per speaker turn, no fillers or echoes."""
+    lines: list[tuple[Optional[str], str]] = []  # (label, text)
+    for raw in transcript.splitlines():
+        match = _LABEL.match(raw)
+        label, text = (match.group(1), match.group(2)) if match else (None, raw)
+        text = _dedupe_sentences(clean_text(text))
+        if not text:
+            continue
+        speaker = label.split("]")[-1].strip() if label else None
+        if lines:
+            last_label, last_text = lines[-1]
+            last_speaker = last_label.split("]")[-1].strip() if last_label else None
+            same = label is None or speaker == last_speaker
+            if same and _key(text) == _key(last_text):
+                continue  # the same line again (STT repeat, crosstalk echo)
+            if same and last_label is not None:  # same speaker: one line per turn
+                lines[-1] = (last_label, _dedupe_sentences(f"{last_text} {text}"))
+                continue
+        lines.append((label, text))
+    return "\n".join(f"{label} {text}" if label else text for label, text in lines)
+
+
+def compact_segments(segments: list[dict]) -> list[dict]:
+    """Drop a segment that repeats the previous one from the same speaker."""
+    kept: list[dict] = []
+    for seg in segments:
+        last = kept[-1] if kept else None
+        if last and last.get("speaker") == seg.get("speaker") and _key(last["text"]) == _key(seg["text"]):
+            kept[-1] = {**last, "end": max(last["end"], seg["end"])}
+            continue
+        kept.append(seg)
+    return kept
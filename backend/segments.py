@@ -0,0 +1,155 @@
+# segments.py — Timestamped transcript segments: speaker turns + compact prompt text
+#
+# Both STT backends return Whisper segments ({"start", "end", "text"}). Here
+# they are cleaned of pure disfluencies, grouped into speaker turns and labelled
+# CLINICIAN / PATIENT, then rendered as compact "[mm:ss] DR: / PT:" lines for
+# the LLM. Labelling is a CPU-only heuristic (pauses, questions, lexical cues),
+# not an audio model, so labels a client already supplies always win.
+
+import re
+from typing import Iterable, Optional
+
+from config import settings
+
+CLINICIAN = "CLINICIAN"
+PATIENT = "PATIENT"
+SPEAKERS = (CLINICIAN, PATIENT)
+
+# Only pure disfluencies. "uh-huh" / "mm-hmm" are answers and are kept.
+_FILLER = re.compile(r"(?<![\w-])(?:u+m+|u+h+|e+rm+|a+h+|h+m+)(?![\w-])[,.]?\s*", re.I)
+_REPEAT = re.compile(r"\b([A-Za-z]+)(?:,?\s+\1\b)+", re.I)  # "I I I think" → "I think"
+_SPACES = re.compile(r"\s{2,}")
+_STAMP_SECONDS = 15  # longest stretch of prompt text without a timestamp
+_TAGS = {CLINICIAN: "DR", PATIENT: "PT"}  # prompt speaker tags
+
+_CLINICIAN_CUES = re.compile(
+    r"\b(?:do you|did you|have you|are you|any (?:\w+ )?(?:pain|fever|history|allergies)"
+    r"|how (?:long|often|much|many|is|are)|when did|can you|let me|let's"
+    r"|i(?:'m| am) going to|i'd like (?:you|to)|we(?:'ll| will| should)"
+    r"|prescrib\w*|refer\w*|order(?:ing)?|exam\w*|take a deep breath|follow[- ]up"
+    r"|your)\b",
+    re.I,
+)
+_PATIENT_CUES = re.compile(
+    r"\b(?:i(?:'ve| have) (?:been|had)|i feel|i felt|it hurts|hurts|my|i take"
+    r"|i(?:'m| am) taking|i don't|i didn't|i can't|i think|started|yes|yeah|no|nope)\b",
+    re.I,
+)
+
+
+def clean_text(text: str) -> str:
+    """Drop disfluencies and stutter repeats; the words that carry meaning stay."""
+    text = _FILLER.sub("", text)
+    text = _REPEAT.sub(r"\1", text)
+    return _SPACES.sub(" ", text).strip(" ,")
+
+
+def parse_segments(raw: Optional[Iterable]) -> list[dict]:
+    """Validated, cleaned, time-ordered segments from STT output or a client.
+
+    Entries without usable times or text are skipped; a "speaker" is kept only
+    if it is one of SPEAKERS.
+    """
+    segments = []
+    for seg in raw or []:
+        if not isinstance(seg, dict):
+            seg = getattr(seg, "model_dump", lambda: {})()
+        try:
+            start, end = float(seg["start"]), float(seg["end"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        text = clean_text(str(seg.get("text") or ""))
+        if not text:
+            continue
+        segment = {"start": round(start, 2), "end": round(max(start, end), 2), "text": text}
+        speaker = str(seg.get("speaker") or "").upper()
+        if speaker in SPEAKERS:
+            segment["speaker"] = speaker
+        segments.append(segment)
+    segments.sort(key=lambda s: s["start"])
+    return segments
+
+
+def _score(text: str) -> int:
+    """> 0 sounds like the clinician, < 0 like the patient, 0 undecided."""
+    score = len(_CLINICIAN_CUES.findall(text)) - len(_PATIENT_CUES.findall(text))
+    return score + text.rstrip().endswith("?")
+
+
+def label_speakers(segments: list[dict], turn_gap: Optional[float] = None) -> list[dict]:
+    """Group segments into turns and give every segment a speaker.
+
+    A new turn starts after a pause of `turn_gap` seconds or a question. Each
+    turn is scored on lexical cues; undecided turns alternate with the previous
+    one, and the encounter is assumed to open with the clinician.
+    """
+    turn_gap = settings.SEGMENT_TURN_GAP_SECONDS if turn_gap is None else turn_gap
+    turns: list[list[dict]] = []
+    for seg in segments:
+        prev = turns[-1][-1] if turns else None
+        if (
+            prev is None
+            or seg["start"] - prev["end"] >= turn_gap
+            or prev["text"].endswith("?")
+            or seg.get("speaker") != prev.get("speaker")
+        ):
+            turns.append([seg])
+        else:
+            turns[-1].append(seg)
+
+    previous = PATIENT  # so an undecided first turn becomes the clinician
+    labelled = []
+    for turn in turns:
+        speaker = turn[0].get("speaker")
+        if speaker is None:
+            score = _score(" ".join(s["text"] for s in turn))
+            if score > 0:
+                speaker = CLINICIAN
+            elif score < 0:
+                speaker = PATIENT
+            else:
+                speaker = CLINICIAN if previous == PATIENT else PATIENT
+        labelled.extend({**s, "speaker": speaker} for s in turn)
+        previous = speaker
+    return labelled
+
+
+def timestamp(seconds: float) -> str:
+    """mm:ss, or h:mm:ss past the first hour."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+def speaker_transcript(segments: list[dict]) -> str:
+    """One "SPEAKER: text" line per run of same-speaker segments, e.g.
+
+        [00:00] DR: What brings you in?
+        PT: Chest pain for three days.
+
+    Speakers are abbreviated (DR / PT). A line is timestamped when it starts
+    _STAMP_SECONDS or more after the last timestamp, and a long monologue is
+    cut into a new line at that point, so every line is at most that far from
+    a citable time while short exchanges pay no timestamp tokens.
+    """
+    lines: list[str] = []
+    speaker = None
+    stamped_at = None
+    for seg in segments:
+        stamp = stamped_at is None or seg["start"] - stamped_at >= _STAMP_SECONDS
+        if lines and seg.get("speaker") == speaker and not stamp:
+            lines[-1] += " " + seg["text"]
+            continue
+        speaker = seg.get("speaker")
+        prefix = ""
+        if stamp:
+            stamped_at = seg["start"]
+            prefix = f"[{timestamp(seg['start'])}] "
+        lines.append(f"{prefix}{_TAGS.get(speaker, 'SPEAKER')}: {seg['text']}")
+    return "\n".join(lines)
+
+
+def prepare_segments(raw: Optional[Iterable]) -> list[dict]:
+    """parse_segments + label_speakers: what the API returns and the prompt uses."""
+    return label_speakers(parse_segments(raw))
@@ -1,34 +1,35 @@
 # transcribe_groq.py — Groq-hosted Whisper STT
 
-import os
-import httpx
+from typing import BinaryIO
+
 from config import settings
+from http_client import groq_http, timeout_for
+
 
+async def transcribe_audio(
+    audio: BinaryIO, filename: str = "audio.wav", content_type: str = "audio/wav"
+) -> dict:
+    """Transcribe audio using Groq's Whisper API.
 
-async def transcribe_audio(audio_path: str) -> dict:
-    """Transcribe audio using Groq's Whisper API."""
+    `audio` is any readable binary file object (e.g. the UploadFile spool);
+    httpx streams it into the multipart body in chunks, so it is never
+    loaded into memory whole.
+    """
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        with open(audio_path, "rb") as audio_file:
-            response = await client.post(
-                "https://api.groq.com/openai/v1/audio/transcriptions",
-                headers={"Authorization": f"Bearer {settings.GROQ_API_KEY}"},
-                files={
-                    "file": (
-                        os.path.basename(audio_path),
-                        audio_file,
-                        "audio/wav",
-                    )
-                },
-                data={
-                    "model": "whisper-large-v3",
-                    "language": "en",
-                    "response_format": "verbose_json",
-                    "temperature": "0.0",
-                },
-            )
-        response.raise_for_status()
-        data = response.json()
+    response = await groq_http.client.post(
+        f"{settings.GROQ_BASE_URL}/audio/transcriptions",
+        headers={"Authorization": f"Bearer {settings.GROQ_API_KEY}"},
+        files={"file": (filename, audio, content_type)},
+        data={
+            "model": "whisper-large-v3",
+            "language": "en",
+            "response_format": "verbose_json",
+            "temperature": "0.0",
+        },
+        timeout=timeout_for("transcribe"),
+    )
+    response.raise_for_status()
+    data = response.json()
 
     return {
         "transcript": data["text"],
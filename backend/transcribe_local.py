@@ -1,31 +1,19 @@
 # transcribe_local.py — Local CPU-based Faster-Whisper STT (fallback)
 
-from faster_whisper import WhisperModel
+from typing import BinaryIO
 
-# CPU mode — no GPU needed, but slower (~1x real-time for large-v3)
-# Use "base" or "small" for faster CPU transcription
-whisper = WhisperModel("base", device="cpu", compute_type="int8")
+from whisper_pool import whisper_pool
 
+# CPU mode — no GPU needed, but slower (~1x real-time for large-v3)
+# Use "base" or "small" (WHISPER_MODEL_SIZE) for faster CPU transcription.
+# Models are pre-loaded in a process pool so decoding never blocks the event loop.
 
-async def transcribe_audio(audio_path: str) -> dict:
-    """Transcribe audio using local Faster-Whisper on CPU."""
-    segments, info = whisper.transcribe(audio_path, beam_size=5)
-    segment_list = []
-    full_text = []
 
-    for seg in segments:
-        full_text.append(seg.text)
-        segment_list.append(
-            {
-                "start": seg.start,
-                "end": seg.end,
-                "text": seg.text,
-            }
-        )
+async def transcribe_audio(
+    audio: BinaryIO, filename: str = "audio.wav", content_type: str = "audio/wav"
+) -> dict:
+    """Transcribe audio using local Faster-Whisper on CPU.
 
-    return {
-        "transcript": " ".join(full_text),
-        "segments": segment_list,
-        "language": info.language,
-        "duration": info.duration,
-    }
+    The audio is piped to the worker process rather than written to disk.
+    """
+    return await whisper_pool.transcribe(audio, beam_size=5)
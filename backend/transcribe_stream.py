@@ -0,0 +1,217 @@
+# transcribe_stream.py — Incremental transcription of live audio chunks
+
+import io
+import wave
+from typing import Awaitable, Callable, Optional
+
+from config import settings
+
+# Matroska/WebM Cluster element ID — everything before the first cluster is the
+# init segment (EBML header + Tracks) that every decodable window must start with.
+# A window may only start at a cluster: MediaRecorder timeslices cut clusters
+# anywhere, and blocks without their cluster header do not decode.
+_WEBM_CLUSTER_ID = b"\x1f\x43\xb6\x75"
+_WEBM_TIMECODE_ID = 0xE7  # Cluster Timecode, its first child
+_WEBM_TIMECODE_SCALE_ID = b"\x2a\xd7\xb1"  # Segment Info, ns per timecode tick
+
+
+def _read_vint(data: bytes, pos: int) -> Optional[tuple[int, int]]:
+    """EBML variable-size integer at `pos` → (value, length); None if truncated or invalid."""
+    if pos >= len(data) or data[pos] == 0:
+        return None
+    length = 9 - data[pos].bit_length()
+    if pos + length > len(data):
+        return None
+    value = data[pos] & (0xFF >> length)
+    for byte in data[pos + 1 : pos + length]:
+        value = (value << 8) | byte
+    return value, length
+
+
+def _read_uint(data: bytes, pos: int) -> Optional[int]:
+    """Unsigned-integer element body (size vint + value) at `pos`; None if truncated."""
+    size = _read_vint(data, pos)
+    if size is None or not 1 <= size[0] <= 8 or pos + size[1] + size[0] > len(data):
+        return None
+    start = pos + size[1]
+    return int.from_bytes(data[start : start + size[0]], "big")
+
+
+def _cluster_timecode(data: bytes, pos: int) -> Optional[int]:
+    """Timecode of the Cluster starting at `pos`, or None if the header is incomplete.
+
+    Also None for a false match (the ID bytes inside audio): a real Cluster is a
+    valid size (often "unknown") followed by its Timecode element.
+    """
+    size = _read_vint(data, pos + len(_WEBM_CLUSTER_ID))
+    if size is None:
+        return None
+    pos += len(_WEBM_CLUSTER_ID) + size[1]
+    if pos >= len(data) or data[pos] != _WEBM_TIMECODE_ID:
+        return None
+    return _read_uint(data, pos + 1)
+
+
+TranscribeFn = Callable[..., Awaitable[dict]]
+
+
+class StreamingTranscriber:
+    """Buffers audio chunks and transcribes a sliding window over them.
+
+    The window always starts at the last committed (stable) point, so audio
+    is re-transcribed with overlap until its segments stop changing. Segments
+    that end more than `holdback` seconds before the window end are emitted as
+    final; the rest are sent as a partial hypothesis and revisited next step.
+
+    Two input formats are supported:
+      - "webm":  MediaRecorder chunks (the first chunk carries the init segment)
+      - "pcm16": raw 16-bit mono little-endian PCM at `sample_rate`
+    """
+
+    def __init__(
+        self,
+        transcribe: TranscribeFn,
+        fmt: str = "webm",
+        sample_rate: int = 16000,
+        chunk_seconds: float = 1.0,
+        max_window: float = settings.STREAM_MAX_WINDOW_SECONDS,
+        holdback: float = settings.STREAM_HOLDBACK_SECONDS,
+    ):
+        if fmt not in ("webm", "pcm16"):
+            raise ValueError(f"Unsupported stream format: {fmt}")
+        self.transcribe = transcribe
+        self.fmt = fmt
+        self.sample_rate = sample_rate
+        self.chunk_seconds = chunk_seconds
+        self.max_window = max_window
+        self.holdback = holdback
+
+        self._init_segment: bytes = b""
+        self._chunks = 0
+        self._webm = bytearray()  # everything after the init segment
+        self._clusters: list[tuple[float, int]] = []  # (start seconds, offset in _webm)
+        self._scanned = 0
+        self._timecode_scale = 1_000_000  # ns; the Matroska default (and Chrome's)
+        self._pcm = bytearray()
+
+        self.committed: list[dict] = []
+        self.committed_until = 0.0
+        self._transcribed_until = 0.0
+
+    # ── Buffering ──
+
+    def add_chunk(self, data: bytes) -> None:
+        """Append one audio chunk received from the client."""
+        if self.fmt == "pcm16":
+            self._pcm.extend(data)
+            return
+
+        if not self._chunks:
+            idx = data.find(_WEBM_CLUSTER_ID)
+            self._init_segment = data[:idx] if idx > 0 else b""
+            data = data[idx:] if idx > 0 else data
+            idx = self._init_segment.find(_WEBM_TIMECODE_SCALE_ID)
+            if idx >= 0:
+                scale = _read_uint(self._init_segment, idx + len(_WEBM_TIMECODE_SCALE_ID))
+                self._timecode_scale = scale or self._timecode_scale
+        self._chunks += 1
+        self._webm.extend(data)
+        self._scan_clusters()
+
+    def _scan_clusters(self) -> None:
+        """Index the clusters that arrived since the last chunk (IDs may span chunks)."""
+        while True:
+            idx = self._webm.find(_WEBM_CLUSTER_ID, self._scanned)
+            if idx < 0:
+                self._scanned = max(self._scanned, len(self._webm) - len(_WEBM_CLUSTER_ID) + 1)
+                return
+            # The ID's 4 bytes plus a size and timecode need at most 21 bytes.
+            timecode = _cluster_timecode(self._webm, idx)
+            if timecode is None and len(self._webm) - idx < 21:
+                self._scanned = idx  # header incomplete: retry with the next chunk
+                return
+            if timecode is not None:
+                self._clusters.append((timecode * self._timecode_scale / 1e9, idx))
+            self._scanned = idx + 1
+
+    @property
+    def buffered_seconds(self) -> float:
+        """Total audio received so far."""
+        if self.fmt == "pcm16":
+            return len(self._pcm) / (2 * self.sample_rate)
+        return self._chunks * self.chunk_seconds
+
+    @property
+    def pending_seconds(self) -> float:
+        """Audio received since the last transcription step."""
+        return self.buffered_seconds - self._transcribed_until
+
+    def _window(self) -> tuple[float, bytes, str]:
+        """Return (start_time, encoded audio, file suffix) for the current window."""
+        if self.fmt == "pcm16":
+            start_sample = int(self.committed_until * self.sample_rate)
+            buf = io.BytesIO()
+            with wave.open(buf, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(self.sample_rate)
+                wav.writeframes(bytes(self._pcm[start_sample * 2 :]))
+            return start_sample / self.sample_rate, buf.getvalue(), ".wav"
+
+        # WebM is cut at the last cluster starting at or before `committed_until`;
+        # the overlap is deduplicated against it when segments come back.
+        start, offset = 0.0, 0
+        for cluster_start, cluster_offset in self._clusters:
+            if cluster_start > self.committed_until:
+                break
+            start, offset = cluster_start, cluster_offset
+        return start, self._init_segment + bytes(self._webm[offset:]), ".webm"
+
+    # ── Transcription ──
+
+    async def step(self, final: bool = False) -> list[dict]:
+        """Transcribe the current window and return client events."""
+        window_end = self.buffered_seconds
+        if window_end <= self.committed_until:
+            return []
+
+        window_start, audio, suffix = self._window()
+        content_type = "audio/wav" if suffix == ".wav" else "audio/webm"
+        result = await self.transcribe(
+            io.BytesIO(audio), filename=f"window{suffix}", content_type=content_type
+        )
+        self._transcribed_until = window_end
+
+        stable_before = window_end if final else window_end - self.holdback
+        new_final: list[dict] = []
+        partial: list[str] = []
+
+        for seg in result.get("segments", []):
+            start = window_start + seg["start"]
+            end = window_start + seg["end"]
+            if end <= self.committed_until:
+                continue  # already emitted from an earlier, overlapping window
+            if end <= stable_before:
+                segment = {"start": round(start, 2), "end": round(end, 2), "text": seg["text"].strip()}
+                new_final.append(segment)
+                self.committed_until = end
+            else:
+                partial.append(seg["text"].strip())
+
+        # Silence or unrecognisable audio: never let the window grow unbounded.
+        if window_end - self.committed_until > self.max_window:
+            self.committed_until = window_end - self.holdback
+
+        self.committed.extend(new_final)
+
+        events = []
+        if new_final:
+            events.append({"type": "final", "segments": new_final})
+        if not final:
+            events.append({"type": "partial", "text": " ".join(partial), "start": round(self.committed_until, 2)})
+        return events
+
+    @property
+    def transcript(self) -> str:
+        """Full transcript of all committed segments."""
+        return " ".join(s["text"] for s in self.committed if s["text"])
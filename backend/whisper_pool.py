@@ -0,0 +1,259 @@
+# whisper_pool.py — Process pool of pre-loaded Faster-Whisper models
+
+import asyncio
+import contextlib
+import errno
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolFullError(Exception):
+    """Raised when the transcription queue is at capacity (mapped to HTTP 429)."""
+
+
+class TranscriptionCancelled(Exception):
+    """Raised inside a worker when its job was cancelled mid-transcription."""
+
+
+# ── Worker process side ──
+# Each worker loads its own WhisperModel once, in the pool initializer.
+
+_model = None
+_cancelled = None
+
+
+def _init_worker(model_size: str, compute_type: str, cpu_threads: int, cancelled) -> None:
+    global _model, _cancelled
+    from faster_whisper import WhisperModel
+
+    _model = WhisperModel(
+        model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads
+    )
+    _cancelled = cancelled
+
+
+def _warmup() -> bool:
+    return _model is not None
+
+
+def _run_job(job_id: str, audio_path: str, beam_size: int) -> dict:
+    # `audio_path` is a named pipe fed by the API process (decoding reads it once),
+    # or a temp file for containers that need seeking.
+    segments, info = _model.transcribe(audio_path, beam_size=beam_size)
+    segment_list = []
+    full_text = []
+
+    # The generator decodes lazily — check for cancellation between segments.
+    for seg in segments:
+        if job_id in _cancelled:
+            raise TranscriptionCancelled(job_id)
+        full_text.append(seg.text)
+        segment_list.append({"start": seg.start, "end": seg.end, "text": seg.text})
+
+    return {
+        "transcript": " ".join(full_text),
+        "segments": segment_list,
+        "language": info.language,
+        "duration": info.duration,
+    }
+
+
+# ── Event loop side ──
+
+_PIPE_CHUNK = 64 * 1024
+
+# ISO-BMFF (mp4/m4a/mov) starts with a box whose type is at bytes 4-8. Its index
+# (moov) is often written after the media, so the decoder has to seek: those go
+# through a temp file instead of the pipe.
+_SNIFF_BYTES = 8
+_ISO_BMFF_BOXES = (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide")
+
+
+def _needs_seek(head: bytes) -> bool:
+    return head[4:8] in _ISO_BMFF_BOXES
+
+
+def _write_file(audio: BinaryIO, head: bytes, path: str) -> None:
+    """Copy the audio into a new private temp file (runs in a thread)."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as out:
+        out.write(head)
+        shutil.copyfileobj(audio, out, _PIPE_CHUNK)
+
+
+def _feed_fifo(audio: BinaryIO, head: bytes, fifo_path: str, abort: threading.Event) -> None:
+    """Copy the audio into the FIFO in fixed-size chunks (runs in a thread).
+
+    Opening a FIFO for writing blocks until a reader appears, which never
+    happens for a job cancelled while queued — so poll with O_NONBLOCK instead.
+    """
+    while True:
+        try:
+            fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+            break
+        except OSError as e:
+            if e.errno != errno.ENXIO:
+                raise
+            if abort.wait(0.01):
+                return
+
+    os.set_blocking(fd, True)
+    try:
+        with os.fdopen(fd, "wb") as pipe:
+            pipe.write(head)
+            shutil.copyfileobj(audio, pipe, _PIPE_CHUNK)
+    except BrokenPipeError:
+        pass  # worker failed or was cancelled before reading everything
+
+
+class WhisperPool:
+    """Bounded pool of Faster-Whisper worker processes.
+
+    At most `workers` jobs run in parallel and at most `queue_size` more wait;
+    anything beyond that is rejected immediately with PoolFullError so the
+    API can answer 429 instead of piling up work.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.WHISPER_WORKERS,
+        queue_size: int = settings.WHISPER_QUEUE_SIZE,
+    ):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.in_flight = 0
+        self.state = "stopped"  # stopped | warming | ready | failed
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._cancelled = None
+        self._warmups: list = []
+        self._lock = threading.Lock()  # start() runs in a thread during warm-up
+
+    def start(self) -> None:
+        """Spawn worker processes; each pre-loads the model."""
+        with self._lock:
+            if self._executor is None:
+                self._spawn()
+
+    def _spawn(self) -> None:
+        self.state = "warming"
+        ctx = multiprocessing.get_context("spawn")
+        self._manager = ctx.Manager()
+        self._cancelled = self._manager.dict()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(
+                settings.WHISPER_MODEL_SIZE,
+                settings.WHISPER_COMPUTE_TYPE,
+                settings.WHISPER_CPU_THREADS,
+                self._cancelled,
+            ),
+        )
+        # Force every worker to start (and load its model) now rather than on first request.
+        self._warmups = [self._executor.submit(_warmup) for _ in range(self.workers)]
+        logger.info(
+            f"Whisper pool started ({self.workers} workers, model={settings.WHISPER_MODEL_SIZE})"
+        )
+
+    async def warm_up(self) -> None:
+        """Start the pool off the event loop and wait until every model is loaded.
+
+        Run as a background task from the lifespan so the API starts serving
+        (and reports live, not ready) while models load.
+        """
+        try:
+            await asyncio.to_thread(self.start)
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in self._warmups))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.state = "failed"
+            logger.warning(f"⚠️  Whisper model warm-up failed: {e!r}")
+            return
+        self.state = "ready"
+        logger.info("✅ Whisper models loaded")
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def shutdown(self) -> None:
+        """Stop worker processes, cancelling queued jobs."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+            self._warmups = []
+            self.state = "stopped"
+
+    async def transcribe(self, audio: BinaryIO, beam_size: int = 5) -> dict:
+        """Run one transcription job; cancelling the awaiting task cancels the job.
+
+        The audio is streamed to the worker through a named pipe, so the API
+        process holds at most one chunk of it regardless of recording length.
+        MP4/M4A can't be decoded from a pipe and are spooled to a temp file.
+        """
+        if self.in_flight >= self.capacity:
+            raise PoolFullError(
+                f"Transcription queue full ({self.in_flight}/{self.capacity})"
+            )
+        self.in_flight += 1  # before any await, so concurrent calls see the slot taken
+        job_id = str(uuid.uuid4())
+        abort = threading.Event()
+        loop = asyncio.get_running_loop()
+        audio_path = feeder = future = None
+        try:
+            # Both can block (spawning workers if warm-up didn't run, reading a
+            # spooled upload from disk), so keep them off the event loop.
+            await asyncio.to_thread(self.start)
+            head = await asyncio.to_thread(audio.read, _SNIFF_BYTES)
+            seekable = _needs_seek(head)
+            audio_path = os.path.join(
+                tempfile.gettempdir(), f"medscribe-{job_id}.{'audio' if seekable else 'pipe'}"
+            )
+            if seekable:
+                feeder = loop.run_in_executor(None, _write_file, audio, head, audio_path)
+                await asyncio.shield(feeder)
+            else:
+                os.mkfifo(audio_path, 0o600)
+                feeder = loop.run_in_executor(None, _feed_fifo, audio, head, audio_path, abort)
+            future = self._executor.submit(_run_job, job_id, audio_path, beam_size)
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Queued jobs are dropped outright; a running job stops at its next segment.
+            if future is not None and not future.cancel():
+                self._cancelled[job_id] = True
+                future.add_done_callback(lambda _: self._cancelled.pop(job_id, None))
+            raise
+        finally:
+            self.in_flight -= 1
+            abort.set()
+            if feeder is not None:
+                await asyncio.shield(feeder)
+            if audio_path is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(audio_path)
+
+    @property
+    def queued(self) -> int:
+        """Jobs waiting for a free worker."""
+        return max(0, self.in_flight - self.workers)
+
+
+whisper_pool = WhisperPool()
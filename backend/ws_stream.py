@@ -0,0 +1,171 @@
+# ws_stream.py — Coalesced note-token frames (JSON or compact binary) for WebSockets
+
+import asyncio
+import json
+from typing import AsyncGenerator, AsyncIterator, Optional
+
+from fastapi import WebSocket
+
+from config import settings
+from note_sections import SectionTracker
+
+FRAMINGS = ("json", "binary")
+MAX_COALESCE_MS = 250  # upper bound for a client-requested window
+
+# Binary framing: one type byte followed by a UTF-8 payload.
+FRAME_GENERATION = b"g"  # generation id, first frame of every stream
+FRAME_TOKEN = b"t"  # text delta
+FRAME_SECTION = b"s"  # name of a section that just completed
+FRAME_DONE = b"d"  # end of stream (no payload)
+FRAME_ERROR = b"e"  # error message, stream ends
+
+
+async def coalesce(
+    tokens: AsyncIterator[str],
+    window: float,
+    max_bytes: int,
+) -> AsyncGenerator[str, None]:
+    """Merge deltas into batches.
+
+    A batch is flushed `window` seconds after its first delta arrived, or once
+    it holds `max_bytes` of text, whichever comes first — so a stall upstream
+    never holds back text already received. window <= 0 passes deltas through.
+    Closing this generator cancels the upstream stream.
+    """
+    if window <= 0:
+        async for token in tokens:
+            yield token
+        return
+
+    loop = asyncio.get_running_loop()
+    buffer: list[str] = []
+    size = 0
+    ready = asyncio.Event()
+    timer: Optional[asyncio.TimerHandle] = None
+    finished = False
+    error: Optional[Exception] = None
+
+    async def pump():
+        # Appends deltas; only a full buffer, the window timer or the end
+        # wakes the consumer, so there is one wake-up per frame, not per delta.
+        nonlocal size, timer, finished, error
+        try:
+            async for token in tokens:
+                if not buffer:
+                    timer = loop.call_later(window, ready.set)
+                buffer.append(token)
+                size += len(token)
+                if size >= max_bytes:
+                    ready.set()
+        except Exception as e:
+            error = e
+        finally:
+            finished = True
+            ready.set()
+
+    producer = asyncio.create_task(pump())
+    try:
+        while True:
+            await ready.wait()
+            ready.clear()
+            if timer is not None:
+                timer.cancel()
+                timer = None
+            if buffer:
+                text = "".join(buffer)
+                buffer.clear()
+                size = 0
+                yield text
+            elif finished:
+                if error is not None:
+                    raise error
+                return
+            if finished:
+                ready.set()  # drain what arrived during the send, then stop
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+
+
+class NoteFrameWriter:
+    """Writes one note stream to a WebSocket.
+
+    JSON frames (the default; existing clients only read token / done / error):
+        {"generation_id": "...", "offset": 0, "done": false}
+        {"token": "...", "offset": 123, "done": false}   — offset after this text
+        {"section": "ASSESSMENT", "done": false}   — a section just completed
+        {"token": "", "done": true}
+        {"error": "...", "done": true}
+    Binary frames ("framing": "binary"): FRAME_* type byte + UTF-8 payload.
+    Offsets count Unicode code points; binary clients keep count themselves.
+    """
+
+    def __init__(self, ws: WebSocket, framing: str = "json"):
+        if framing not in FRAMINGS:
+            raise ValueError(f"framing must be one of {FRAMINGS}")
+        self.ws = ws
+        self.binary = framing == "binary"
+        self.frames = 0
+
+    async def _send(self, kind: bytes, payload: str, frame: dict) -> None:
+        self.frames += 1
+        if self.binary:
+            await self.ws.send_bytes(kind + payload.encode())
+        else:
+            await self.ws.send_text(json.dumps(frame, separators=(",", ":"), ensure_ascii=False))
+
+    async def generation(self, generation_id: str, offset: int) -> None:
+        frame = {"generation_id": generation_id, "offset": offset, "done": False}
+        await self._send(FRAME_GENERATION, generation_id, frame)
+
+    async def token(self, text: str, offset: int) -> None:
+        await self._send(FRAME_TOKEN, text, {"token": text, "offset": offset, "done": False})
+
+    async def section(self, name: str) -> None:
+        await self._send(FRAME_SECTION, name, {"section": name, "done": False})
+
+    async def done(self) -> None:
+        await self._send(FRAME_DONE, "", {"token": "", "done": True})
+
+    async def error(self, message: str) -> None:
+        await self._send(FRAME_ERROR, message, {"error": message, "done": True})
+
+
+def coalesce_options(data: dict) -> tuple[float, int]:
+    """(window seconds, byte threshold) from the client's start message or settings."""
+    window_ms = data.get("coalesce_ms", settings.WS_COALESCE_MS)
+    try:
+        window_ms = min(max(float(window_ms), 0.0), MAX_COALESCE_MS)
+    except (TypeError, ValueError):
+        window_ms = settings.WS_COALESCE_MS
+    return window_ms / 1000, settings.WS_COALESCE_BYTES
+
+
+async def send_note_stream(
+    writer: NoteFrameWriter,
+    tokens: AsyncIterator[str],
+    window: float,
+    max_bytes: int,
+    tracker: Optional[SectionTracker] = None,
+    offset: int = 0,
+) -> int:
+    """Coalesce `tokens` onto `writer` with section events; returns the end offset.
+
+    `offset` is where `tokens` starts in the note; a resuming viewer passes a
+    tracker already fed with the text before it.
+    """
+    tracker = tracker or SectionTracker()
+    async for text in coalesce(tokens, window, max_bytes):
+        offset += len(text)
+        await writer.token(text, offset)
+        for name in tracker.feed(text):
+            await writer.section(name)
+    for name in tracker.finish():
+        await writer.section(name)
+    return offset
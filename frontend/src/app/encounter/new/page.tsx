@@ -3,7 +3,7 @@
 import React, { useState, useCallback } from "react";
 import { useRouter } from "next/navigation";
 import TemplateSelector from "@/components/TemplateSelector";
-import AudioRecorder from "@/components/AudioRecorder";
+import AudioRecorder, { StreamedTranscript } from "@/components/AudioRecorder";
 import Pulse from "@/components/Pulse";
 import NoteCanvas, { parseNoteIntoSections } from "@/components/NoteCanvas";
 import { apiRequest } from "@/lib/api";
@@ -22,6 +22,8 @@ export default function NewEncounterPage() {
   const [appState, setAppState] = useState<AppState>("setup");
   const [transcript, setTranscript] = useState("");
   const [manualTranscript, setManualTranscript] = useState("");
+  // Streamed while recording; cleared once the full transcription returns
+  const [liveTranscript, setLiveTranscript] = useState({ finalText: "", partial: "" });
   const [note, setNote] = useState("");
   const [error, setError] = useState("");
 
@@ -34,25 +36,36 @@ export default function NewEncounterPage() {
           ? "generating"
           : "idle";
 
+  const handleLiveTranscript = useCallback(
+    (finalText: string, partial: string) => {
+      setLiveTranscript({ finalText, partial });
+    },
+    [],
+  );
+
   const handleRecordingComplete = useCallback(
-    async (blob: Blob) => {
+    async (blob: Blob, streamed?: Promise<StreamedTranscript | null>) => {
       setAppState("processing");
       setError("");
 
       try {
-        // Step 1: Transcribe
-        const formData = new FormData();
-        formData.append("audio", blob, "recording.webm");
+        // Step 1: Transcribe — the live stream already did, unless it failed
+        let transcribeData = streamed ? await streamed : null;
+        if (!transcribeData) {
+          const formData = new FormData();
+          formData.append("audio", blob, "recording.webm");
 
-        const transcribeRes = await apiRequest("/api/transcribe", {
-          method: "POST",
-          body: formData,
-        });
+          const transcribeRes = await apiRequest("/api/transcribe", {
+            method: "POST",
+            body: formData,
+          });
 
-        if (!transcribeRes.ok) throw new Error("Transcription failed");
+          if (!transcribeRes.ok) throw new Error("Transcription failed");
 
-        const transcribeData = await transcribeRes.json();
+          transcribeData = (await transcribeRes.json()) as StreamedTranscript;
+        }
         setTranscript(transcribeData.transcript);
+        setLiveTranscript({ finalText: "", partial: "" });
 
         // Step 2: Generate note
         setAppState("generating");
@@ -61,6 +74,7 @@ export default function NewEncounterPage() {
           method: "POST",
           body: JSON.stringify({
             transcript: transcribeData.transcript,
+            segments: transcribeData.segments,
             template,
             specialty,
           }),
@@ -115,7 +129,8 @@ export default function NewEncounterPage() {
     try {
       const res = await apiRequest("/api/patient-summary", {
         method: "POST",
-        body: JSON.stringify({ transcript, template, specialty }),
+        // Reuse the note already on screen instead of regenerating it
+        body: JSON.stringify({ transcript, note, template, specialty }),
       });
 
       if (!res.ok) throw new Error("Failed to generate patient summary");
@@ -131,6 +146,7 @@ export default function NewEncounterPage() {
     setAppState("setup");
     setTranscript("");
     setManualTranscript("");
+    setLiveTranscript({ finalText: "", partial: "" });
     setNote("");
     setError("");
   };
@@ -231,7 +247,32 @@ export default function NewEncounterPage() {
             3. Record or Paste Transcript
           </h2>
           <div className="glass-card">
-            <AudioRecorder onRecordingComplete={handleRecordingComplete} />
+            <AudioRecorder
+              onRecordingComplete={handleRecordingComplete}
+              onLiveTranscript={handleLiveTranscript}
+            />
+
+            {/* Live Transcript — streamed while recording */}
+            {(liveTranscript.finalText || liveTranscript.partial) && (
+              <div
+                style={{
+                  marginTop: "var(--space-md)",
+                  fontSize: 13,
+                  color: "var(--text-secondary)",
+                  lineHeight: 1.8,
+                  maxHeight: 160,
+                  overflowY: "auto",
+                }}
+              >
+                {liveTranscript.finalText}
+                {liveTranscript.partial && (
+                  <span style={{ color: "var(--text-tertiary)" }}>
+                    {liveTranscript.finalText ? " " : ""}
+                    {liveTranscript.partial}
+                  </span>
+                )}
+              </div>
+            )}
 
             <div
               style={{
@@ -1,6 +1,7 @@
 "use client";
 
 import React, { useState, useEffect } from "react";
+import { apiRequest } from "@/lib/api";
 
 export default function SettingsPage() {
   const [defaultTemplate, setDefaultTemplate] = useState("soap");
@@ -217,7 +218,11 @@ export default function SettingsPage() {
           <div style={{ marginTop: "var(--space-md)" }}>
             <button
               className="btn btn-danger btn-sm"
-              onClick={() => {
+              onClick={async () => {
+                // Revoke the token server-side too; sign out locally regardless.
+                await apiRequest("/api/auth/logout", { method: "POST" }).catch(
+                  () => undefined,
+                );
                 localStorage.removeItem("medscribe_token");
                 localStorage.removeItem("medscribe_user");
                 window.location.href = "/login";
@@ -91,63 +91,18 @@ export default function ZenModePage() {
       });
 
       if (!transcribeRes.ok) throw new Error("Transcription failed");
-      const { transcript } = await transcribeRes.json();
+      const { transcript, segments } = await transcribeRes.json();
 
       // Stream note generation
       setState("generating");
       setNoteText("");
 
-      try {
-        const ws = new WebSocket(`${WS_BASE}/ws/stream-note`);
-
-        ws.onopen = () => {
-          ws.send(
-            JSON.stringify({
-              transcript,
-              template: "soap",
-              specialty: "general",
-            }),
-          );
-        };
-
-        ws.onmessage = (event) => {
-          const data = JSON.parse(event.data);
-          if (data.done) {
-            setState("complete");
-            ws.close();
-          } else if (data.token) {
-            setNoteText((prev) => prev + data.token);
-          } else if (data.error) {
-            console.error("WS error:", data.error);
-            setState("complete");
-            ws.close();
-          }
-        };
-
-        ws.onerror = async () => {
-          // Fallback to REST if WebSocket fails
-          ws.close();
-          const noteRes = await apiRequest("/api/generate-note", {
-            method: "POST",
-            body: JSON.stringify({
-              transcript,
-              template: "soap",
-              specialty: "general",
-            }),
-          });
-
-          if (noteRes.ok) {
-            const noteData = await noteRes.json();
-            setNoteText(noteData.note);
-          }
-          setState("complete");
-        };
-      } catch {
-        // REST fallback
+      const generateViaRest = async () => {
         const noteRes = await apiRequest("/api/generate-note", {
           method: "POST",
           body: JSON.stringify({
             transcript,
+            segments,
             template: "soap",
             specialty: "general",
           }),
@@ -158,6 +113,67 @@ export default function ZenModePage() {
           setNoteText(noteData.note);
         }
         setState("complete");
+      };
+
+      try {
+        // The server keeps generating if the socket drops; reconnecting with
+        // the generation id + last offset replays what was missed.
+        let generationId: string | null = null;
+        let offset = 0;
+        let finished = false;
+        let retries = 0;
+
+        const connect = () => {
+          const ws = new WebSocket(`${WS_BASE}/ws/stream-note`);
+
+          ws.onopen = () => {
+            ws.send(
+              JSON.stringify(
+                generationId
+                  ? { generation_id: generationId, offset }
+                  : {
+                      transcript,
+                      segments,
+                      template: "soap",
+                      specialty: "general",
+                    },
+              ),
+            );
+          };
+
+          ws.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (data.generation_id) {
+              generationId = data.generation_id;
+              retries = 0;
+            } else if (data.done) {
+              if (data.error) console.error("WS error:", data.error);
+              finished = true;
+              setState("complete");
+              ws.close();
+            } else if (data.token) {
+              setNoteText((prev) => prev + data.token);
+              offset = data.offset;
+            }
+          };
+
+          ws.onclose = () => {
+            if (finished) return;
+            if (!generationId) {
+              // Never got a stream: fall back to REST
+              generateViaRest();
+            } else if (retries < 5) {
+              retries += 1;
+              setTimeout(connect, 1000 * retries);
+            } else {
+              setState("complete");
+            }
+          };
+        };
+
+        connect();
+      } catch {
+        await generateViaRest();
       }
     } catch (err) {
       console.error("Processing error:", err);
@@ -1,14 +1,31 @@
 "use client";
 
 import React, { useRef, useState, useCallback, useEffect } from "react";
+import { WS_BASE } from "@/lib/api";
+
+/** Final result of the live stream (its "done" event), as from /api/transcribe. */
+export interface StreamedTranscript {
+  transcript: string;
+  segments: unknown[];
+}
 
 interface AudioRecorderProps {
-  onRecordingComplete: (blob: Blob) => void;
+  /**
+   * `streamed` resolves to the live stream's transcript, or null if the stream
+   * failed; only then does the recording still need uploading.
+   */
+  onRecordingComplete: (
+    blob: Blob,
+    streamed?: Promise<StreamedTranscript | null>,
+  ) => void;
+  /** Live transcript while recording: committed text + current partial hypothesis. */
+  onLiveTranscript?: (finalText: string, partial: string) => void;
   isDisabled?: boolean;
 }
 
 export default function AudioRecorder({
   onRecordingComplete,
+  onLiveTranscript,
   isDisabled,
 }: AudioRecorderProps) {
   const [isRecording, setIsRecording] = useState(false);
@@ -17,6 +34,7 @@ export default function AudioRecorder({
 
   const mediaRecorderRef = useRef<MediaRecorder | null>(null);
   const chunksRef = useRef<Blob[]>([]);
+  const liveWsRef = useRef<WebSocket | null>(null);
   const timerRef = useRef<NodeJS.Timeout | null>(null);
 
   const formatTime = (seconds: number): string => {
@@ -46,16 +64,64 @@ export default function AudioRecorder({
 
       chunksRef.current = [];
 
+      // Optional live transcription: forward each 1s chunk as it is captured.
+      // Its "done" event is the visit's transcript, so the recording is only
+      // uploaded for a second pass if the stream never opened or failed.
+      let streamed: Promise<StreamedTranscript | null> | undefined;
+      if (onLiveTranscript) {
+        const ws = new WebSocket(`${WS_BASE}/ws/transcribe-stream`);
+        let finalText = "";
+        ws.onopen = () => {
+          ws.send(JSON.stringify({ format: "webm", chunk_seconds: 1 }));
+          // Chunks captured before the socket opened (the first carries the WebM header)
+          chunksRef.current.forEach((chunk) => ws.send(chunk));
+        };
+        streamed = new Promise((resolve) => {
+          ws.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (data.type === "final") {
+              const text = data.segments
+                .map((s: { text: string }) => s.text)
+                .join(" ");
+              finalText = finalText ? `${finalText} ${text}` : text;
+              onLiveTranscript(finalText, "");
+            } else if (data.type === "partial") {
+              onLiveTranscript(finalText, data.text);
+            } else if (data.type === "done") {
+              resolve({ transcript: data.transcript, segments: data.segments });
+              ws.close();
+            } else if (data.type === "error") {
+              resolve(null);
+              ws.close();
+            }
+          };
+          // Closed (or failed to connect) before "done": fall back to the upload
+          ws.onclose = () => resolve(null);
+        });
+        liveWsRef.current = ws;
+      }
+
       mediaRecorder.ondataavailable = (event) => {
         if (event.data.size > 0) {
           chunksRef.current.push(event.data);
+          const ws = liveWsRef.current;
+          if (ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(event.data);
+          }
         }
       };
 
       mediaRecorder.onstop = () => {
         const blob = new Blob(chunksRef.current, { type: "audio/webm" });
-        onRecordingComplete(blob);
         stream.getTracks().forEach((t) => t.stop());
+        const ws = liveWsRef.current;
+        if (ws && ws.readyState === WebSocket.OPEN) {
+          ws.send(JSON.stringify({ event: "stop" }));
+        } else if (ws) {
+          ws.close(); // never got the audio: resolves `streamed` to null
+        }
+        liveWsRef.current = null;
+        onRecordingComplete(blob, streamed);
       };
 
       mediaRecorder.start(1000);
@@ -71,7 +137,7 @@ export default function AudioRecorder({
       console.error("Microphone access denied:", err);
       setPermissionDenied(true);
     }
-  }, [onRecordingComplete]);
+  }, [onRecordingComplete, onLiveTranscript]);
 
   const stopRecording = useCallback(() => {
     if (
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Benchmark: full-note saves vs debounced delta autosave while a note is edited.
+
+Starts the backend with uvicorn in a child process (stateless, short
+AUTOSAVE_DEBOUNCE_SECONDS), saves --editors notes of --note-chars each, then
+replays the same simulated editing session per editor in two modes:
+
+  full   the editor sends the whole note to /api/save-note every --interval
+         seconds while it changes (what a naive autosave does)
+  delta  the editor PATCHes /api/encounters/{id}/note with the splice ops made
+         since its last request, then closes the encounter
+
+Editing is bursts of typing with backspaces and a few jumps to other sections.
+For each mode it reports request bytes sent, request latency, server CPU time,
+and note writes (full saves, or autosave flushes from the edit history). Note
+encryption only happens with a database; the "encrypted" column multiplies the
+writes by the note size and the local AES-GCM cost per note. Checks that the
+saved note equals the editor's text in both modes.
+
+    python scripts/bench_autosave.py --editors 20 --seconds 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+APP_PORT = 8784
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(HERE, "..", "backend")
+APP = f"http://127.0.0.1:{APP_PORT}"
+DEBOUNCE = 1.0
+
+sys.path.insert(0, BACKEND)
+
+from encryption import encrypt_text  # noqa: E402
+
+WORDS = ("patient reports chest pain radiating to the left arm worse on exertion "
+         "denies fever cough nausea blood pressure elevated start lisinopril follow up").split()
+
+
+def note_text(chars: int, seed: int) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for section in ("SUBJECTIVE", "OBJECTIVE", "ASSESSMENT", "PLAN"):
+        lines.append(f"**{section}:**")
+        for _ in range(chars // 4 // 80 + 1):
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(12)) + ".")
+    return "\n".join(lines)[:chars]
+
+
+def session(note: str, seconds: float, seed: int) -> list[tuple[float, list]]:
+    """(time, op) keystrokes: typing bursts at ~6 chars/s with pauses and cursor jumps."""
+    rng = random.Random(seed)
+    events, t, cursor, length = [], 0.0, rng.randint(0, len(note)), len(note)
+    while t < seconds:
+        for _ in range(rng.randint(5, 40)):  # one burst
+            t += rng.expovariate(6)
+            if rng.random() < 0.12 and cursor > 0:
+                events.append((t, [cursor - 1, 1, ""]))
+                cursor, length = cursor - 1, length - 1
+            else:
+                events.append((t, [cursor, 0, rng.choice("etaoinshrdlu ")]))
+                cursor, length = cursor + 1, length + 1
+        t += rng.uniform(1, 4)  # pause to think
+        if rng.random() < 0.3:
+            cursor = rng.randint(0, length)
+    return [e for e in events if e[0] < seconds]
+
+
+def apply(text: str, op: list) -> str:
+    pos, delete, insert = op
+    return text[:pos] + insert + text[pos + delete:]
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def editor(client, mode: str, encounter_id: str, note: str, version: int, events, interval: float, stats: dict):
+    text, pending, started = note, [], time.monotonic()
+    i = 0
+    while i < len(events):
+        await asyncio.sleep(max(0.0, started + events[i][0] + interval - time.monotonic()))
+        now = time.monotonic() - started
+        while i < len(events) and events[i][0] <= now:
+            text = apply(text, events[i][1])
+            pending.append(events[i][1])
+            i += 1
+        if not pending:
+            continue
+        if mode == "full":
+            body = {"encounter_id": encounter_id, "note": text}
+            request = client.build_request("POST", f"{APP}/api/save-note", json=body)
+        else:
+            body = {"base_version": version, "ops": pending}
+            request = client.build_request("PATCH", f"{APP}/api/encounters/{encounter_id}/note", json=body)
+        sent = time.perf_counter()
+        response = await client.send(request)
+        stats["latency"].append(time.perf_counter() - sent)
+        stats["bytes"] += len(request.content)
+        stats["requests"] += 1
+        response.raise_for_status()
+        if mode == "delta":
+            version = response.json()["version"]
+        pending = []
+    if mode == "delta":
+        (await client.post(f"{APP}/api/encounters/{encounter_id}/note/close")).raise_for_status()
+    return text
+
+
+async def run_mode(mode: str, args, proc) -> dict:
+    stats = {"latency": [], "bytes": 0, "requests": 0}
+    async with httpx.AsyncClient(timeout=30) as client:
+        ids, notes, versions = [], [], []
+        for e in range(args.editors):
+            encounter_id = f"{mode}-{e}"
+            note = note_text(args.note_chars, e)
+            response = await client.post(f"{APP}/api/save-note", json={"encounter_id": encounter_id, "note": note})
+            response.raise_for_status()
+            versions.append(response.json()["version"])
+            ids.append(encounter_id)
+            notes.append(note)
+        cpu = cpu_seconds(proc.pid)
+        finals = await asyncio.gather(*(
+            editor(client, mode, ids[e], notes[e], versions[e], session(notes[e], args.seconds, e), args.interval, stats)
+            for e in range(args.editors)
+        ))
+        stats["cpu"] = cpu_seconds(proc.pid) - cpu
+        stats["writes"] = 0
+        stats["ok"] = True
+        for encounter_id, final in zip(ids, finals):
+            history = (await client.get(f"{APP}/api/encounters/{encounter_id}/edits", params={"limit": 500})).json()
+            stats["writes"] += sum(1 for h in history["edits"] if h["source"] == ("save" if mode == "full" else "autosave"))
+            if mode == "full":
+                stats["writes"] -= 1  # the initial save
+            # A stale base version makes the server answer with its current text.
+            check = await client.patch(f"{APP}/api/encounters/{encounter_id}/note", json={"base_version": -1, "ops": []})
+            stats["ok"] &= check.status_code == 409 and check.json()["note"] == final
+    return stats
+
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--editors", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=20, help="editing session length")
+    parser.add_argument("--interval", type=float, default=0.5, help="client send interval while typing")
+    parser.add_argument("--note-chars", type=int, default=6000)
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": "",
+        "NOTE_CACHE_BACKEND": "none",
+        "MEMORY_SNAPSHOT_PATH": "",
+        "AUTOSAVE_DEBOUNCE_SECONDS": str(DEBOUNCE),
+        "AUTOSAVE_MAX_DELAY_SECONDS": str(DEBOUNCE * 5),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient() as client:
+            for _ in range(200):
+                try:
+                    if (await client.get(f"{APP}/health/live")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+        note = note_text(args.note_chars, 0)
+        started = time.perf_counter()
+        for _ in range(200):
+            encrypt_text(note)
+        aes_ms = (time.perf_counter() - started) / 200 * 1000
+
+        print(f"{args.editors} editors x {args.seconds:g} s, {args.note_chars}-char notes, "
+              f"send every {args.interval:g} s, debounce {DEBOUNCE:g} s, AES-GCM {aes_ms:.3f} ms/note\n")
+        print(f"{'mode':<6} {'requests':>9} {'sent KB':>9} {'p50 ms':>7} {'p95 ms':>7} {'server CPU s':>13} "
+              f"{'writes':>7} {'encrypted KB':>13} {'saved text':>11}")
+        for mode in ("full", "delta"):
+            s = await run_mode(mode, args, proc)
+            ms = [t * 1000 for t in s["latency"]]
+            print(
+                f"{mode:<6} {s['requests']:>9} {s['bytes'] / 1024:9.1f} {statistics.median(ms):7.2f} "
+                f"{pct(ms, 0.95):7.2f} {s['cpu']:13.2f} {s['writes']:>7} "
+                f"{s['writes'] * args.note_chars / 1024:13.1f} {'match' if s['ok'] else 'MISMATCH':>11}"
+            )
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
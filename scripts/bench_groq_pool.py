@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark: per-request httpx.AsyncClient vs the shared Groq connection pool.
+
+Sends the same note-generation request (full SOAP prompt) both ways to a
+local stub server and reports p50/p99 latency; only the client differs.
+
+    python scripts/bench_groq_pool.py --requests 500 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+PORT = 8765
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ.setdefault("GROQ_API_KEY", "stub")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import httpx  # noqa: E402
+
+import groq_client  # noqa: E402
+from config import settings  # noqa: E402
+from http_client import groq_http  # noqa: E402
+from groq_stub import StubConfig, run_stub  # noqa: E402
+
+
+HEADERS = {"Authorization": f"Bearer {settings.GROQ_API_KEY}"}
+
+
+def note_payload(transcript: str) -> dict:
+    """The request generate_note sends for a short transcript (same on both sides)."""
+    messages = groq_client._note_messages("soap", "general", transcript, timestamped=False)
+    return {
+        "model": groq_client.MODEL_NAME,
+        "messages": messages,
+        "temperature": 0.3,
+        "max_tokens": groq_client._note_max_tokens(messages, transcript) or 4096,
+        "top_p": 0.9,
+    }
+
+
+async def _post(client: httpx.AsyncClient, transcript: str) -> str:
+    response = await client.post(
+        f"{settings.GROQ_BASE_URL}/chat/completions", headers=HEADERS, json=note_payload(transcript)
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+
+async def per_request_client(transcript: str) -> str:
+    """The pre-pool behaviour: a fresh client (and handshake) for every call."""
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        return await _post(client, transcript)
+
+
+async def pooled_client(transcript: str) -> str:
+    """The same request on the shared, keep-alive connection pool."""
+    return await _post(groq_http.client, transcript)
+
+
+async def run(name: str, fn, total: int, concurrency: int) -> None:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int):
+        async with sem:
+            start = time.perf_counter()
+            await fn(f"Patient {i} reports cough.")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    wall = time.perf_counter() - wall
+
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"   {name:<14} p50={p50:7.2f} ms   p99={p99:7.2f} ms   throughput={total / wall:7.1f} req/s")
+
+
+async def main(args) -> None:
+    config = StubConfig(latency=args.latency / 1000)
+    async with run_stub(config, port=PORT):
+        print(f"📊 {args.requests} requests, concurrency={args.concurrency}, stub latency={args.latency} ms")
+        await run("per-request", per_request_client, args.requests, args.concurrency)
+        await groq_http.start()
+        try:
+            await run("pooled", pooled_client, args.requests, args.concurrency)
+        finally:
+            await groq_http.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=20.0, help="stub latency in ms")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Benchmark: note-stream TTFT with one provider vs hedged routing, and failover.
+
+Two local stubs stand in for Groq (primary, with a slow tail) and a local
+inference server (secondary). Scenarios:
+
+  single   — primary only (the pre-router behaviour)
+  hedged   — primary + secondary, hedge after --hedge-after seconds
+  outage   — primary returns 503 on every call; the router fails over
+
+    python scripts/bench_llm_hedging.py --notes 200 --slow-rate 0.1 --slow 3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+PRIMARY_PORT, SECONDARY_PORT = 8769, 8770
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{PRIMARY_PORT}"
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ["LOCAL_LLM_BASE_URL"] = f"http://127.0.0.1:{SECONDARY_PORT}"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import groq_client  # noqa: E402
+from groq_scheduler import GroqScheduler  # noqa: E402
+from http_client import groq_http  # noqa: E402
+from llm_router import LLMRouter, Provider, _provider  # noqa: E402
+from note_cache import note_cache  # noqa: E402
+from groq_stub import StubConfig, run_stub  # noqa: E402
+
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def run(name: str, router: LLMRouter, notes: int, concurrency: int) -> None:
+    groq_client.llm_router = router
+    sem = asyncio.Semaphore(concurrency)
+    ttfts: list[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with sem:
+            started = time.perf_counter()
+            first = None
+            try:
+                async for _ in groq_client.stream_note(f"Doctor: visit {i}", use_cache=False):
+                    if first is None:
+                        first = time.perf_counter() - started
+            except Exception:
+                errors += 1
+                return
+            ttfts.append(first)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(notes)))
+    wall = time.perf_counter() - wall
+    ms = [t * 1000 for t in ttfts]
+    if ms:
+        latency = f"p50 {statistics.median(ms):7.1f} ms  p95 {pct(ms, 0.95):7.1f} ms  p99 {pct(ms, 0.99):7.1f} ms"
+    else:
+        latency = "-"
+    print(f"  {name:<7} TTFT {latency}  failed {errors:>3}/{notes}  ({wall:.1f}s)")
+    for p in router.providers:
+        print(f"            {p.name:<6} {p.status()['latency']}")
+
+
+def providers(names: list[str]) -> list[Provider]:
+    built = [_provider(name) for name in names]
+    for p in built:  # fresh budgets/latency per scenario
+        p.scheduler = GroqScheduler(max_retries=2, backoff_base=0.1, backoff_max=0.5)
+    return built
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="share of primary calls that stall")
+    parser.add_argument("--slow", type=float, default=3.0, help="stall (s)")
+    parser.add_argument("--hedge-after", type=float, default=0.5, help="first-token deadline (s)")
+    args = parser.parse_args()
+    note_cache.backend = None  # every call must reach a stub
+
+    stub = dict(first_token_latency=0.15, token_interval=0.001, stream_tokens=20)
+    primary = StubConfig(slow_rate=args.slow_rate, slow_latency=args.slow, seed=1, **stub)
+    secondary = StubConfig(seed=2, **{**stub, "first_token_latency": 0.25})
+    down = StubConfig(error_rate_5xx=1.0, seed=3, **stub)
+
+    print(f"{args.notes} streamed notes, {args.slow_rate:.0%} of primary calls stall {args.slow:g}s")
+    async with run_stub(primary, PRIMARY_PORT), run_stub(secondary, SECONDARY_PORT):
+        await run("single", LLMRouter(providers(["groq"]), hedge_ttft=0), args.notes, args.concurrency)
+        await run(
+            "hedged",
+            LLMRouter(providers(["groq", "local"]), hedge_ttft=args.hedge_after),
+            args.notes,
+            args.concurrency,
+        )
+    async with run_stub(down, PRIMARY_PORT), run_stub(secondary, SECONDARY_PORT):
+        await run(
+            "outage",
+            LLMRouter(providers(["groq", "local"]), hedge_ttft=args.hedge_after),
+            args.notes,
+            args.concurrency,
+        )
+    await groq_http.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
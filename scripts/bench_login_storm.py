@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Load test: a login storm against bcrypt, and what it does to everything else.
+
+Starts the backend with uvicorn in a child process (stateless), registers
+--users accounts, then fires --logins concurrent logins (a shift change) while
+a probe hits /health/live every 20 ms. Reports:
+
+  - login latency p50 / p95 / max and throughput
+  - 503s (crypto queue full, CRYPTO_QUEUE_SIZE) and 401s (should be 0)
+  - probe latency p50 / p95 / max — the cost of the storm for other requests;
+    with bcrypt on the event loop this grows to seconds
+
+    python scripts/bench_login_storm.py --users 20 --logins 60
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+APP_PORT = 8780
+APP = f"http://127.0.0.1:{APP_PORT}"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+async def wait_ready(proc: subprocess.Popen) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            if proc.poll() is not None:
+                raise RuntimeError("backend exited during startup")
+            try:
+                if (await client.get(f"{APP}/health/live")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("backend did not start")
+
+
+async def probe(client: httpx.AsyncClient, latencies: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(f"{APP}/health/live")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.02)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=60, help="concurrent logins in the storm")
+    args = parser.parse_args()
+
+    env = {**os.environ, "DATABASE_URL": "", "GROQ_API_KEY": "stub"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=os.path.join(HERE, "..", "backend"),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    limits = httpx.Limits(max_connections=None)
+    try:
+        await wait_ready(proc)
+        async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+            users = [(f"dr{i}@example.com", f"pw-{i}") for i in range(args.users)]
+            for email, password in users:  # sequential: stays under the queue bound
+                r = await client.post(
+                    f"{APP}/api/auth/register",
+                    json={"email": email, "password": password, "full_name": "Dr Test"},
+                )
+                r.raise_for_status()
+
+            latencies: list[float] = []
+            statuses: dict[int, int] = {}
+            probes: list[float] = []
+            stop = asyncio.Event()
+
+            async def login(i: int) -> None:
+                email, password = users[i % len(users)]
+                started = time.perf_counter()
+                r = await client.post(f"{APP}/api/auth/login", json={"email": email, "password": password})
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                if r.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+
+            prober = asyncio.create_task(probe(client, probes, stop))
+            await asyncio.sleep(0.2)
+            wall = time.perf_counter()
+            await asyncio.gather(*(login(i) for i in range(args.logins)))
+            wall = time.perf_counter() - wall
+            stop.set()
+            await prober
+
+        print(f"{args.logins} concurrent logins over {args.users} users, {os.cpu_count()} CPU(s)")
+        print(f"  statuses          {dict(sorted(statuses.items()))}")
+        if latencies:
+            print(
+                f"  login latency     p50 {pct(latencies, 0.5):6.0f} ms  p95 {pct(latencies, 0.95):6.0f} ms  "
+                f"max {max(latencies) * 1000:6.0f} ms  ({len(latencies) / wall:.1f} logins/s)"
+            )
+        print(
+            f"  /health/live      p50 {statistics.median(probes) * 1000:6.1f} ms  "
+            f"p95 {pct(probes, 0.95):6.1f} ms  max {max(probes) * 1000:6.1f} ms  ({len(probes)} probes)"
+        )
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Benchmark: single-pass vs map-reduce note generation on long transcripts.
+
+The stub's latency grows with prompt length (prefill-bound), so single-pass
+time scales with the transcript while map-reduce scales with parallelism.
+
+    python scripts/bench_map_reduce.py --minutes 15 30 60 --concurrency 1 4 8
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+PORT = 8767
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ.setdefault("GROQ_API_KEY", "stub")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import groq_client  # noqa: E402
+from config import settings  # noqa: E402
+from http_client import groq_http  # noqa: E402
+from groq_stub import StubConfig, run_stub  # noqa: E402
+
+PHRASES = [
+    "I've had this headache on and off for about three days now.",
+    "Any nausea, vomiting or changes in your vision?",
+    "No vomiting, but the light bothers me a little.",
+    "Let me check your blood pressure again, it was 150 over 95 earlier.",
+    "Are you still taking the lisinopril 10 milligrams once a day?",
+    "Yes, every morning, although I missed a couple of doses last week.",
+    "Your neck is supple and there's no weakness on either side.",
+    "We'll get a basic metabolic panel and recheck in two weeks.",
+]
+
+
+def synthetic_transcript(minutes: int) -> str:
+    """~150 spoken words per minute, alternating speakers, timestamped turns."""
+    rng = random.Random(minutes)
+    lines, words, t = [], 0, 0
+    while words < minutes * 150:
+        speaker = "Doctor" if len(lines) % 2 == 0 else "Patient"
+        text = " ".join(rng.choice(PHRASES) for _ in range(rng.randint(1, 3)))
+        lines.append(f"[{t // 3600:02d}:{t // 60 % 60:02d}:{t % 60:02d}] {speaker}: {text}")
+        words += len(text.split())
+        t += 12
+    return "\n".join(lines)
+
+
+async def timed(transcript: str) -> float:
+    start = time.perf_counter()
+    await groq_client.generate_note(transcript, use_cache=False)
+    return time.perf_counter() - start
+
+
+async def main(args) -> None:
+    config = StubConfig(latency=0.05, latency_per_kchar=args.ms_per_kchar / 1000)
+    async with run_stub(config, port=PORT):
+        await groq_http.start()
+        try:
+            print(f"📊 stub prefill cost {args.ms_per_kchar} ms per 1k prompt chars")
+            for minutes in args.minutes:
+                transcript = synthetic_transcript(minutes)
+                print(f"\n   {minutes}-minute transcript ({len(transcript):,} chars)")
+
+                settings.NOTE_CHUNK_THRESHOLD_CHARS = 10**9
+                print(f"      single-pass          {await timed(transcript):6.2f} s")
+
+                settings.NOTE_CHUNK_THRESHOLD_CHARS = 0
+                for concurrency in args.concurrency:
+                    settings.NOTE_MAP_CONCURRENCY = concurrency
+                    elapsed = await timed(transcript)
+                    print(f"      map-reduce (x{concurrency:<2})     {elapsed:6.2f} s")
+        finally:
+            await groq_http.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=int, nargs="+", default=[15, 30, 60])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--ms-per-kchar", type=float, default=40.0)
+    asyncio.run(main(parser.parse_args()))
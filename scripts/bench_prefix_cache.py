@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Benchmark: note-stream TTFT with the stable prompt prefix vs the old layout.
+
+A local Groq stub simulates prompt processing (--prefill-ms per 1000 prompt
+chars not already cached) and, optionally, a prefix cache:
+
+  block    chained hashes of 64-char blocks, like vLLM / SGLang automatic
+           prefix caching: any shared leading text is reused
+  message  only whole leading messages are reused, like servers that cache
+           at explicit breakpoints / the system message
+
+Each scenario streams --notes notes (distinct transcripts, a mix of
+templates and specialties) through groq_client._stream_chat, after one
+unmeasured note per template x specialty to warm the cache, and reports TTFT
+and the share of prompt chars served from the cache, for:
+
+  legacy   the old layout: SYSTEM_PROMPT alone in the system message, template
+           and specialty in the user message, instructions after the transcript
+  stable   the memoized prefix (rules + template + specialty + instructions)
+           as the system message, only the transcript in the user message
+
+    python scripts/bench_prefix_cache.py --notes 120 --prefill-ms 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+STUB_PORT = 8783
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ["LLM_PROVIDERS"] = "groq"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import groq_client  # noqa: E402
+from groq_client import MODEL_NAME, SYSTEM_PROMPT, TEMPLATE_INSTRUCTIONS  # noqa: E402
+from groq_stub import StubConfig, run_stub  # noqa: E402
+from http_client import groq_http  # noqa: E402
+
+TEMPLATES = ["soap", "hp", "consult", "procedure"]
+SPECIALTIES = ["general", "cardiology", "pediatrics"]
+LINES = [
+    "Doctor: How long have you had the chest pain?",
+    "Patient: About three days. It gets worse when I climb stairs.",
+    "Doctor: Any shortness of breath, fever or cough?",
+    "Patient: A little short of breath, no fever.",
+    "Doctor: Your blood pressure is 150 over 95 today.",
+    "Patient: I take metformin for my diabetes and nothing else.",
+    "Doctor: I'm going to order an ECG and a lipid panel.",
+    "Doctor: We'll start lisinopril 10 milligrams daily and follow up in two weeks.",
+]
+
+
+def transcript(chars: int, seed: int) -> str:
+    rng = random.Random(seed)
+    lines = [f"Doctor: Visit {seed}."]
+    while sum(len(line) + 1 for line in lines) < chars:
+        lines.append(rng.choice(LINES))
+    return "\n".join(lines)
+
+
+def legacy_messages(template: str, specialty: str, text: str) -> list[dict]:
+    """stream_note's prompt before the stable-prefix layout."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"""
+Template: {TEMPLATE_INSTRUCTIONS[template]}
+Specialty: {specialty}
+
+TRANSCRIPT:
+{text}
+
+Generate the clinical note now.
+""",
+        },
+    ]
+
+
+def stable_messages(template: str, specialty: str, text: str) -> list[dict]:
+    return groq_client._note_messages(template, specialty, text, timestamped=False)
+
+
+async def run(stub: StubConfig, layout, notes: int, chars: int) -> tuple[list[float], float]:
+    stub._prefixes.clear()
+    combos = len(TEMPLATES) * len(SPECIALTIES)
+    ttfts = []
+    # The first `combos` notes warm the cache (one per template x specialty, as
+    # a long-running server would be) and are not measured.
+    for i in range(-combos, notes):  # sequential: TTFT without queueing noise
+        if i == 0:
+            stub.prompt_chars = stub.cached_chars = 0
+        template, specialty = TEMPLATES[i % len(TEMPLATES)], SPECIALTIES[(i // len(TEMPLATES)) % len(SPECIALTIES)]
+        payload = {
+            "model": MODEL_NAME,
+            "messages": layout(template, specialty, transcript(chars, i)),
+            "temperature": 0.3,
+            "max_tokens": 4096,
+        }
+        started = time.perf_counter()
+        async for _ in groq_client._stream_chat(payload):
+            if i >= 0:
+                ttfts.append(time.perf_counter() - started)
+            break
+    return ttfts, stub.cached_chars / max(1, stub.prompt_chars)
+
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=120)
+    parser.add_argument("--prefill-ms", type=float, default=50, help="simulated prefill per 1000 uncached chars")
+    parser.add_argument("--sizes", default="1500,6000", help="transcript sizes in chars")
+    args = parser.parse_args()
+
+    stub = StubConfig(
+        first_token_latency=0.01,
+        token_interval=0.0,
+        stream_tokens=1,
+        prefill_per_kchar=args.prefill_ms / 1000,
+    )
+    print(f"{args.notes} notes per scenario, prefill {args.prefill_ms:g} ms / 1000 uncached chars, "
+          f"prefix {len(groq_client.note_prefix('soap', 'general'))} chars (soap)")
+    async with run_stub(stub, STUB_PORT):
+        await groq_http.start()
+        try:
+            for chars in (int(s) for s in args.sizes.split(",")):
+                print(f"\ntranscript ~{chars} chars")
+                for cache in (None, "block", "message"):
+                    stub.prefix_cache = cache
+                    for name, layout in (("legacy", legacy_messages), ("stable", stable_messages)):
+                        ttfts, hit = await run(stub, layout, args.notes, chars)
+                        ms = [t * 1000 for t in ttfts]
+                        print(
+                            f"  cache {cache or 'off':<8} {name:<7} TTFT p50 {statistics.median(ms):6.1f} ms  "
+                            f"p95 {pct(ms, 0.95):6.1f} ms   prompt chars cached {hit:6.1%}"
+                        )
+        finally:
+            await groq_http.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
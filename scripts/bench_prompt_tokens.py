@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Benchmark: prompt tokens before vs after transcript compaction.
+
+Builds a corpus of synthetic "Doctor: / Patient:" transcripts in three styles
+and runs each through prompt_tokens.compact_transcript:
+
+  clean   edited dictation: few fillers, no repeats
+  casual  a normal conversation: fillers, stutters, backchannels
+  noisy   raw STT: the above plus repeated sentences (Whisper loops) and lines
+          picked up twice (crosstalk)
+
+For each style it reports transcript tokens and full note-prompt tokens
+(system prompt + SOAP template + transcript) before and after, the share of
+encounters that fit the model context in one call (LLM_CONTEXT_TOKENS), the
+compaction time, and a check that every clinical term in the raw transcript
+is still in the compacted one. Token counts use the same local tokenizer the
+backend uses (tiktoken if installed, else the heuristic).
+
+    python scripts/bench_prompt_tokens.py --encounters 30 --turns 120
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from config import settings  # noqa: E402
+from groq_client import _note_messages  # noqa: E402
+from prompt_tokens import (  # noqa: E402
+    compact_transcript,
+    completion_budget,
+    count_tokens,
+    message_tokens,
+    tokenizer_name,
+)
+
+CLINICIAN_LINES = [
+    "What brings you in today?",
+    "How long have you had the chest pain?",
+    "Do you have any shortness of breath or fever?",
+    "Any history of heart disease in your family?",
+    "Are you taking any medications right now?",
+    "Let me listen to your lungs. Take a deep breath.",
+    "Your blood pressure is 150 over 95 today.",
+    "I'm going to order an ECG and a lipid panel.",
+    "We'll start you on lisinopril 10 milligrams daily.",
+    "I'd like you to follow up in two weeks.",
+]
+PATIENT_LINES = [
+    "I've been having this pain in my chest for three days.",
+    "It hurts more when I climb stairs.",
+    "No fever. Maybe a little short of breath.",
+    "My father had a heart attack at sixty.",
+    "I take metformin for my diabetes.",
+    "It started after I shoveled snow.",
+    "I don't smoke anymore. I quit five years ago.",
+]
+BACKCHANNELS = ["Okay.", "Mm-hmm.", "Right.", "Uh-huh.", "Yeah."]
+FILLERS = ["um,", "uh,", "so, um,", "erm", "hmm,", "ah,"]
+TERMS = ["chest pain", "shortness of breath", "lisinopril", "metformin", "ECG",
+         "lipid panel", "150 over 95", "heart attack", "diabetes", "10 milligrams"]
+
+
+def disfluent(line: str, rng: random.Random, rate: float) -> str:
+    words = line.split()
+    out = []
+    for word in words:
+        if rng.random() < rate:
+            out.append(rng.choice(FILLERS))
+        if rng.random() < rate / 2 and word.isalpha():
+            out.append(word)  # stutter: "the the"
+        out.append(word)
+    return " ".join(out)
+
+
+def encounter(style: str, turns: int, seed: int) -> str:
+    rng = random.Random(seed)
+    rate = {"clean": 0.0, "casual": 0.12, "noisy": 0.15}[style]
+    lines = []
+    for i in range(turns):
+        clinician = i % 2 == 0
+        label = "Doctor" if clinician else "Patient"
+        line = rng.choice(CLINICIAN_LINES if clinician else PATIENT_LINES)
+        lines.append(f"{label}: {disfluent(line, rng, rate)}")
+        if style != "clean" and rng.random() < 0.3:
+            other = "Patient" if clinician else "Doctor"
+            lines.append(f"{other}: {rng.choice(BACKCHANNELS)}")
+        if style == "noisy":
+            if rng.random() < 0.15:
+                lines.append(lines[-1])  # the same line transcribed twice
+            if rng.random() < 0.1:
+                lines[-1] += f" {line} {line}"  # repetition loop
+    return "\n".join(lines)
+
+
+def prompt(transcript: str) -> list[dict]:
+    return _note_messages("soap", "general", transcript, timestamped=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encounters", type=int, default=30, help="per style")
+    parser.add_argument("--turns", type=int, default=120)
+    args = parser.parse_args()
+
+    print(f"tokenizer {tokenizer_name()}, context {settings.LLM_CONTEXT_TOKENS} tokens, "
+          f"{args.encounters} encounters x {args.turns} turns per style\n")
+    print(f"{'style':<8} {'transcript tok':>16} {'saved':>7} {'prompt tok':>16} {'saved':>7} "
+          f"{'one call':>11} {'compact ms':>11} {'terms kept':>11}")
+    for style in ("clean", "casual", "noisy"):
+        before, after, prompt_before, prompt_after, seconds = [], [], [], [], []
+        fit_before = fit_after = terms_seen = terms_kept = 0
+        for seed in range(args.encounters):
+            raw = encounter(style, args.turns, seed)
+            started = time.perf_counter()
+            compact = compact_transcript(raw)
+            seconds.append(time.perf_counter() - started)
+            before.append(count_tokens(raw))
+            after.append(count_tokens(compact))
+            prompt_before.append(message_tokens(prompt(raw)))
+            prompt_after.append(message_tokens(prompt(compact)))
+            fit_before += completion_budget(prompt(raw), 4096) is not None
+            fit_after += completion_budget(prompt(compact), 4096) is not None
+            for term in TERMS:
+                if term in raw:
+                    terms_seen += 1
+                    terms_kept += term in compact
+
+        def saved(a: list[int], b: list[int]) -> str:
+            return f"{1 - sum(b) / sum(a):6.1%}"
+
+        print(
+            f"{style:<8} {statistics.mean(before):7.0f} → {statistics.mean(after):6.0f} {saved(before, after):>7} "
+            f"{statistics.mean(prompt_before):7.0f} → {statistics.mean(prompt_after):6.0f} "
+            f"{saved(prompt_before, prompt_after):>7} "
+            f"{fit_before:>4} → {fit_after:<4} {statistics.mean(seconds) * 1000:10.2f} "
+            f"{terms_kept:>5}/{terms_seen:<5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Benchmark: flat vs speaker-tagged segment transcripts for note prompts.
+
+Builds a synthetic encounter as Whisper-style segments (with disfluencies and
+a ground-truth speaker per segment), runs it through the segment pipeline and
+reports:
+
+  - prompt size of the flat transcript, with fillers removed, and as the
+    compact "[mm:ss] DR: / PT:" prompt (characters, approximate tokens)
+  - speaker-label accuracy of the CPU heuristic against the ground truth
+  - labelling time per encounter
+
+    python scripts/bench_segments.py --turns 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from segments import CLINICIAN, PATIENT, label_speakers, parse_segments, speaker_transcript  # noqa: E402
+
+CLINICIAN_LINES = [
+    "So, um, what brings you in today?",
+    "How long have you had the the chest pain?",
+    "Do you have any shortness of breath or, uh, fever?",
+    "Any history of heart disease in your family?",
+    "Are you taking any medications right now?",
+    "Let me listen to your lungs. Take a deep breath.",
+    "Your blood pressure is, uh, 150 over 95 today.",
+    "I'm going to order an ECG and some labs.",
+    "We'll start you on lisinopril 10 milligrams daily.",
+    "I'd like you to follow up in two weeks.",
+]
+PATIENT_LINES = [
+    "Um, I've been having this pain in my chest for, uh, three days.",
+    "It hurts more when I, um, when I climb stairs.",
+    "No, no fever. Maybe a little short of breath.",
+    "My father had a heart attack at sixty.",
+    "I take, uh, metformin for my diabetes.",
+    "Yeah, it started after I, um, shoveled snow.",
+    "I don't smoke anymore. I quit, uh, five years ago.",
+    "Okay. Mm-hmm.",
+]
+
+
+def tokens(chars: int) -> int:
+    return chars // 4  # rough BPE estimate, the same for every variant
+
+
+def encounter(turns: int, seed: int) -> list[dict]:
+    """Alternating turns of 1–3 segments; a short pause within, a longer one between."""
+    rng = random.Random(seed)
+    segments, t = [], 0.0
+    speaker = CLINICIAN
+    for _ in range(turns):
+        lines = CLINICIAN_LINES if speaker == CLINICIAN else PATIENT_LINES
+        for _ in range(rng.randint(1, 3)):
+            text = rng.choice(lines)
+            duration = len(text) / 15
+            segments.append({"start": t, "end": t + duration, "text": " " + text, "truth": speaker})
+            t += duration + rng.uniform(0.1, 0.5)
+        t += rng.uniform(0.8, 2.0)
+        speaker = PATIENT if speaker == CLINICIAN else CLINICIAN
+    return segments
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200, help="speaker turns per encounter")
+    parser.add_argument("--encounters", type=int, default=20)
+    args = parser.parse_args()
+
+    flat_chars = clean_chars = tagged_chars = correct = total = 0
+    elapsed = 0.0
+    for seed in range(args.encounters):
+        raw = encounter(args.turns, seed)
+        flat = " ".join(s["text"].strip() for s in raw)  # what /api/transcribe used to send
+
+        started = time.perf_counter()
+        labelled = label_speakers(parse_segments(raw))
+        tagged = speaker_transcript(labelled)
+        elapsed += time.perf_counter() - started
+
+        flat_chars += len(flat)
+        clean_chars += len(" ".join(s["text"] for s in labelled))
+        tagged_chars += len(tagged)
+        truth = [s["truth"] for s in raw]  # parse_segments keeps every segment here
+        correct += sum(s["speaker"] == t for s, t in zip(labelled, truth))
+        total += len(truth)
+
+    n = args.encounters
+    print(f"{n} encounters x {args.turns} turns")
+    print(f"  flat transcript     {flat_chars / n:8.0f} chars  ~{tokens(flat_chars) / n:6.0f} tokens")
+    print(
+        f"  fillers removed     {clean_chars / n:8.0f} chars  ~{tokens(clean_chars) / n:6.0f} tokens"
+        f"  ({(clean_chars - flat_chars) / flat_chars:+.1%})"
+    )
+    print(
+        f"  + speaker tags      {tagged_chars / n:8.0f} chars  ~{tokens(tagged_chars) / n:6.0f} tokens"
+        f"  ({(tagged_chars - flat_chars) / flat_chars:+.1%})"
+    )
+    print(f"  speaker accuracy    {correct / total:.1%} of segments")
+    print(f"  labelling time      {elapsed / n * 1000:.2f} ms / encounter")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Benchmark: backend import time and time until the lifespan has started.
+
+Each run is a fresh interpreter, so nothing is cached in sys.modules.
+
+    python scripts/bench_startup.py --runs 10
+    DATABASE_URL=postgresql://10.255.255.1/x python scripts/bench_startup.py   # unreachable DB
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    t2 = time.perf_counter()
+    ready = client.get("/health/ready").status_code if any(
+        getattr(r, "path", "") == "/health/ready" for r in main.app.routes
+    ) else None
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1, "ready": ready}))
+"""
+
+
+def run_once() -> dict:
+    env = {**os.environ, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "stub")}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    for key in ("import", "startup"):
+        values = [r[key] * 1000 for r in results]
+        print(f"{key:<8} median {statistics.median(values):7.1f} ms   min {min(values):7.1f} ms")
+    print(f"/health/ready right after startup: {results[-1]['ready']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Benchmark: peak API-process memory for /api/transcribe uploads.
+
+Compares the old path (read whole upload → temp file → re-open) with the
+streaming path (UploadFile spool → multipart body) against the local stub.
+
+    python scripts/bench_upload_memory.py --sizes 10 50 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import tracemalloc
+import uuid
+
+PORT = 8766
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ.setdefault("GROQ_API_KEY", "stub")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import transcribe_groq  # noqa: E402
+from config import settings  # noqa: E402
+from http_client import groq_http  # noqa: E402
+from groq_stub import StubConfig, run_stub  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def make_upload(size_mb: int) -> tempfile.SpooledTemporaryFile:
+    """Mimic Starlette's UploadFile spool (rolls to disk past 1 MB)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=MB)
+    block = os.urandom(MB)
+    for _ in range(size_mb):
+        spool.write(block)
+    spool.seek(0)
+    return spool
+
+
+async def legacy(upload) -> dict:
+    """Pre-change behaviour: await audio.read() + /tmp/{uuid}.wav copy."""
+    temp_path = f"/tmp/{uuid.uuid4()}.wav"
+    try:
+        with open(temp_path, "wb") as f:
+            content = upload.read()
+            f.write(content)
+        with open(temp_path, "rb") as audio_file:
+            response = await groq_http.client.post(
+                f"{settings.GROQ_BASE_URL}/audio/transcriptions",
+                files={"file": ("audio.wav", audio_file, "audio/wav")},
+                data={"model": "whisper-large-v3"},
+            )
+        return response.json()
+    finally:
+        os.remove(temp_path)
+
+
+async def streaming(upload) -> dict:
+    return await transcribe_groq.transcribe_audio(upload, "audio.webm", "audio/webm")
+
+
+async def measure(name: str, fn, size_mb: int) -> None:
+    upload = make_upload(size_mb)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    await fn(upload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    upload.close()
+    print(f"   {name:<10} {size_mb:>5} MB upload → peak {peak / MB:8.2f} MB")
+
+
+async def main(args) -> None:
+    async with run_stub(StubConfig(latency=0), port=PORT):
+        await groq_http.start()
+        try:
+            print("📊 Peak Python heap while transcribing an upload")
+            for size in args.sizes:
+                await measure("legacy", legacy, size)
+                await measure("streaming", streaming, size)
+        finally:
+            await groq_http.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    asyncio.run(main(parser.parse_args()))
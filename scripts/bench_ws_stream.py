@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Benchmark: /ws/stream-note frames per second and server CPU per stream.
+
+Starts the backend with uvicorn in a child process (stateless, note cache
+off) against the local Groq stub, streams a SOAP note to N concurrent
+clients and compares:
+
+  per-delta  one JSON frame per Groq delta (coalesce_ms=0, the old behaviour)
+  json       coalesced JSON frames (WS_COALESCE_MS window)
+  binary     coalesced compact binary frames
+
+Server CPU is read from /proc/<pid>/stat (Linux).
+
+    python scripts/bench_ws_stream.py --streams 50 --words 800
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import websockets
+
+STUB_PORT, APP_PORT = 8773, 8774
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from groq_stub import StubConfig, run_stub  # noqa: E402
+
+SECTIONS = ["SUBJECTIVE", "OBJECTIVE", "ASSESSMENT", "PLAN"]
+
+
+def soap_note(words: int) -> str:
+    per_section = max(1, words // len(SECTIONS))
+    body = " ".join(["patient reports intermittent symptoms"] * (per_section // 4))
+    return "\n\n".join(f"**{name}:**\n- {body}." for name in SECTIONS)
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")  # utime + stime
+
+
+async def one_stream(options: dict, stats: dict) -> None:
+    async with websockets.connect(f"ws://127.0.0.1:{APP_PORT}/ws/stream-note", max_size=None) as ws:
+        started = time.perf_counter()
+        await ws.send(json.dumps({"transcript": "Doctor: hello", "regenerate": True, **options}))
+        first = None
+        async for message in ws:
+            stats["frames"] += 1
+            stats["bytes"] += len(message)
+            if first is None:
+                first = time.perf_counter() - started
+            if isinstance(message, bytes):
+                kind, payload = message[:1], message[1:].decode()
+                if kind == b"s":
+                    stats["sections"] += 1
+                if kind in (b"d", b"e"):
+                    break
+            else:
+                frame = json.loads(message)
+                stats["sections"] += "section" in frame
+                if frame.get("done"):
+                    break
+        stats["ttft"].append(first)
+
+
+async def run(name: str, options: dict, streams: int, pid: int) -> None:
+    stats = {"frames": 0, "bytes": 0, "sections": 0, "ttft": []}
+    cpu = cpu_seconds(pid)
+    wall = time.perf_counter()
+    await asyncio.gather(*(one_stream(options, stats) for _ in range(streams)))
+    wall = time.perf_counter() - wall
+    cpu = cpu_seconds(pid) - cpu
+    print(
+        f"  {name:<10} frames/stream {stats['frames'] / streams:6.0f}  "
+        f"frames/s {stats['frames'] / wall:7.0f}  "
+        f"KB/stream {stats['bytes'] / streams / 1024:5.1f}  "
+        f"server CPU/stream {cpu / streams * 1000:6.1f} ms  "
+        f"first frame p50 {statistics.median(stats['ttft']) * 1000:5.0f} ms  "
+        f"sections/stream {stats['sections'] / streams:.0f}"
+    )
+
+
+async def wait_ready(proc: subprocess.Popen) -> None:
+    import httpx
+
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            if proc.poll() is not None:
+                raise RuntimeError("backend exited during startup")
+            try:
+                if (await client.get(f"http://127.0.0.1:{APP_PORT}/health/live")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("backend did not start")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50, help="concurrent WebSocket clients")
+    parser.add_argument("--words", type=int, default=800, help="note length in Groq deltas")
+    parser.add_argument("--token-interval", type=float, default=0.002, help="stub delay between deltas (s)")
+    args = parser.parse_args()
+
+    stub = StubConfig(
+        first_token_latency=0.05,
+        token_interval=args.token_interval,
+        stream_text=soap_note(args.words),
+    )
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{STUB_PORT}",
+        "DATABASE_URL": "",
+        "NOTE_CACHE_BACKEND": "none",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=os.path.join(HERE, "..", "backend"),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with run_stub(stub, STUB_PORT):
+            await wait_ready(proc)
+            print(f"{args.streams} concurrent streams, ~{args.words} deltas each")
+            await run("per-delta", {"coalesce_ms": 0}, args.streams, proc.pid)
+            await run("json", {}, args.streams, proc.pid)
+            await run("binary", {"framing": "binary"}, args.streams, proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Local OpenAI-compatible stub of the Groq API for benchmarks.
+
+Serves /chat/completions (plain + SSE streaming) and /audio/transcriptions
+with configurable latency so backend changes can be measured offline.
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+PREFIX_BLOCK_CHARS = 64  # ~16 tokens, vLLM's default block size
+_MAX_PREFIX_BLOCKS = 100_000
+
+
+class StubConfig:
+    """Tunable stub behaviour (seconds / counts)."""
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        latency_per_kchar: float = 0.0,
+        first_token_latency: float = 0.05,
+        token_interval: float = 0.002,
+        stream_tokens: int = 200,
+        completion: str = "**SUBJECTIVE:**\nStub note.\n\n**ASSESSMENT:**\n1. Stub (R69)\n\n**PLAN:**\n- Follow up.",
+        rpm_limit: Optional[int] = None,
+        tpm_limit: Optional[int] = None,
+        window: float = 60.0,
+        error_rate_429: float = 0.0,
+        error_rate_5xx: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        stream_text: Optional[str] = None,
+        prefill_per_kchar: float = 0.0,
+        prefix_cache: Optional[str] = None,
+    ):
+        self.latency = latency
+        self.latency_per_kchar = latency_per_kchar
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.stream_tokens = stream_tokens
+        self.completion = completion
+        # Rate limiting (emits Groq's x-ratelimit-* headers) and fault injection
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.window = window
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        # Tail latency: this share of requests waits an extra `slow_latency` s
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        # Stream this text word by word instead of "tok0 tok1 ..."
+        self.stream_text = stream_text
+        # Prompt processing: `prefill_per_kchar` s per 1000 prompt chars not
+        # served from the prefix cache, before the first token. prefix_cache:
+        #   "block"    chained hashes of fixed-size blocks (vLLM / SGLang style)
+        #   "message"  whole leading messages only (explicit cache breakpoints)
+        #   None       no reuse
+        self.prefill_per_kchar = prefill_per_kchar
+        self.prefix_cache = prefix_cache
+        self.prompt_chars = 0
+        self.cached_chars = 0
+        self._prefixes: OrderedDict[int, None] = OrderedDict()
+        self.requests = 0
+        self.cancelled = 0  # requests the client closed before the response finished
+        self.bytes_received = 0
+        self.statuses: dict[int, int] = {}
+        self._window_start = 0.0
+        self._used_requests = 0
+        self._used_tokens = 0
+
+    def _units(self, messages: list[dict]) -> list[str]:
+        """The cacheable units of a prompt, in order."""
+        if self.prefix_cache == "message":
+            return [f"<{m.get('role')}>{m.get('content', '')}" for m in messages]
+        text = "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in messages)
+        full = len(text) - len(text) % PREFIX_BLOCK_CHARS  # a partial last block is never cached
+        return [text[i : i + PREFIX_BLOCK_CHARS] for i in range(0, full, PREFIX_BLOCK_CHARS)]
+
+    def prefill(self, messages: list[dict]) -> tuple[float, int]:
+        """(prefill delay, prompt chars served from the prefix cache) for one request."""
+        total = sum(len(f"<{m.get('role')}>{m.get('content', '')}") for m in messages)
+        cached = 0
+        if self.prefix_cache:
+            key, hit = 0, True
+            for unit in self._units(messages):
+                key = hash((key, unit))  # chained: a unit only matches after the same prefix
+                if hit and key in self._prefixes:
+                    cached += len(unit)
+                    self._prefixes.move_to_end(key)
+                else:
+                    hit = False
+                    self._prefixes[key] = None
+            while len(self._prefixes) > _MAX_PREFIX_BLOCKS:
+                self._prefixes.popitem(last=False)
+        self.prompt_chars += total
+        self.cached_chars += cached
+        return self.prefill_per_kchar * (total - cached) / 1000, cached
+
+    def admit(self, tokens: int) -> tuple[int, dict]:
+        """Apply limits and injected faults; returns (status, rate-limit headers)."""
+        # Fixed windows: like Groq, the budget resets to its initial state at `reset`.
+        now = time.monotonic()
+        if now - self._window_start >= self.window:
+            self._window_start, self._used_requests, self._used_tokens = now, 0, 0
+        used_requests, used_tokens = self._used_requests, self._used_tokens
+        reset = f"{self.window - (now - self._window_start):.2f}s"
+
+        status = 200
+        if (self.rpm_limit and used_requests >= self.rpm_limit) or (
+            self.tpm_limit and used_tokens + tokens > self.tpm_limit
+        ):
+            status = 429
+        elif self.random.random() < self.error_rate_429:
+            status = 429
+        elif self.random.random() < self.error_rate_5xx:
+            status = self.random.choice([500, 502, 503])
+        if status == 200:
+            used_requests = self._used_requests = used_requests + 1
+            used_tokens = self._used_tokens = used_tokens + tokens
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+        headers = {}
+        if self.rpm_limit:
+            headers["x-ratelimit-limit-requests"] = str(self.rpm_limit)
+            headers["x-ratelimit-remaining-requests"] = str(max(0, self.rpm_limit - used_requests))
+            headers["x-ratelimit-reset-requests"] = reset
+        if self.tpm_limit:
+            headers["x-ratelimit-limit-tokens"] = str(self.tpm_limit)
+            headers["x-ratelimit-remaining-tokens"] = str(max(0, self.tpm_limit - used_tokens))
+            headers["x-ratelimit-reset-tokens"] = reset
+        if status == 429:
+            headers["retry-after"] = f"{self.retry_after:g}"
+        return status, headers
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        config.requests += 1
+        body = await request.json()
+
+        prompt_chars = sum(len(m.get("content", "")) for m in body.get("messages", []))
+        status, headers = config.admit(prompt_chars // 4 + int(body.get("max_tokens", 0)))
+        if status != 200:
+            return JSONResponse({"error": {"message": f"stub {status}"}}, status_code=status, headers=headers)
+        stall = config.slow_latency if config.slow_rate and config.random.random() < config.slow_rate else 0.0
+        prefill, cached_chars = config.prefill(body.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_chars // 4,
+            "prompt_tokens_details": {"cached_tokens": cached_chars // 4},
+        }
+
+        if body.get("stream"):
+            async def events():
+                completed = False
+                try:
+                    await asyncio.sleep(config.first_token_latency + prefill + stall)
+                    if config.stream_text:
+                        deltas = re.findall(r"\s*\S+", config.stream_text)
+                    else:
+                        deltas = [f"tok{i} " for i in range(config.stream_tokens)]
+                    for delta in deltas:
+                        chunk = {"choices": [{"delta": {"content": delta}}]}
+                        yield f"data: {json.dumps(chunk)}\n\n"
+                        await asyncio.sleep(config.token_interval)
+                    final = {"choices": [], "usage": {**usage, "completion_tokens": len(deltas)}}
+                    yield f"data: {json.dumps(final)}\n\n"
+                    yield "data: [DONE]\n\n"
+                    completed = True
+                finally:
+                    if not completed:
+                        config.cancelled += 1
+
+            return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+        await asyncio.sleep(config.latency + config.latency_per_kchar * prompt_chars / 1000 + prefill + stall)
+        if await request.is_disconnected():
+            config.cancelled += 1
+        return JSONResponse(
+            {
+                "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"message": {"role": "assistant", "content": config.completion}}],
+                "usage": {**usage, "completion_tokens": 0},
+            },
+            headers=headers,
+        )
+
+    @app.post("/audio/transcriptions")
+    async def transcriptions(request: Request):
+        config.requests += 1
+        received = 0
+        async for chunk in request.stream():  # drain without buffering the upload
+            received += len(chunk)
+        config.bytes_received += received
+        await asyncio.sleep(config.latency)
+        return JSONResponse(
+            {
+                "text": "Patient reports headache for three days.",
+                "segments": [{"start": 0.0, "end": 2.5, "text": "Patient reports headache for three days."}],
+                "language": "en",
+                "duration": 2.5,
+            }
+        )
+
+    return app
+
+
+@asynccontextmanager
+async def run_stub(config: StubConfig, port: int = 8765):
+    """Run the stub in-process for the duration of the block; yields its base URL."""
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+if __name__ == "__main__":
+    uvicorn.run(create_app(StubConfig()), host="127.0.0.1", port=8765)
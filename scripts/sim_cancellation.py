@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Simulation: client disconnects cancel the upstream Groq call.
+
+Starts the backend with uvicorn in a child process (stateless, note cache
+off, short GENERATION_ORPHAN_SECONDS) against a slow local Groq stub, then:
+
+  http    aborts POST /api/generate-note while Groq is still "thinking"
+  ws      drops /ws/stream-note mid-stream and never reconnects
+  resume  drops /ws/stream-note and reconnects within the grace period
+
+For each case it checks that the stub saw the upstream request closed early
+(or, for resume, completed) and reads medscribe_cancellations_total from
+/metrics. Exits non-zero on any failure.
+
+    python scripts/sim_cancellation.py
+"""
+
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+
+import httpx
+import websockets
+
+STUB_PORT, APP_PORT = 8775, 8776
+ORPHAN_SECONDS = 0.5
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from groq_stub import StubConfig, run_stub  # noqa: E402
+
+APP = f"http://127.0.0.1:{APP_PORT}"
+WS = f"ws://127.0.0.1:{APP_PORT}/ws/stream-note"
+
+
+async def wait_ready(proc: subprocess.Popen) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            if proc.poll() is not None:
+                raise RuntimeError("backend exited during startup")
+            try:
+                if (await client.get(f"{APP}/health/live")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("backend did not start")
+
+
+async def cancellations() -> dict[str, float]:
+    """medscribe_cancellations_total samples keyed by their label string."""
+    async with httpx.AsyncClient() as client:
+        text = (await client.get(f"{APP}/metrics")).text
+    return {
+        labels: float(value)
+        for labels, value in re.findall(r"^medscribe_cancellations_total\{(.*?)\} (\S+)$", text, re.M)
+    }
+
+
+async def settle(stub: StubConfig, expected: int, timeout: float = 3.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while stub.cancelled < expected and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+
+
+async def start_stream(transcript: str) -> tuple:
+    ws = await websockets.connect(WS)
+    await ws.send(json.dumps({"transcript": transcript, "regenerate": True}))
+    first = json.loads(await ws.recv())
+    await ws.recv()  # first text frame: the upstream stream is live
+    return ws, first
+
+
+async def http_abort(stub: StubConfig) -> bool:
+    before = stub.cancelled
+    async with httpx.AsyncClient() as client:
+        try:
+            await client.post(
+                f"{APP}/api/generate-note",
+                json={"transcript": "Doctor: http abort", "regenerate": True},
+                timeout=0.5,  # client gives up while the stub is still stalling
+            )
+        except httpx.TimeoutException:
+            pass
+    await settle(stub, before + 1)
+    return stub.cancelled == before + 1
+
+
+async def ws_drop(stub: StubConfig) -> bool:
+    before = stub.cancelled
+    ws, _ = await start_stream("Doctor: ws drop")
+    await ws.close()
+    await settle(stub, before + 1, timeout=ORPHAN_SECONDS + 3)
+    return stub.cancelled == before + 1
+
+
+async def ws_resume(stub: StubConfig) -> bool:
+    before = stub.cancelled
+    ws, first = await start_stream("Doctor: ws resume")
+    await ws.close()
+    await asyncio.sleep(ORPHAN_SECONDS / 4)
+    async with websockets.connect(WS) as ws:
+        await ws.send(json.dumps({"generation_id": first["generation_id"], "offset": 0}))
+        async for message in ws:
+            frame = json.loads(message)
+            if frame.get("done"):
+                completed = "error" not in frame
+                break
+    await asyncio.sleep(ORPHAN_SECONDS * 2)
+    return completed and stub.cancelled == before
+
+
+async def main() -> int:
+    # Non-streaming calls stall for a second; streams take ~2 s in total.
+    stub = StubConfig(latency=1.0, first_token_latency=0.05, token_interval=0.01, stream_tokens=200)
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{STUB_PORT}",
+        "LLM_PROVIDERS": "groq",
+        "DATABASE_URL": "",
+        "NOTE_CACHE_BACKEND": "none",
+        "GENERATION_ORPHAN_SECONDS": str(ORPHAN_SECONDS),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=os.path.join(HERE, "..", "backend"),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    failures = 0
+    try:
+        async with run_stub(stub, STUB_PORT):
+            await wait_ready(proc)
+            for name, case in [("http", http_abort), ("ws", ws_drop), ("resume", ws_resume)]:
+                ok = await case(stub)
+                failures += not ok
+                print(f"  {name:<7} {'PASS' if ok else 'FAIL'}  (upstream requests closed early: {stub.cancelled})")
+            counts = await cancellations()
+            for labels, value in sorted(counts.items()):
+                print(f"  medscribe_cancellations_total{{{labels}}} {value:g}")
+            # Both dropped sockets count as viewer disconnects; only one generation was orphaned.
+            expected = {
+                'operation="create_note",reason="client_disconnect"': 1,
+                'operation="ws_stream_note",reason="client_disconnect"': 2,
+                'operation="ws_stream_note",reason="orphaned"': 1,
+            }
+            for labels, count in expected.items():
+                if counts.get(labels, 0) != count:
+                    print(f"  FAIL  expected {count} x {{{labels}}}, got {counts.get(labels, 0):g}")
+                    failures += 1
+    finally:
+        proc.terminate()
+        proc.wait()
+    print("PASS" if not failures else f"FAIL ({failures})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Simulation: Groq scheduler under rate limits and injected 429 / 5xx errors.
+
+Fires a burst of interactive notes (streamed) and background patient summaries
+at a stub that enforces an RPM window and randomly fails requests, first with
+retries/budgeting disabled ("naive") and then with the scheduler ("scheduled").
+First checks that a cold start survives a failed probe followed by a waiter
+cancelled as it is admitted (a client disconnect) without stalling later calls.
+
+    python scripts/sim_groq_rate_limits.py --notes 30 --summaries 30 --rpm 20 --window 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+PORT = 8768
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ.setdefault("GROQ_API_KEY", "stub")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import groq_client  # noqa: E402
+from groq_scheduler import GroqScheduler  # noqa: E402
+from http_client import groq_http  # noqa: E402
+from llm_router import llm_router  # noqa: E402
+from note_cache import note_cache  # noqa: E402
+from groq_stub import StubConfig, run_stub  # noqa: E402
+
+
+async def run_job(kind: str, i: int, results: dict) -> None:
+    started = time.perf_counter()
+    try:
+        if kind == "note":
+            async for _ in groq_client.stream_note(f"Doctor: visit {i}", use_cache=False):
+                pass
+        else:
+            await groq_client.generate_patient_summary(f"ASSESSMENT: case {i}")
+        results[kind]["ok"].append(time.perf_counter() - started)
+    except Exception as e:
+        results[kind]["errors"].append(type(e).__name__)
+
+
+def summarize(name: str, results: dict, stub: StubConfig, elapsed: float) -> None:
+    print(f"\n[{name}] {elapsed:.1f}s, stub statuses {dict(sorted(stub.statuses.items()))}")
+    for kind, r in results.items():
+        ok = sorted(r["ok"])
+        if ok:
+            p95 = ok[min(len(ok) - 1, int(len(ok) * 0.95))]
+            latency = f"p50 {statistics.median(ok):5.2f}s  p95 {p95:5.2f}s"
+        else:
+            latency = "-"
+        print(f"  {kind:<8} ok {len(ok):>3}  failed {len(r['errors']):>3}  {latency}")
+
+
+async def scenario(name: str, scheduler: GroqScheduler, args) -> None:
+    llm_router.providers[0].scheduler = scheduler
+    stub = StubConfig(
+        latency=0.05,
+        first_token_latency=0.05,
+        token_interval=0.001,
+        stream_tokens=50,
+        rpm_limit=args.rpm,
+        window=args.window,
+        error_rate_429=args.error_429,
+        error_rate_5xx=args.error_5xx,
+        retry_after=args.retry_after,
+        seed=1,
+    )
+    results = {kind: {"ok": [], "errors": []} for kind in ("note", "summary")}
+    async with run_stub(stub, PORT):
+        started = time.perf_counter()
+        # Summaries are queued first on purpose: priorities should let notes overtake them.
+        jobs = [run_job("summary", i, results) for i in range(args.summaries)]
+        jobs += [run_job("note", i, results) for i in range(args.notes)]
+        await asyncio.gather(*jobs)
+        summarize(name, results, stub, time.perf_counter() - started)
+        await groq_http.close()
+
+
+async def cancelled_probe() -> None:
+    """Cold start: the probe hits a transport error, then the next admitted waiter is cancelled."""
+    scheduler = GroqScheduler(max_retries=0)
+    loop = asyncio.get_running_loop()
+    waiter = None
+
+    async def refused() -> httpx.Response:
+        await asyncio.sleep(0.01)  # let the waiter queue up behind the probe
+        loop.call_soon(waiter.cancel)  # lands in the tick the waiter is admitted
+        raise httpx.ConnectError("connection refused")
+
+    async def ok() -> httpx.Response:
+        return httpx.Response(200)
+
+    probe = asyncio.create_task(scheduler.send(refused))
+    waiter = asyncio.create_task(scheduler.send(ok))
+    outcomes = await asyncio.gather(probe, waiter, return_exceptions=True)
+    try:
+        await asyncio.wait_for(scheduler.send(ok), timeout=2.0)
+        after = "ok"
+    except asyncio.TimeoutError:
+        after = "DEADLOCKED"
+    print(
+        f"[cancelled probe] probe {type(outcomes[0]).__name__}, waiter {type(outcomes[1]).__name__}, "
+        f"next call {after} (probing={scheduler._probing}, requests left={scheduler.requests.remaining})"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=30)
+    parser.add_argument("--summaries", type=int, default=30)
+    parser.add_argument("--rpm", type=int, default=20, help="requests allowed per window")
+    parser.add_argument("--window", type=float, default=2.0, help="rate-limit window (s)")
+    parser.add_argument("--error-429", type=float, default=0.05)
+    parser.add_argument("--error-5xx", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    args = parser.parse_args()
+    note_cache.backend = None  # every call must reach the stub
+
+    await cancelled_probe()
+
+    naive = GroqScheduler(max_retries=0)
+    naive.limits_known = False  # ignore rate-limit headers: plain pass-through
+    naive.observe_response = lambda response: None
+    await scenario("naive", naive, args)
+    await scenario("scheduled", GroqScheduler(max_retries=6, backoff_base=0.2, backoff_max=2.0), args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Simulation: bulk jobs survive a crash and resume from their checkpoint.
+
+Seeds --encounters encounters (a few without a transcript) into an encrypted
+in-memory snapshot, starts the backend with uvicorn in a child process
+(stateless, small JOBS_BATCH_SIZE) against a local Groq stub, then:
+
+  regenerate  starts a regenerate job, SIGKILLs the backend mid-job, restarts
+              it and waits for the job to finish from its checkpoint. Checks
+              every encounter with a transcript is in the output exactly once,
+              the rest are counted as skipped, and at most one batch was
+              regenerated twice (stub request count).
+  fhir        exports the same encounters as a FHIR Bundle and checks that it
+              parses and has one DocumentReference per saved note.
+
+Exits non-zero on any failure.
+
+    python scripts/sim_jobs.py --encounters 120
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import httpx
+
+STUB_PORT, APP_PORT = 8781, 8782
+BATCH_SIZE = 10
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(HERE, "..", "backend")
+APP = f"http://127.0.0.1:{APP_PORT}"
+ENCRYPTION_KEY = "sim-jobs-key"
+
+os.environ["ENCRYPTION_KEY"] = ENCRYPTION_KEY
+sys.path.insert(0, HERE)
+sys.path.insert(0, BACKEND)
+
+from groq_stub import StubConfig, run_stub  # noqa: E402
+from memory_store import IndexedStore, save_snapshot  # noqa: E402
+
+
+def seed(path: str, count: int) -> int:
+    """Write `count` encounters to a snapshot; returns how many have a transcript."""
+    store = IndexedStore(max_items=count, index_field="user_id")
+    start = datetime(2026, 1, 1)
+    with_transcript = 0
+    for i in range(count):
+        record = {
+            "id": f"enc-{i:04d}",
+            "user_id": f"dr-{i % 3}",
+            "template": "soap",
+            "specialty": "general",
+            "status": "draft" if i % 4 else "final",
+            "note": f"**SUBJECTIVE:**\nSaved note {i}.",
+            # Two encounters share each timestamp: the keyset cursor must use the id too.
+            "created_at": (start + timedelta(minutes=i // 2)).isoformat(),
+        }
+        if i % 10:
+            record["transcript"] = f"Doctor: visit {i}. Patient: cough for {i % 7 + 1} days."
+            with_transcript += 1
+        store.put(record["id"], record)
+    save_snapshot(path, encounters=store)
+    return with_transcript
+
+
+def start_backend(env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=BACKEND,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(proc: subprocess.Popen) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            if proc.poll() is not None:
+                raise RuntimeError("backend exited during startup")
+            try:
+                if (await client.get(f"{APP}/health/live")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("backend did not start")
+
+
+async def wait_for(client: httpx.AsyncClient, job_id: str, predicate, timeout: float = 60) -> dict:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = (await client.get(f"{APP}/api/jobs/{job_id}")).json()
+        if predicate(job) or asyncio.get_running_loop().time() > deadline:
+            return job
+        await asyncio.sleep(0.05)
+
+
+def check(ok: bool, label: str) -> int:
+    print(f"  {'PASS' if ok else 'FAIL'}  {label}")
+    return 0 if ok else 1
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encounters", type=int, default=120)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sim_jobs_")
+    snapshot = os.path.join(workdir, "snapshot.enc")
+    with_transcript = seed(snapshot, args.encounters)
+    stub = StubConfig(latency=0.1)
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{STUB_PORT}",
+        "LLM_PROVIDERS": "groq",
+        "DATABASE_URL": "",
+        "NOTE_CACHE_BACKEND": "none",
+        "MEMORY_SNAPSHOT_PATH": snapshot,
+        "JOBS_DIR": os.path.join(workdir, "jobs"),
+        "JOBS_BATCH_SIZE": str(BATCH_SIZE),
+        "JOBS_CONCURRENCY": "4",
+    }
+    failures = 0
+    proc = start_backend(env)
+    try:
+        async with run_stub(stub, STUB_PORT), httpx.AsyncClient(timeout=30) as client:
+            await wait_ready(proc)
+
+            # ── regenerate, with a crash in the middle ──
+            job = (await client.post(f"{APP}/api/jobs", json={"kind": "regenerate"})).json()
+            halfway = with_transcript // 2
+            job = await wait_for(client, job["id"], lambda j: j["processed"] >= halfway)
+            proc.send_signal(signal.SIGKILL)  # no shutdown hooks: a real crash
+            proc.wait()
+            print(f"regenerate: killed the backend at {job['processed']}/{job['total']} encounters")
+
+            proc = start_backend(env)
+            await wait_ready(proc)
+            job = await wait_for(client, job["id"], lambda j: j["status"] not in ("queued", "running"))
+            print(
+                f"regenerate: {job['status']}  processed {job['processed']}  skipped {job['skipped']}  "
+                f"failed {job['failed']}  stub requests {stub.requests}"
+            )
+            failures += check(job["status"] == "completed", "job completed after restart")
+            output = (await client.get(f"{APP}/api/jobs/{job['id']}/output")).text
+            ids = [json.loads(line)["encounter_id"] for line in output.splitlines()]
+            failures += check(
+                len(ids) == with_transcript and len(set(ids)) == with_transcript,
+                f"each of the {with_transcript} transcribed encounters in the output once ({len(ids)} lines)",
+            )
+            failures += check(
+                job["skipped"] == args.encounters - with_transcript, "encounters without a transcript skipped"
+            )
+            redone = stub.requests - with_transcript
+            failures += check(0 <= redone <= BATCH_SIZE, f"at most one batch regenerated twice ({redone} extra)")
+
+            # ── FHIR export ──
+            job = (await client.post(f"{APP}/api/jobs", json={"kind": "export", "format": "fhir"})).json()
+            job = await wait_for(client, job["id"], lambda j: j["status"] not in ("queued", "running"))
+            bundle = (await client.get(f"{APP}/api/jobs/{job['id']}/output")).json()
+            docs = [e["resource"] for e in bundle["entry"]]
+            failures += check(
+                bundle["resourceType"] == "Bundle" and len(docs) == args.encounters,
+                f"FHIR Bundle with {len(docs)} DocumentReferences",
+            )
+            first = base64.b64decode(docs[0]["content"][0]["attachment"]["data"]).decode()
+            failures += check(first.startswith("**SUBJECTIVE:**"), "attachments decode to the saved notes")
+    finally:
+        proc.terminate()
+        proc.wait()
+    print("PASS" if not failures else f"FAIL ({failures})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))